@@ -0,0 +1,65 @@
+"""
+Benchmark of `query_to_q` against the compiled `compile_q` Django backend.
+
+Builds Q objects for a 100-term query (and a nested variant) and reports the time per call for
+`query_to_q`, `compile_q` without cache (first request) and `compile_q` with cache (repeated
+request).
+
+Run from the repository root:
+
+    python -m python.benchmarks.django_q [--terms 100]
+"""
+
+import argparse
+import timeit
+
+from python.filters.integrations.django import compile_q, query_to_q
+from python.filters.types import And, Eq, Gt, In, Not, Or
+
+
+def flat_query(terms):
+    return And(*[Eq(f"field{i}", f"value{i}") for i in range(terms)])
+
+
+def nested_query(terms):
+    return Or(
+        *[
+            And(
+                Gt(f"field{i}", i), Not(Eq(f"other{i}", "x")), In(f"tag{i}", ["a", "b"])
+            )
+            for i in range(terms // 3)
+        ]
+    )
+
+
+def best(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    argument_parser.add_argument("--terms", type=int, default=100)
+    argument_parser.add_argument("--number", type=int, default=200)
+    args = argument_parser.parse_args(argv)
+
+    for name, build in (("flat", flat_query), ("nested", nested_query)):
+        tree = build(args.terms)
+
+        def uncached():
+            compile_q.cache_clear()
+            compile_q(tree)
+
+        baseline = best(lambda: query_to_q(tree), args.number)
+        cold = best(uncached, args.number)
+        warm = best(lambda: compile_q(tree), args.number)
+
+        print(f"{name} query, {args.terms} terms")
+        print(f"  query_to_q          {baseline * 1e6:9.1f} us")
+        print(f"  compile_q (cold)    {cold * 1e6:9.1f} us   {baseline / cold:6.1f}x")
+        print(f"  compile_q (cached)  {warm * 1e6:9.1f} us   {baseline / warm:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
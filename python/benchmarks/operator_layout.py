@@ -0,0 +1,113 @@
+"""
+Memory and attribute access benchmark for Operator nodes.
+
+Compares the previous layout (per-instance __dict__, args list, key/value properties indexing
+into args) with the current __slots__ layout.
+
+Run from the repository root:
+
+    python -m python.benchmarks.operator_layout [--trees 10000]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+from python.filters import types
+
+
+# Previous layout, kept here for comparison only
+class LegacyOperator:
+    operation = None
+
+    def __init__(self, *args):
+        self.args = list(args)
+
+
+class LegacyLogicalOperator(LegacyOperator):
+    pass
+
+
+class LegacyAnd(LegacyLogicalOperator):
+    operation = "and"
+
+
+class LegacyOr(LegacyLogicalOperator):
+    operation = "or"
+
+
+class LegacyKeyValueOperator(LegacyOperator):
+    @property
+    def key(self):
+        return self.args[0]
+
+    @property
+    def value(self):
+        return self.args[1]
+
+
+class LegacyEq(LegacyKeyValueOperator):
+    operation = "eq"
+
+
+class LegacyLt(LegacyKeyValueOperator):
+    operation = "lt"
+
+
+LAYOUTS = {
+    "legacy": (LegacyAnd, LegacyOr, LegacyEq, LegacyLt),
+    "slots": (types.And, types.Or, types.Eq, types.Lt),
+}
+
+
+def build_tree(layout, i):
+    and_, or_, eq, lt = LAYOUTS[layout]
+    return and_(
+        or_(eq("name", f"John{i}"), eq("name", f"Jack{i}")),
+        lt("age", i),
+        eq("city", "Berlin"),
+    )
+
+
+def measure_memory(layout, count):
+    tracemalloc.start()
+    trees = [build_tree(layout, i) for i in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del trees
+    return size
+
+
+def access(tree):
+    total = 0
+    for child in tree.args:
+        if hasattr(child, "key"):
+            total += len(child.key)
+        else:
+            for leaf in child.args:
+                total += len(leaf.key) + len(leaf.value)
+    return total
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    argument_parser.add_argument("--trees", type=int, default=10000)
+    args = argument_parser.parse_args(argv)
+
+    print(f"{args.trees} trees of 5 nodes")
+    for layout in LAYOUTS:
+        memory = measure_memory(layout, args.trees)
+        trees = [build_tree(layout, i) for i in range(1000)]
+        seconds = min(
+            timeit.repeat(lambda: [access(tree) for tree in trees], number=20, repeat=5)
+        )
+        print(
+            f"  {layout:<7} memory {memory / args.trees:8.1f} B/tree"
+            f"   access {seconds / 20 / len(trees) * 1e6:6.2f} us/tree"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of loading serialized FilterQuery objects against parsing the GitHub syntax again.
+
+Reports the time per query for parsing with the pyparsing and the pratt backend (without the
+parse cache) and for `loads` (text form) and `loadb` (binary form), plus the serialized sizes.
+
+Run from the repository root:
+
+    python -m python.benchmarks.serialization [--terms 30]
+"""
+
+import argparse
+import timeit
+
+from python.filters.parsers.github import GithubSyntaxParser
+from python.filters.serialization import dumpb, dumps, loadb, loads
+
+
+def build_query(terms):
+    groups = [
+        f'(author:user{i} OR label:"bug {i}") -state:closed created:>={2000 + i}'
+        for i in range(terms // 4)
+    ]
+    return " AND ".join(groups)
+
+
+def best(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    argument_parser.add_argument("--terms", type=int, default=30)
+    argument_parser.add_argument("--number", type=int, default=200)
+    args = argument_parser.parse_args(argv)
+
+    query = build_query(args.terms)
+    filter_query = GithubSyntaxParser(query, backend="pratt").parse()
+    text, binary = dumps(filter_query), dumpb(filter_query)
+
+    assert loads(text).query == loadb(binary).query == filter_query.query
+
+    def parse(backend):
+        parser = GithubSyntaxParser(query, backend=backend)
+        parser.cache = None
+        return lambda: parser.parse()
+
+    baseline = best(parse("pyparsing"), args.number)
+    results = [
+        ("parse (pyparsing)", baseline),
+        ("parse (pratt)", best(parse("pratt"), args.number)),
+        ("loads (text)", best(lambda: loads(text), args.number)),
+        ("loadb (binary)", best(lambda: loadb(binary), args.number)),
+    ]
+
+    print(
+        f"{args.terms} terms: query {len(query)} chars, text {len(text)} B, binary {len(binary)} B"
+    )
+    for name, seconds in results:
+        print(f"  {name:18}  {seconds * 1e6:9.1f} us   {baseline / seconds:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
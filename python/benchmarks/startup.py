@@ -0,0 +1,63 @@
+"""
+Startup benchmark for the GitHub syntax parser.
+
+Measures, in fresh interpreters, how long importing `python.filters.parsers.github` takes and
+how long the first parse takes afterwards (which includes building the grammar lazily).
+
+Run from the repository root:
+
+    python -m python.benchmarks.startup [--runs 20]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+QUERY = '(language:ruby OR language:python AND name:nico) AND NOT path:"/tests/" AND age:>=30'
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from python.filters.parsers.github import GithubSyntaxParser
+imported = time.perf_counter()
+GithubSyntaxParser({query!r}, backend={backend!r}).parse()
+first_parse = time.perf_counter()
+GithubSyntaxParser({query!r} + " x:1", backend={backend!r}).parse()
+second_parse = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "first_parse": first_parse - imported,
+    "second_parse": second_parse - first_parse,
+}}))
+"""
+
+
+def run_once(backend):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(query=QUERY, backend=backend)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0]
+    )
+    argument_parser.add_argument("--runs", type=int, default=20)
+    args = argument_parser.parse_args(argv)
+
+    for backend in ("pyparsing", "pratt"):
+        samples = [run_once(backend) for _ in range(args.runs)]
+        print(f"{backend} ({args.runs} runs, median)")
+        for name in ("import", "first_parse", "second_parse"):
+            median = statistics.median(sample[name] for sample in samples)
+            print(f"  {name:<13} {median * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Schema driven conversion of the parsed (string) values to typed values.
+
+The parser keeps every value as a string, e.g. `age:<30` becomes `Lt("age", "30")`. Comparing
+strings is wrong for numbers and dates in Python and leads to implicit casts in SQL, which may
+prevent index usage. A `Coercer` converts the values of a tree in one pass after parsing, using
+one converter per field compiled when the coercer is created.
+
+    coercer = Coercer({"age": int, "price": Decimal, "created": datetime})
+    filter_query = coercer(GithubSyntaxParser("age:<30 created:>2020-01-01").parse())
+"""
+
+import re
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Callable, Mapping, Union
+
+from .types import (
+    Co,
+    FilterQuery,
+    In,
+    KeyValueOperator,
+    LogicalOperator,
+    Operator,
+    OperatorError,
+)
+
+# date literals repeat a lot (e.g. `created:>2020-01-01` in every request of a dashboard)
+DATE_CACHE_SIZE = 4096
+
+Converter = Callable[[str], object]
+
+# integral decimals like `30.0`, without exponents: `Decimal("1e1000000")` is valid but turning
+# it into an int takes forever
+INTEGRAL_DECIMAL = re.compile(r"\s*([+-]?\d+)\.0*\s*")
+
+
+def to_bool(value: str) -> bool:
+    try:
+        return {"true": True, "false": False}[value.lower()]
+    except KeyError:
+        raise ValueError(f"Invalid boolean {value!r}")
+
+
+def to_int(value: str) -> int:
+    # `int("1.0")` fails, allow integral decimals
+    try:
+        return int(value)
+    except ValueError:
+        match = INTEGRAL_DECIMAL.fullmatch(value)
+        if match is None:
+            raise
+        return int(match.group(1))
+
+
+def to_decimal(value: str) -> Decimal:
+    # NaN and Infinity aren't filter values, and a signaling NaN can't even be hashed
+    number = Decimal(value)
+    if not number.is_finite():
+        raise ValueError(f"Invalid decimal {value!r}")
+    return number
+
+
+CONVERTERS = {
+    bool: to_bool,
+    int: to_int,
+    float: float,
+    Decimal: to_decimal,
+    str: str,
+    date: lru_cache(maxsize=DATE_CACHE_SIZE)(date.fromisoformat),
+    datetime: lru_cache(maxsize=DATE_CACHE_SIZE)(datetime.fromisoformat),
+    time: lru_cache(maxsize=DATE_CACHE_SIZE)(time.fromisoformat),
+}
+
+
+def compile_converter(target: Union[type, Converter]) -> Converter:
+    """Return the function converting a string to `target`, a type or a converter itself."""
+    if isinstance(target, type):
+        try:
+            return CONVERTERS[target]
+        except KeyError:
+            raise OperatorError(f"No converter for {target.__name__}")
+    return target
+
+
+class Coercer:
+    """Converts the values of an Operator tree according to a schema of key to type."""
+
+    def __init__(
+        self, schema: Mapping[str, Union[type, Converter]], strict: bool = False
+    ):
+        self.converters = {
+            key: compile_converter(target) for key, target in schema.items()
+        }
+        # strict: keys without a converter raise instead of keeping the string
+        self.strict = strict
+
+    def __call__(self, filter_query: FilterQuery) -> FilterQuery:
+        filter_query = filter_query.copy()
+        filter_query.query = self.coerce(filter_query.query)
+        return filter_query
+
+    def convert(self, key: str, converter: Converter, value):
+        if not isinstance(value, str):
+            return value
+
+        try:
+            return converter(value)
+        except (ValueError, TypeError, InvalidOperation, OverflowError):
+            raise OperatorError(f"Invalid value {value!r} for {key!r}")
+
+    def coerce(self, operator: Operator) -> Operator:
+        """Return the tree with converted values, unchanged subtrees are reused."""
+        if isinstance(operator, LogicalOperator):
+            args = tuple(self.coerce(arg) for arg in operator.args)
+            if all(new is old for new, old in zip(args, operator.args)):
+                return operator
+            return operator.__class__(*args)
+
+        if not isinstance(operator, KeyValueOperator) or isinstance(operator, Co):
+            # contains always matches a substring
+            return operator
+
+        converter = self.converters.get(operator.key)
+        if converter is None:
+            if self.strict:
+                raise OperatorError(f"Unknown field {operator.key!r}")
+            return operator
+
+        if isinstance(operator, In):
+            value = tuple(
+                self.convert(operator.key, converter, v) for v in operator.value
+            )
+            if all(new is old for new, old in zip(value, operator.value)):
+                return operator
+        else:
+            value = self.convert(operator.key, converter, operator.value)
+            if value is operator.value:
+                return operator
+
+        return operator.__class__(operator.key, value)
+
+
+def coerce_query(
+    filter_query: FilterQuery, schema: Mapping[str, Union[type, Converter]]
+):
+    """Shortcut for `Coercer(schema)(filter_query)`."""
+    return Coercer(schema)(filter_query)
@@ -0,0 +1,443 @@
+"""
+In-memory evaluation of FilterQuery objects against dicts or arbitrary objects.
+
+An Operator tree is compiled once into a single generated function whose body is a flat
+boolean expression over precompiled leaf predicates, so checking a record never walks the
+tree again. Compiled predicates are cached per (structurally equal) tree, the generated code
+per query shape (see `shapes.py`), so trees differing only in their values share it.
+"""
+
+import asyncio
+import operator as op
+from contextlib import aclosing
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List
+
+from .shapes import OPERATORS, split
+from .types import (
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    Lt,
+    Operator,
+    OperatorError,
+    Sort,
+)
+
+PREDICATE_CACHE_SIZE = 1024
+
+# deeper shapes are compiled to nested closures, Python's parser rejects expressions with more
+# than 200 levels of parentheses
+MAX_SOURCE_DEPTH = 50
+
+# records checked by `aevaluate` before yielding to the event loop
+ASYNC_BATCH_SIZE = 1000
+
+# separator for traversing nested records, e.g. `author__name`, same as Django lookups
+KEY_SEPARATOR = "__"
+
+MISSING = object()
+INVALID = object()
+
+COMPARISONS = {
+    Eq: op.eq,
+    Gt: op.gt,
+    Ge: op.ge,
+    Lt: op.lt,
+    Le: op.le,
+}
+
+
+def make_getter(key: str) -> Callable:
+    """Return a function reading `key` from a record, or MISSING if it doesn't exist."""
+
+    def get(record, name):
+        if isinstance(record, dict):
+            return record.get(name, MISSING)
+        return getattr(record, name, MISSING)
+
+    if KEY_SEPARATOR not in key:
+        return lambda record: get(record, key)
+
+    path = key.split(KEY_SEPARATOR)
+
+    def getter(record):
+        for name in path:
+            record = get(record, name)
+            if record is MISSING or record is None:
+                return MISSING
+        return record
+
+    return getter
+
+
+def coerce(literal, target_type):
+    """
+    Convert a literal to the type of the record value it is compared with. The parser keeps
+    every value as a string, so `age:<30` has to compare as a number against numeric fields.
+    """
+    if isinstance(literal, target_type) or not isinstance(literal, str):
+        return literal
+
+    try:
+        if target_type is bool:
+            return {"true": True, "false": False}.get(literal.lower(), INVALID)
+        if target_type is int:
+            try:
+                return int(literal)
+            except ValueError:
+                # e.g. `age:<30.5`, ints compare exactly with Decimals
+                number = Decimal(literal)
+                return number if number.is_finite() else float(number)
+        if target_type is Decimal:
+            number = Decimal(literal)
+            # Decimal NaNs raise when compared, and match nothing like float NaNs
+            return INVALID if number.is_nan() else number
+        if target_type in (float, str):
+            return target_type(literal)
+        if target_type in (date, datetime, time):
+            return target_type.fromisoformat(literal)
+    except (ValueError, InvalidOperation):
+        return INVALID
+
+    return literal
+
+
+def compile_comparison(key: str, literal, compare: Callable) -> Callable:
+    getter = make_getter(key)
+    coerced = {type(literal): literal}
+
+    def predicate(record):
+        value = getter(record)
+        if value is MISSING or value is None:
+            return False
+
+        value_type = type(value)
+        try:
+            target = coerced[value_type]
+        except KeyError:
+            target = coerced[value_type] = coerce(literal, value_type)
+
+        if target is INVALID:
+            return False
+
+        try:
+            return compare(value, target)
+        except TypeError:
+            return False
+
+    return predicate
+
+
+def compile_in(key: str, literals) -> Callable:
+    getter = make_getter(key)
+    coerced = {}
+
+    def predicate(record):
+        value = getter(record)
+        if value is MISSING or value is None:
+            return False
+
+        value_type = type(value)
+        try:
+            targets = coerced[value_type]
+        except KeyError:
+            targets = coerced[value_type] = frozenset(
+                target
+                for target in (coerce(literal, value_type) for literal in literals)
+                if target is not INVALID
+            )
+
+        try:
+            return value in targets
+        except TypeError:
+            # unhashable, e.g. a list, which equals none of the literals
+            return False
+
+    return predicate
+
+
+def compile_contains(key: str, literal) -> Callable:
+    getter = make_getter(key)
+
+    def predicate(record):
+        value = getter(record)
+        if value is MISSING or value is None:
+            return False
+
+        if isinstance(value, str):
+            return str(literal) in value
+
+        try:
+            return literal in value
+        except TypeError:
+            return False
+
+    return predicate
+
+
+def compile_leaf(operation: str, key: str, value) -> Callable:
+    operator_class = OPERATORS.get(operation)
+
+    if operator_class is In:
+        return compile_in(key, value)
+
+    if operator_class is Co:
+        return compile_contains(key, value)
+
+    if operator_class in COMPARISONS:
+        return compile_comparison(key, value, COMPARISONS[operator_class])
+
+    raise OperatorError(f"Unsupported operator: {operation}")
+
+
+def to_source(shape: tuple, leaves: list) -> str:
+    """Translate a tree shape into a Python expression calling the leaf predicates `p0`, ..."""
+    kind = shape[0]
+
+    if kind == "not":
+        return f"(not {to_source(shape[1], leaves)})"
+
+    if kind in ("and", "or"):
+        if len(shape) == 1:
+            # empty conjunction matches everything, empty disjunction nothing
+            return "True" if kind == "and" else "False"
+
+        connector = f" {kind} "
+        return f"({connector.join(to_source(child, leaves) for child in shape[1:])})"
+
+    leaves.append(shape)
+    return f"p{len(leaves) - 1}(record)"
+
+
+def shape_depth(shape: tuple) -> int:
+    # iterative, the shape may be deeper than the recursion limit allows
+    depth, stack = 0, [(shape, 1)]
+    while stack:
+        shape, level = stack.pop()
+        depth = max(depth, level)
+        if shape[0] in ("and", "or", "not"):
+            stack.extend((child, level + 1) for child in shape[1:])
+    return depth
+
+
+def compose(shape: tuple, leaves: Iterator[Callable]) -> Callable[[object], bool]:
+    """Combine the leaf predicates (in order) to a predicate of nested closures."""
+    kind = shape[0]
+
+    if kind == "not":
+        child = compose(shape[1], leaves)
+        return lambda record: not child(record)
+
+    if kind == "and":
+        children = [compose(child, leaves) for child in shape[1:]]
+        return lambda record: all(child(record) for child in children)
+
+    if kind == "or":
+        children = [compose(child, leaves) for child in shape[1:]]
+        return lambda record: any(child(record) for child in children)
+
+    return next(leaves)
+
+
+@lru_cache(maxsize=PREDICATE_CACHE_SIZE)
+def compile_shape(shape: tuple) -> Callable[[list], Callable[[object], bool]]:
+    """
+    Compile a tree shape (see `shapes.py`) once into a factory `make(params) -> predicate`, so
+    trees differing only in their values share the generated code.
+    """
+    leaves = []
+    expression = to_source(shape, leaves)
+
+    if shape_depth(shape) > MAX_SOURCE_DEPTH:
+        source = None
+
+        def make(*predicates):
+            return compose(shape, iter(predicates))
+
+    else:
+        names = ", ".join(f"p{i}" for i in range(len(leaves)))
+        source = (
+            f"def make({names}):\n"
+            f"    def predicate(record):\n"
+            f"        return {expression}\n"
+            f"    return predicate\n"
+        )
+
+        namespace = {}
+        exec(compile(source, "<filter>", "exec"), namespace)
+        make = namespace["make"]
+
+    def factory(params, wrap=None):
+        """`wrap(i, leaf)` optionally replaces the predicate of the i-th leaf, e.g. to count."""
+        predicates = [
+            compile_leaf(operation, key, value)
+            for (operation, key), value in zip(leaves, params)
+        ]
+        if wrap is not None:
+            predicates = [wrap(i, leaf) for i, leaf in enumerate(predicates)]
+
+        predicate = make(*predicates)
+        predicate.source = source
+        return predicate
+
+    return factory
+
+
+@lru_cache(maxsize=PREDICATE_CACHE_SIZE)
+def compile_predicate(
+    operator: Operator, keep_order: bool = False
+) -> Callable[[object], bool]:
+    """
+    Compile an Operator tree into a function `predicate(record) -> bool`. And / Or children are
+    checked in canonical order, or in the order of the tree with `keep_order`.
+    """
+    shape, params = split(operator, canonical=not keep_order)
+    return compile_shape(shape)(params)
+
+
+# types whose values are ordered by value, grouped so that e.g. ints and floats compare
+ORDER_GROUPS = {
+    bool: "number",
+    int: "number",
+    float: "number",
+    Decimal: "number",
+    str: "str",
+    bytes: "bytes",
+    datetime: "datetime",
+    date: "date",
+    time: "time",
+    timedelta: "timedelta",
+}
+
+
+def order_key(value) -> tuple:
+    """
+    A key ordering values of any type: by type, then by value. Values of other types (e.g. lists
+    or dicts, which may not be comparable) are ordered by their repr.
+    """
+    for value_type in type(value).__mro__:
+        group = ORDER_GROUPS.get(value_type)
+        if group is not None:
+            break
+    else:
+        value_type = type(value)
+        return (f"{value_type.__module__}.{value_type.__qualname__}", repr(value))
+
+    if group in ("datetime", "time") and value.utcoffset() is not None:
+        # naive and aware values can't be compared
+        group += "+tz"
+    return (group, value)
+
+
+def sort_key(key: str, descending: bool) -> Callable:
+    """Sort key placing missing and None values last for both directions."""
+    getter = make_getter(key)
+    missing_rank = 0 if descending else 1
+
+    def get_key(record):
+        value = getter(record)
+        if value is MISSING or value is None:
+            return (missing_rank,)
+        return (1 - missing_rank, *order_key(value))
+
+    return get_key
+
+
+def sort_records(records: list, sort: List[Sort]) -> list:
+    """Sort records in place by multiple keys (stable, the last key is applied first)."""
+    for s in reversed(sort):
+        records.sort(key=sort_key(s.key, s.descending), reverse=s.descending)
+    return records
+
+
+def iter_matches(
+    filter_query: FilterQuery, records: Iterable, statistics=None
+) -> Iterator:
+    """
+    The matching records. With `statistics` (see `statistics.py`) the And / Or children are
+    checked in the order the statistics estimate to be cheapest, and their hit rates are
+    recorded.
+    """
+    if statistics is not None:
+        from .statistics import filter_observed
+
+        return filter_observed(filter_query.query, records, statistics)
+
+    return filter(compile_predicate(filter_query.query), records)
+
+
+def evaluate(filter_query: FilterQuery, records: Iterable, statistics=None) -> list:
+    """Return the records matching the FilterQuery, sorted and paginated."""
+    matches = iter_matches(filter_query, records, statistics)
+    start = filter_query.offset or 0
+    stop = None if filter_query.limit is None else start + filter_query.limit
+
+    if not filter_query.sort:
+        return list(islice(matches, start, stop))
+
+    matches = sort_records(list(matches), filter_query.sort)
+    return matches[start:stop]
+
+
+def count(filter_query: FilterQuery, records: Iterable, statistics=None) -> int:
+    """Number of matching records, ignoring offset and limit."""
+    return sum(1 for _ in iter_matches(filter_query, records, statistics))
+
+
+async def afilter(
+    filter_query: FilterQuery, records, batch_size: int = ASYNC_BATCH_SIZE
+):
+    """
+    Asynchronously yield the matching records of an iterable or async iterable, yielding to the
+    event loop after every `batch_size` records so long evaluations don't block other tasks.
+    """
+    predicate = compile_predicate(filter_query.query)
+
+    if hasattr(records, "__aiter__"):
+        async for record in records:
+            if predicate(record):
+                yield record
+        return
+
+    iterator = iter(records)
+    while batch := list(islice(iterator, batch_size)):
+        for record in filter(predicate, batch):
+            yield record
+        await asyncio.sleep(0)
+
+
+async def aevaluate(
+    filter_query: FilterQuery, records, batch_size: int = ASYNC_BATCH_SIZE
+) -> list:
+    """Asynchronous `evaluate` for iterables and async iterables, see `afilter`."""
+    start = filter_query.offset or 0
+    stop = None if filter_query.limit is None else start + filter_query.limit
+
+    matches = []
+    async with aclosing(afilter(filter_query, records, batch_size)) as results:
+        async for record in results:
+            matches.append(record)
+            if not filter_query.sort and stop is not None and len(matches) >= stop:
+                break
+
+    if filter_query.sort:
+        sort_records(matches, filter_query.sort)
+    return matches[start:stop]
+
+
+async def acount(
+    filter_query: FilterQuery, records, batch_size: int = ASYNC_BATCH_SIZE
+) -> int:
+    """Asynchronous `count`, see `afilter`."""
+    total = 0
+    async for _ in afilter(filter_query, records, batch_size):
+        total += 1
+    return total
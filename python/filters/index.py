@@ -0,0 +1,345 @@
+"""
+Indexed in-memory collections, answering queries from indexes instead of checking every record.
+
+    people = IndexedCollection(records)
+    people.evaluate(GithubSyntaxParser("city:Berlin age:>30").parse())
+
+Every key used in a query is indexed on first use (or up front with `keys=`) and kept up to
+date by `add` and `remove`:
+
+- a hash index from value to record ids answers Eq and In,
+- a sorted list of the distinct values answers Gt, Ge, Lt and Le by bisection,
+- an index from n-grams (substrings of length `ngram`) to the distinct string values answers
+  Co: only values containing all n-grams of the searched string are checked.
+
+And, Or and Not become intersections, unions and differences of the matching ids (And only until
+few candidates are left, which are then checked directly). The results are the same as those of
+`evaluator.evaluate` on the list of records, in the same order. Values the indexes can't hold
+(unhashable or NaN) and types which can't be ordered are checked one by one with the predicates
+of the evaluator.
+
+Records must not be changed while they are in the collection, `remove` and `add` them instead.
+"""
+
+import bisect
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Set
+
+from .evaluator import (
+    INVALID,
+    MISSING,
+    coerce,
+    compile_leaf,
+    compile_predicate,
+    make_getter,
+    sort_records,
+)
+from .types import (
+    And,
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    LogicalOperator,
+    Lt,
+    Not,
+    Operator,
+    Or,
+)
+
+NGRAM_SIZE = 3
+
+# once the candidates of an And are fewer than this fraction of the records, the remaining
+# children are checked on the candidates instead of being looked up in the indexes
+VERIFY_FRACTION = 0.01
+
+
+def ngrams(string: str, n: int) -> Set[str]:
+    return {string[i : i + n] for i in range(len(string) - n + 1)}
+
+
+class KeyIndex:
+    """The indexes of one key."""
+
+    def __init__(self, key: str, ngram: int = NGRAM_SIZE):
+        self.key = key
+        self.getter = make_getter(key)
+        self.ngram = ngram
+        # value type -> value -> ids
+        self.values: Dict[type, Dict[object, Set[int]]] = {}
+        # value type -> sorted distinct values, None if the values can't be ordered. Built on
+        # the first range query of the type
+        self.sorted: Dict[type, Optional[list]] = {}
+        # n-gram -> distinct string values containing it
+        self.grams: Dict[str, Set[str]] = {}
+        # ids of values which can't be indexed
+        self.unindexed: Set[int] = set()
+
+    def add(self, record_id: int, record):
+        value = self.getter(record)
+        if value is MISSING or value is None:
+            return
+
+        try:
+            # NaN is not equal to itself and can't be found by value
+            if value != value:
+                raise TypeError
+            ids = self.values.setdefault(type(value), {}).setdefault(value, set())
+        except (TypeError, ValueError):
+            self.unindexed.add(record_id)
+            return
+
+        if not ids:
+            self.add_value(value)
+        ids.add(record_id)
+
+    def remove(self, record_id: int, record):
+        value = self.getter(record)
+        if value is MISSING or value is None:
+            return
+
+        if record_id in self.unindexed:
+            self.unindexed.discard(record_id)
+            return
+
+        values = self.values[type(value)]
+        ids = values[value]
+        ids.discard(record_id)
+        if not ids:
+            del values[value]
+            self.remove_value(value)
+
+    def add_value(self, value):
+        """Add a new distinct value to the sorted and n-gram indexes."""
+        values = self.sorted.get(type(value))
+        if values is not None:
+            try:
+                bisect.insort(values, value)
+            except TypeError:
+                self.sorted[type(value)] = None
+
+        if type(value) is str:
+            for gram in ngrams(value, self.ngram):
+                self.grams.setdefault(gram, set()).add(value)
+
+    def remove_value(self, value):
+        values = self.sorted.get(type(value))
+        if values is not None:
+            del values[bisect.bisect_left(values, value)]
+
+        if type(value) is str:
+            for gram in ngrams(value, self.ngram):
+                strings = self.grams[gram]
+                strings.discard(value)
+                if not strings:
+                    del self.grams[gram]
+
+    def sorted_values(self, value_type) -> Optional[list]:
+        if value_type not in self.sorted:
+            try:
+                self.sorted[value_type] = sorted(self.values[value_type])
+            except TypeError:
+                self.sorted[value_type] = None
+        return self.sorted[value_type]
+
+    def ids_of(self, value_type, values) -> Set[int]:
+        ids = set()
+        postings = self.values[value_type]
+        for value in values:
+            ids |= postings[value]
+        return ids
+
+    def all_ids(self, value_type) -> Set[int]:
+        return self.ids_of(value_type, self.values[value_type])
+
+    def match(self, operator: Operator, records: dict) -> Set[int]:
+        """Ids of the records matching a key-value operator."""
+        predicate = compile_leaf(operator.operation, operator.key, operator.value)
+        ids = {i for i in self.unindexed if predicate(records[i])}
+
+        for value_type in self.values:
+            try:
+                ids |= self.match_type(operator, value_type)
+            except TypeError:
+                # e.g. an unhashable literal, check the values one by one
+                ids |= {i for i in self.all_ids(value_type) if predicate(records[i])}
+
+        return ids
+
+    def match_type(self, operator: Operator, value_type) -> Set[int]:
+        postings = self.values[value_type]
+
+        if isinstance(operator, In):
+            targets = {coerce(literal, value_type) for literal in operator.value} - {
+                INVALID
+            }
+            return self.ids_of(value_type, (t for t in targets if t in postings))
+
+        if isinstance(operator, Co):
+            return self.ids_of(value_type, self.containing(operator.value, value_type))
+
+        target = coerce(operator.value, value_type)
+        # nothing compares with NaN (`age:<nan`), and bisecting for it returns arbitrary bounds
+        if target is INVALID or target != target:
+            return set()
+
+        if isinstance(operator, (Gt, Ge, Lt, Le)):
+            values = self.sorted_values(value_type)
+            if values is None:
+                raise TypeError(f"{value_type.__name__} values can't be ordered")
+            try:
+                if isinstance(operator, (Gt, Le)):
+                    i = bisect.bisect_right(values, target)
+                else:
+                    i = bisect.bisect_left(values, target)
+            except TypeError:
+                # not comparable, the evaluator treats this as no match
+                return set()
+            matching = values[i:] if isinstance(operator, (Gt, Ge)) else values[:i]
+            return self.ids_of(value_type, matching)
+
+        if not isinstance(operator, Eq):
+            raise TypeError(f"Unsupported operator {operator.operation}")
+        return set(postings.get(target, ()))
+
+    def containing(self, literal, value_type) -> Iterable:
+        """Distinct values of the type containing the literal."""
+        if value_type is not str:
+            # e.g. tuples, which contain the literal itself (not its string)
+            values = []
+            for value in self.values[value_type]:
+                try:
+                    if literal in value:
+                        values.append(value)
+                except TypeError:
+                    pass
+            return values
+
+        needle = str(literal)
+        if len(needle) < self.ngram:
+            candidates = self.values[str]
+        else:
+            grams = [self.grams.get(gram, set()) for gram in ngrams(needle, self.ngram)]
+            grams.sort(key=len)
+            candidates = grams[0].intersection(*grams[1:])
+
+        return [value for value in candidates if needle in value]
+
+
+class IndexedCollection:
+    """
+    A collection of dicts or objects with indexes on the queried keys, see the module docstring.
+
+    It is an executor for `query.Query`, e.g. `Query(executor=IndexedCollection(records))`.
+    """
+
+    def __init__(
+        self, records: Iterable = (), keys: Iterable[str] = (), ngram: int = NGRAM_SIZE
+    ):
+        self.ngram = ngram
+        # id -> record, ids increase so the dict keeps the insertion order
+        self.records: Dict[int, object] = {}
+        self.indexes: Dict[str, KeyIndex] = {}
+        self._ids = count()
+
+        for key in keys:
+            self.index(key)
+        self.extend(records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records.values())
+
+    def add(self, record) -> int:
+        """Add a record and return its id."""
+        record_id = next(self._ids)
+        self.records[record_id] = record
+        for index in self.indexes.values():
+            index.add(record_id, record)
+        return record_id
+
+    def extend(self, records: Iterable) -> List[int]:
+        return [self.add(record) for record in records]
+
+    def remove(self, record_id: int):
+        record = self.records.pop(record_id)
+        for index in self.indexes.values():
+            index.remove(record_id, record)
+
+    def index(self, key: str) -> KeyIndex:
+        """The index of the key, built from the records when it is first used."""
+        index = self.indexes.get(key)
+        if index is None:
+            index = KeyIndex(key, self.ngram)
+            for record_id, record in self.records.items():
+                index.add(record_id, record)
+            self.indexes[key] = index
+        return index
+
+    def match(self, operator: Operator) -> Set[int]:
+        """Ids of the records matching the Operator tree."""
+        if isinstance(operator, Not):
+            return self.records.keys() - self.match(operator.args[0])
+
+        if isinstance(operator, Or):
+            ids = set()
+            for arg in operator.args:
+                ids |= self.match(arg)
+            return ids
+
+        if isinstance(operator, And):
+            return self.match_and(operator.args)
+
+        if isinstance(operator, LogicalOperator):
+            raise TypeError(f"Unsupported operator {operator.operation}")
+
+        return self.index(operator.key).match(operator, self.records)
+
+    def match_and(self, args) -> Set[int]:
+        # hash lookups first, they are cheap and usually the most selective
+        args = sorted(args, key=lambda arg: not isinstance(arg, (Eq, In)))
+        ids = None
+
+        for i, arg in enumerate(args):
+            if ids is not None and len(ids) <= len(self.records) * VERIFY_FRACTION:
+                # few candidates left, checking them is cheaper than the postings of the rest
+                predicate = compile_predicate(And(*args[i:]))
+                return {
+                    record_id for record_id in ids if predicate(self.records[record_id])
+                }
+
+            if isinstance(arg, Not):
+                # subtracted instead of intersecting with the complement
+                if ids is None:
+                    ids = set(self.records)
+                ids -= self.match(arg.args[0])
+            elif ids is None:
+                ids = self.match(arg)
+            else:
+                ids &= self.match(arg)
+
+            if not ids:
+                break
+
+        return set(self.records) if ids is None else ids
+
+    def evaluate(self, filter_query: FilterQuery) -> list:
+        """Same as `evaluator.evaluate(filter_query, records)`."""
+        records = [self.records[i] for i in sorted(self.match(filter_query.query))]
+
+        if filter_query.sort:
+            sort_records(records, filter_query.sort)
+
+        start = filter_query.offset or 0
+        stop = None if filter_query.limit is None else start + filter_query.limit
+        return records[start:stop]
+
+    def count(self, filter_query: FilterQuery) -> int:
+        return len(self.match(filter_query.query))
+
+    __call__ = evaluate
@@ -1,13 +1,25 @@
+import asyncio
 import json
 import logging
-from typing import List, Mapping
-from django.db.models import Q, QuerySet
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from dataclasses import dataclass
-from urllib.parse import unquote_plus
-
-from python.filters.types import FilterQuery
+from datetime import datetime, time
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    ImproperlyConfigured,
+    ValidationError,
+)
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, F, Max, Min, OuterRef, Prefetch, Q, QuerySet
+
+from ..types import FilterQuery
 
 from .. import types as fqt
+from ..optimizer import optimize
+from ..parsers.base import ParserError
+from ..parsers.github import GithubSyntaxParser
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +32,7 @@ EXPRESSION_MAPPING = {
     "ge": "gte",
     "lt": "lt",
     "le": "lte",
+    "in": "in",
 }
 
 
@@ -60,100 +73,806 @@ def query_to_q(
     if isinstance(filter_query, fqt.Co):
         return Q(**{f"{filter_query.key}__contains": filter_query.value})
 
+    if isinstance(filter_query, fqt.In):
+        return Q(**{f"{filter_query.key}__in": filter_query.value})
+
     raise ValueError(f"Unsupported filter query: {filter_query}")
 
 
+# Lookups for the compiled backend, Eq uses the implicit `exact` lookup
+Q_LOOKUPS = {
+    fqt.Eq: None,
+    fqt.Gt: "gt",
+    fqt.Ge: "gte",
+    fqt.Lt: "lt",
+    fqt.Le: "lte",
+    fqt.Co: "contains",
+    fqt.In: "in",
+}
+
+Q_CACHE_SIZE = 1024
+
+
+def _and_q(operator):
+    return Q(*[compile_q(arg) for arg in operator.args], _connector=Q.AND)
+
+
+def _or_q(operator):
+    if not operator.args:
+        # an empty disjunction matches nothing
+        return Q(pk__in=[])
+    return Q(*[compile_q(arg) for arg in operator.args], _connector=Q.OR)
+
+
+def _not_q(operator):
+    return Q(compile_q(operator.args[0]), _negated=True)
+
+
+def _lookup_q(lookup):
+    def build(operator):
+        key = operator.key if lookup is None else f"{operator.key}__{lookup}"
+        return Q((key, operator.value))
+
+    return build
+
+
+Q_BUILDERS = {
+    fqt.And: _and_q,
+    fqt.Or: _or_q,
+    fqt.Not: _not_q,
+    **{
+        operator_class: _lookup_q(lookup)
+        for operator_class, lookup in Q_LOOKUPS.items()
+    },
+}
+
+
+def _get_q_builder(operator_class):
+    # exact type first, then fall back to the MRO for subclasses
+    for klass in operator_class.__mro__:
+        if klass in Q_BUILDERS:
+            return Q_BUILDERS[klass]
+    raise ValueError(f"Unsupported filter query: {operator_class.__name__}")
+
+
+@lru_cache(maxsize=Q_CACHE_SIZE)
+def compile_q(operator: fqt.Operator) -> Q:
+    """
+    Compiled alternative to `query_to_q`: dispatches through a type-keyed table, builds every
+    And/Or node in one step instead of folding with `&=`/`|=`, and caches the resulting Q per
+    structurally identical tree. The returned Q is shared, combine it (`&`, `|`, `~`) instead
+    of mutating it in place.
+    """
+    return _get_q_builder(operator.__class__)(operator)
+
+
+class FilterError(ValueError):
+    """Raised for filters, sort keys or cursors a client is not allowed to (or can't) use."""
+
+
+def map_keys(operator: fqt.Operator, get_key) -> fqt.Operator:
+    """Return a copy of the tree with every key replaced by `get_key(key, operator)`."""
+    if isinstance(operator, fqt.LogicalOperator):
+        return operator.__class__(*[map_keys(arg, get_key) for arg in operator.args])
+
+    return operator.__class__(get_key(operator.key, operator), operator.value)
+
+
+def sort_to_order_by(sort: List[fqt.Sort]) -> List[str]:
+    return [f"{'-' if s.descending else ''}{s.key}" for s in sort]
+
+
+# Relation planning
+#
+# Filter and sort keys like `author__team__name` join related tables. The same relations are
+# usually accessed afterwards (e.g. by serializers), so they are loaded up front: forward
+# foreign keys and one-to-ones with `select_related`, to-many relations with `prefetch_related`.
+# Joining a to-many relation in the filter duplicates rows; the filter is then evaluated in an
+# `EXISTS` subquery (or with `distinct()`), and sorting by a to-many field uses its min/max.
+
+
+@dataclass
+class RelationHop:
+    path: str
+    model: type
+    to_many: bool
+
+
+def relation_hops(model, key: str) -> List[RelationHop]:
+    """The relations traversed by a filter or sort key, e.g. `author__team__name`."""
+    hops = []
+    names = key.split("__")
+    for i, name in enumerate(names[:-1]):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            break
+        if not field.is_relation or field.related_model is None:
+            break
+
+        model = field.related_model
+        hops.append(
+            RelationHop(
+                path="__".join(names[: i + 1]),
+                model=model,
+                to_many=bool(field.one_to_many or field.many_to_many),
+            )
+        )
+    return hops
+
+
+@lru_cache(maxsize=Q_CACHE_SIZE)
+def is_field_path(model, key: str) -> bool:
+    """Whether every part of the key is a field, without a lookup or transform (`name__iexact`)."""
+    names = key.split("__")
+    for i, name in enumerate(names):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        if i < len(names) - 1:
+            if not field.is_relation or field.related_model is None:
+                return False
+            model = field.related_model
+    return True
+
+
+def leaf_keys(operator: fqt.Operator):
+    if isinstance(operator, fqt.LogicalOperator):
+        for arg in operator.args:
+            yield from leaf_keys(arg)
+    else:
+        yield operator.key
+
+
+@dataclass
+class RelationPlan:
+    select_related: List[str]
+    prefetch_related: list
+    # the filter joins a to-many relation, rows may be duplicated
+    filter_to_many: bool
+    # sort keys traversing a to-many relation
+    to_many_sort_keys: List[str]
+
+
+def plan_relations(model, filter_query: FilterQuery) -> RelationPlan:
+    keys = [*leaf_keys(filter_query.query)]
+    sort_keys = [s.key for s in filter_query.sort]
+
+    select_related = {}
+    prefetch_related = {}
+    filter_to_many = False
+    to_many_sort_keys = []
+
+    for key in [*keys, *sort_keys]:
+        hops = relation_hops(model, key)
+        first_to_many = next((i for i, hop in enumerate(hops) if hop.to_many), None)
+
+        if first_to_many is None:
+            if hops:
+                select_related[hops[-1].path] = True
+            continue
+
+        if key in keys:
+            filter_to_many = True
+        if key in sort_keys:
+            to_many_sort_keys.append(key)
+
+        if first_to_many:
+            select_related[hops[first_to_many - 1].path] = True
+
+        # prefetch up to the first to-many hop, joining the single valued relations after it
+        # in the prefetch query; further to-many hops are prefetched separately
+        lookup = hops[first_to_many].path
+        joins = prefetch_related.setdefault(lookup, {})
+        for hop in hops[first_to_many + 1 :]:
+            if hop.to_many:
+                prefetch_related.setdefault(hop.path, {})
+                break
+            joins[hop.path[len(lookup) + 2 :]] = True
+
+    # select_related("a__b") already covers "a"
+    select_related = [
+        path
+        for path in select_related
+        if not any(other.startswith(path + "__") for other in select_related)
+    ]
+
+    prefetches = []
+    for lookup, joins in prefetch_related.items():
+        if not joins:
+            prefetches.append(lookup)
+            continue
+        related_model = relation_hops(model, f"{lookup}__pk")[-1].model
+        prefetches.append(
+            Prefetch(
+                lookup, queryset=related_model._default_manager.select_related(*joins)
+            )
+        )
+
+    return RelationPlan(
+        select_related=select_related,
+        prefetch_related=prefetches,
+        filter_to_many=filter_to_many,
+        to_many_sort_keys=to_many_sort_keys,
+    )
+
+
+def apply_filter_query(
+    qs: QuerySet, filter_query: FilterQuery, dedupe: str = "auto"
+) -> QuerySet:
+    """
+    Filter and sort the queryset and load the relations the keys traverse.
+
+    `dedupe` decides how rows duplicated by to-many joins are avoided: "exists" evaluates the
+    filter in an EXISTS subquery, "distinct" uses `distinct()`, "auto" prefers EXISTS unless the
+    queryset is already distinct.
+    """
+    plan = plan_relations(qs.model, filter_query)
+    # Eq on a key with a lookup can't become an In, `name__iexact__in` is no valid lookup
+    q = compile_q(
+        optimize(filter_query.query, lambda key: is_field_path(qs.model, key))
+    )
+
+    if plan.filter_to_many:
+        if dedupe == "auto":
+            dedupe = "distinct" if qs.query.distinct else "exists"
+
+        if dedupe == "exists":
+            matching = qs.model._base_manager.filter(q, pk=OuterRef("pk"))
+            qs = qs.filter(Exists(matching))
+        else:
+            qs = qs.filter(q).distinct()
+    else:
+        qs = qs.filter(q)
+
+    if filter_query.sort:
+        order_by = []
+        for i, s in enumerate(filter_query.sort):
+            key = s.key
+            if key in plan.to_many_sort_keys:
+                # one value per row: the smallest related value ascending, the largest descending
+                key = f"_sort_{i}"
+                qs = qs.annotate(**{key: (Max if s.descending else Min)(s.key)})
+            order_by.append(f"{'-' if s.descending else ''}{key}")
+        qs = qs.order_by(*order_by)
+
+    if plan.select_related:
+        qs = qs.select_related(*plan.select_related)
+    if plan.prefetch_related:
+        qs = qs.prefetch_related(*plan.prefetch_related)
+
+    return qs
+
+
 def filter_queryset(
     qs: QuerySet,
     filter_query: FilterQuery,
-):
+) -> QuerySet:
     """
-    Applies the given filters (usually provided by a client via API call arguments) to the django QuerySet by
-    transforming them into valid django ORM & extending the original query.
+    Applies the FilterQuery (usually provided by a client via API call arguments) to the django
+    QuerySet: the operator tree becomes a filter, `sort` the ordering and `offset`/`limit` a slice.
+    Keys are used as ORM lookups as they are, see `FilterViewSetMixin` for mapping public names.
     """
-    order_by_filter = None
+    qs = apply_filter_query(qs, filter_query)
 
-    if not filters:
-        filters = []
+    if filter_query.offset or filter_query.limit is not None:
+        start = filter_query.offset or 0
+        stop = None if filter_query.limit is None else start + filter_query.limit
+        qs = qs[start:stop]
 
-    if order_by_filter_name:
-        order_by_filter = next(
-            (f for f in filters if f.name == order_by_filter_name), None
-        )
+    return qs
+
+
+class QuerySetExecutor:
+    """Executor for `query.Query`, returning the (lazy) filtered queryset."""
+
+    def __init__(self, queryset: QuerySet):
+        self.queryset = queryset
+
+    def __call__(self, filter_query: FilterQuery) -> QuerySet:
+        return filter_queryset(self.queryset.all(), filter_query)
+
+    def count(self, filter_query: FilterQuery) -> int:
+        return count_queryset(self.queryset.all(), filter_query)
+
+
+def count_queryset(qs: QuerySet, filter_query: FilterQuery) -> int:
+    """Number of rows matching the filter, ignoring sort, offset and limit."""
+    qs = apply_filter_query(qs, FilterQuery(filter_query.query))
+    return qs.order_by().count()
 
-    if filter_fields is not None:
-        filters = [f for f in filters if f.name in filter_fields]
 
-    def _build_filter_query(filter_path, filter_, lookup_exps=None):
-        if not lookup_exps:
-            lookup_exps = dict()
+# Asynchronous execution
+#
+# The async ORM methods still run the queries in a thread (one per connection), but don't block
+# the event loop of ASGI services while waiting for the database.
 
-        lookup_exp = (
-            lookup_exps.get(filter_.name)
-            or EXPRESSION_MAPPING.get(filter_.expression)
-            or default_lookup_exp
+# rows fetched per round trip by `aiterator`, required when relations are prefetched
+ASYNC_CHUNK_SIZE = 2000
+
+
+async def aevaluate_queryset(
+    qs: QuerySet, filter_query: FilterQuery, chunk_size: int = ASYNC_CHUNK_SIZE
+) -> list:
+    """Asynchronous `filter_queryset`, returning the objects."""
+    qs = filter_queryset(qs, filter_query)
+    return [obj async for obj in qs.aiterator(chunk_size=chunk_size)]
+
+
+async def acount_queryset(qs: QuerySet, filter_query: FilterQuery) -> int:
+    """Asynchronous `count_queryset`."""
+    qs = apply_filter_query(qs, FilterQuery(filter_query.query))
+    return await qs.order_by().acount()
+
+
+async def aevaluate_queryset_with_count(
+    qs: QuerySet, filter_query: FilterQuery
+) -> Tuple[list, int]:
+    """A page of objects and the total number of matches, queried concurrently."""
+    return tuple(
+        await asyncio.gather(
+            aevaluate_queryset(qs, filter_query), acount_queryset(qs, filter_query)
         )
-        lookup = f"{filter_path}__{lookup_exp}"
+    )
 
-        query = Q()
 
-        for v in filter_.value:
-            query |= Q(**{lookup: v})
+class AsyncQuerySetExecutor(QuerySetExecutor):
+    """Asynchronous executor for `query.Query`, returning a list of objects."""
 
-        return query
+    async def __call__(self, filter_query: FilterQuery) -> list:
+        return await aevaluate_queryset(self.queryset.all(), filter_query)
 
-    def _build_order_by(filter_):
-        order_by = []
-        for value in filter_.value:
-            is_reversed = value.startswith("-")
-            value = value[1:] if is_reversed else value
-            if value in sort_fields:
-                prefix = "-" if is_reversed else ""
-                order_by.append(f"{prefix}{sort_fields[value]}")
-
-        return order_by
-
-    # Extend original queryset with filters & sorts
-    for filter_ in filters:
-        filter_query = _build_filter_query(
-            filter_fields[filter_.name], filter_, lookup_exps
+    async def count(self, filter_query: FilterQuery) -> int:
+        return await acount_queryset(self.queryset.all(), filter_query)
+
+
+# Keyset (seek) pagination
+#
+# Instead of `OFFSET n`, which makes the database produce and skip n rows, the next page is
+# selected with a condition on the sort keys of the last row of the previous page, e.g. for
+# `sort=-created,id`: `created < c OR (created = c AND id > i)`. With an index on the sort keys
+# every page costs the same. Null sort values are ordered last in both directions, on every
+# database.
+
+
+def keyset_sort(sort: List[fqt.Sort], pk_name: str = "pk") -> List[fqt.Sort]:
+    """Append the primary key as a tiebreaker so the ordering is total."""
+    if any(s.key in (pk_name, "pk") for s in sort):
+        return list(sort)
+    return [*sort, fqt.Sort(pk_name)]
+
+
+def keyset_order_by(sort: List[fqt.Sort]) -> list:
+    return [
+        (
+            F(s.key).desc(nulls_last=True)
+            if s.descending
+            else F(s.key).asc(nulls_last=True)
         )
-        qs = qs.exclude(filter_query) if filter_.exclude else qs.filter(filter_query)
+        for s in sort
+    ]
 
-    if order_by_filter:
-        order_by = _build_order_by(order_by_filter)
-        if order_by:
-            qs = qs.order_by(*order_by)
 
-    return qs
+def keyset_q(sort: List[fqt.Sort], values: list) -> Q:
+    """
+    Condition selecting the rows after the row with the given sort key values, in the order of
+    `keyset_order_by`.
+    """
+    conditions = []
+    for i, s in enumerate(sort):
+        equal = [
+            (
+                (f"{sort[j].key}__isnull", True)
+                if values[j] is None
+                else (sort[j].key, values[j])
+            )
+            for j in range(i)
+        ]
+        if values[i] is None:
+            # only nulls follow a null
+            continue
+        lookup = "lt" if s.descending else "gt"
+        after = Q((f"{s.key}__{lookup}", values[i])) | Q((f"{s.key}__isnull", True))
+        conditions.append(Q(*equal, after))
+
+    if not conditions:
+        return Q(pk__in=[])
+    return Q(*conditions, _connector=Q.OR)
+
+
+def get_path_value(obj, path: str):
+    for name in path.split("__"):
+        obj = getattr(obj, name)
+        # null foreign key
+        if obj is None:
+            return None
+    return obj
+
+
+CURSOR_TYPES = (str, int, float, bool)
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Unlike DjangoJSONEncoder keeps the microseconds of datetimes and times."""
+
+    def default(self, o):
+        if isinstance(o, (datetime, time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values: list) -> str:
+    data = json.dumps(values, cls=CursorEncoder, separators=(",", ":"))
+    return urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list:
+    try:
+        data = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, TypeError) as e:
+        raise FilterError("Invalid cursor") from e
+
+    if not isinstance(values, list) or len(values) != length:
+        raise FilterError("Invalid cursor")
+
+    # only the scalars encode_cursor writes
+    if not all(value is None or isinstance(value, CURSOR_TYPES) for value in values):
+        raise FilterError("Invalid cursor")
+
+    return values
+
+
+def paginate_keyset(
+    qs: QuerySet, sort: List[fqt.Sort], limit: int, cursor: Optional[str] = None
+) -> Tuple[list, Optional[str]]:
+    """
+    Return one page of at most `limit` objects after `cursor` and the cursor of the next page
+    (None on the last page).
+    """
+    for s in sort:
+        if any(hop.to_many for hop in relation_hops(qs.model, s.key)):
+            raise FilterError(
+                f"Can't paginate by {s.key!r}, it has more than one value per row"
+            )
+
+    sort = keyset_sort(sort, qs.model._meta.pk.name)
+    qs = qs.order_by(*keyset_order_by(sort))
+
+    if cursor:
+        try:
+            qs = qs.filter(keyset_q(sort, decode_cursor(cursor, len(sort))))
+        except (ValueError, TypeError, ValidationError) as e:
+            # e.g. a string for a numeric field, FilterError is a ValueError as well
+            if isinstance(e, FilterError):
+                raise
+            raise FilterError("Invalid cursor") from e
+
+    # fetch one extra row to know whether there is a next page
+    page = list(qs[: limit + 1])
+    if len(page) <= limit:
+        return page, None
+
+    page = page[:limit]
+    last = page[-1]
+    return page, encode_cursor([get_path_value(last, s.key) for s in sort])
+
+
+# Field registry
+#
+# Maps the public filter keys clients use to ORM paths and knows which fields are indexed, so
+# that filters which would make the database scan the whole table can be rejected up front.
+
+# operators a (btree) index can serve
+INDEXABLE_OPERATORS = (fqt.Eq, fqt.In, fqt.Gt, fqt.Ge, fqt.Lt, fqt.Le)
+
+# what to do with predicates that can't use an index
+UNINDEXED_ALLOW = "allow"
+UNINDEXED_REJECT = "reject"
+# allowed only when ANDed with a predicate that can use an index
+UNINDEXED_REQUIRE_INDEXED = "require_indexed"
+
+
+@dataclass(frozen=True)
+class FilterField:
+    name: str
+    # ORM path, defaults to the name
+    path: Optional[str] = None
+    # None means: inferred from the model in `FieldRegistry.from_model`
+    indexed: Optional[bool] = None
+    # lookup used instead of `exact` for equality, e.g. "iexact"
+    lookup: Optional[str] = None
+    sortable: bool = False
+
+    @property
+    def orm_path(self):
+        return self.path or self.name
+
+    def uses_index(self, operator: fqt.Operator) -> bool:
+        return bool(self.indexed) and isinstance(operator, INDEXABLE_OPERATORS)
+
+
+def _is_first_index_column(model, name) -> bool:
+    meta = model._meta
+    field_groups = [index.fields for index in meta.indexes]
+    field_groups += [getattr(c, "fields", ()) for c in meta.constraints]
+    field_groups += list(meta.unique_together)
+    return any(fields and fields[0].lstrip("-") == name for fields in field_groups)
+
+
+def is_indexed(model, path: str) -> bool:
+    """Whether the field at the end of `path` is the leading column of an index."""
+    names = path.split("__")
+    field = None
+
+    for i, name in enumerate(names):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            if field is None:
+                raise ImproperlyConfigured(f"{model.__name__} has no field {name!r}")
+            # the rest of the path is a lookup or transform, e.g. `name__lower`
+            break
+
+        owner = model
+        if field.is_relation and i < len(names) - 1:
+            model = field.related_model
+
+    return bool(
+        getattr(field, "primary_key", False)
+        or getattr(field, "unique", False)
+        or getattr(field, "db_index", False)
+        or _is_first_index_column(owner, field.name)
+    )
+
+
+class FieldRegistry:
+    def __init__(
+        self, fields: Iterable[FilterField], unindexed: str = UNINDEXED_REJECT
+    ):
+        if unindexed not in (
+            UNINDEXED_ALLOW,
+            UNINDEXED_REJECT,
+            UNINDEXED_REQUIRE_INDEXED,
+        ):
+            raise ImproperlyConfigured(
+                f"Unknown policy for unindexed filters {unindexed!r}"
+            )
+
+        self.fields = {field.name: field for field in fields}
+        self.unindexed = unindexed
+
+    @classmethod
+    def from_model(cls, model, fields, order_by_fields=(), lookup_exps=None, **kwargs):
+        """
+        Build the registry from the view style configuration: `fields` and `order_by_fields`
+        are names, `(name, orm_path)` tuples or FilterField instances. Whether a field is indexed
+        is read from the model unless set explicitly.
+        """
+        lookup_exps = lookup_exps or {}
+        sortable = {f if isinstance(f, str) else f[0] for f in order_by_fields}
+
+        registered = {}
+        for f in [*fields, *order_by_fields]:
+            if isinstance(f, str):
+                f = FilterField(f)
+            elif not isinstance(f, FilterField):
+                f = FilterField(*f)
+
+            if f.name in registered:
+                continue
+
+            registered[f.name] = FilterField(
+                name=f.name,
+                path=f.orm_path,
+                indexed=(
+                    is_indexed(model, f.orm_path) if f.indexed is None else f.indexed
+                ),
+                lookup=f.lookup or lookup_exps.get(f.name),
+                sortable=f.sortable or f.name in sortable,
+            )
+
+        return cls(registered.values(), **kwargs)
+
+    def get(self, name) -> FilterField:
+        try:
+            return self.fields[name]
+        except KeyError:
+            raise FilterError(f"Filtering by {name!r} is not allowed")
+
+    def uses_index(self, operator: fqt.Operator) -> bool:
+        """Whether the database can answer `operator` from an index instead of a full scan."""
+        if isinstance(operator, fqt.And):
+            return any(self.uses_index(arg) for arg in operator.args)
+
+        if isinstance(operator, fqt.Or):
+            return bool(operator.args) and all(
+                self.uses_index(arg) for arg in operator.args
+            )
+
+        if isinstance(operator, fqt.Not):
+            return False
+
+        return self.get(operator.key).uses_index(operator)
+
+    def check(
+        self, operator: fqt.Operator, restricted: bool = False, negated: bool = False
+    ):
+        """
+        Raise FilterError for predicates on unindexed fields the policy doesn't allow. Predicates
+        under a Not can't use an index, whatever their field.
+        """
+        if isinstance(operator, fqt.LogicalOperator):
+            negated = negated or isinstance(operator, fqt.Not)
+            if isinstance(operator, fqt.And) and not restricted and not negated:
+                restricted = self.uses_index(operator)
+            for arg in operator.args:
+                self.check(arg, restricted, negated)
+            return
+
+        field = self.get(operator.key)
+        if self.unindexed == UNINDEXED_ALLOW or (
+            field.uses_index(operator) and not negated
+        ):
+            return
+
+        if self.unindexed == UNINDEXED_REJECT:
+            raise FilterError(
+                f"Filtering by {operator.operation}({field.name}) is not allowed, "
+                f"it can't use an index"
+            )
+
+        if not restricted:
+            raise FilterError(
+                f"Filtering by {operator.operation}({field.name}) is only allowed in combination "
+                f"(AND) with a filter on an indexed field"
+            )
+
+    def resolve(self, operator: fqt.Operator) -> fqt.Operator:
+        """Check the tree against the policy and replace public names with ORM paths."""
+        self.check(operator)
+
+        def get_path(key, leaf):
+            field = self.get(key)
+            if isinstance(leaf, fqt.Eq) and field.lookup:
+                return f"{field.orm_path}__{field.lookup}"
+            return field.orm_path
+
+        return map_keys(operator, get_path)
+
+    def resolve_sort(self, sort: fqt.Sort) -> fqt.Sort:
+        field = self.fields.get(sort.key)
+        if field is None or not field.sortable:
+            raise FilterError(f"Sorting by {sort.key!r} is not allowed")
+
+        resolved = fqt.Sort(field.orm_path)
+        resolved.ascending = sort.ascending
+        return resolved
 
 
 class FilterViewSetMixin:
+    """
+    Filtering, sorting and keyset pagination for django rest framework views.
+
+    `?query=name:John age:>30&sort=-age,name&limit=20&cursor=...`
+
+    `fields` and `order_by_fields` list the public names clients may filter and sort by, either
+    as names, `(name, orm_path)` tuples or FilterField instances. `lookup_exps` optionally
+    overrides the lookup used for equality per public name (e.g. `{"name": "iexact"}`).
+    `unindexed_filters` decides what happens to filters that can't use an index (see
+    FieldRegistry). Invalid queries are rejected with a validation error instead of silently
+    returning unfiltered results.
+    """
+
     order_by_fields = []
     fields = []
     lookup_exps = {}
+    unindexed_filters = UNINDEXED_REQUIRE_INDEXED
+
+    parser_class = GithubSyntaxParser
+    parser_backend = "pratt"
 
     query_name = "query"
+    sort_name = "sort"
+    limit_name = "limit"
+    cursor_name = "cursor"
+
+    # return keyset paginated pages from `list`, with the next page's cursor
+    keyset_pagination = False
+    default_limit = 50
+    max_limit = 1000
+
+    def get_filter_query(self) -> FilterQuery:
+        params = self.request.query_params
+
+        query = params.get(self.query_name)
+        if query:
+            try:
+                filter_query = self.parser_class(
+                    query, backend=self.parser_backend
+                ).parse()
+            except ParserError as e:
+                raise FilterError(f"Invalid query: {e.message}") from e
+            filter_query.query = self.get_field_registry().resolve(filter_query.query)
+        else:
+            filter_query = FilterQuery(fqt.And())
+
+        sort = params.get(self.sort_name)
+        if sort:
+            registry = self.get_field_registry()
+            filter_query.sort = [
+                registry.resolve_sort(fqt.Sort(key)) for key in sort.split(",") if key
+            ]
+
+        limit = params.get(self.limit_name)
+        if limit is not None or self.keyset_pagination:
+            filter_query.limit = self.get_limit(limit)
+
+        return filter_query
+
+    def get_field_registry(self) -> FieldRegistry:
+        registry = self.__class__.__dict__.get("_field_registry")
+        if registry is None:
+            # built once per view class, reading the model meta is not free
+            registry = FieldRegistry.from_model(
+                super().get_queryset().model,
+                self.fields,
+                self.order_by_fields,
+                lookup_exps=self.lookup_exps,
+                unindexed=self.unindexed_filters,
+            )
+            self.__class__._field_registry = registry
+        return registry
+
+    def get_limit(self, limit):
+        if limit is None:
+            return self.default_limit
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise FilterError(f"Invalid limit {limit!r}")
+        if limit < 1:
+            raise FilterError("Limit must be positive")
+        return min(limit, self.max_limit)
+
+    def handle_filter_error(self, error: FilterError):
+        from rest_framework.exceptions import ValidationError
+
+        raise ValidationError({self.query_name: [str(error)]}) from error
 
     def get_queryset(self):
         qs = super().get_queryset()
         try:
-            filters_json_urlencoded = self.request.query_params.get(self.query_name)
-            if not filters_json_urlencoded:
-                return qs
-            filters = json.loads(unquote_plus(filters_json_urlencoded))
-            filters = [TableFilter(**f) for f in filters]
-            qs = filter_queryset(
-                qs,
-                filters,
-                filter_fields=dict(
-                    [(f, f) if isinstance(f, str) else f for f in self.fields]
-                ),
-                sort_fields=dict(
-                    [(f, f) if isinstance(f, str) else f for f in self.order_by_fields]
-                ),
-                lookup_exps=self.lookup_exps,
+            self.filter_query = self.get_filter_query()
+            qs = apply_filter_query(qs, self.filter_query)
+        except FilterError as e:
+            self.handle_filter_error(e)
+        except (ValueError, TypeError, ValidationError) as e:
+            # the fields reject values of the wrong type, e.g. `age:abc`
+            messages = e.messages if isinstance(e, ValidationError) else [str(e)]
+            self.handle_filter_error(
+                FilterError(f"Invalid value: {' '.join(messages)}")
             )
-        except Exception as e:
-            logger.warn(f"Filters couldn't be applied to queryset: {str(e)}")
         return qs
+
+    def get_keyset_page(self, qs):
+        try:
+            return paginate_keyset(
+                qs,
+                self.filter_query.sort,
+                self.filter_query.limit,
+                self.request.query_params.get(self.cursor_name),
+            )
+        except FilterError as e:
+            self.handle_filter_error(e)
+
+    def list(self, request, *args, **kwargs):
+        if not self.keyset_pagination:
+            return super().list(request, *args, **kwargs)
+
+        from rest_framework.response import Response
+
+        page, next_cursor = self.get_keyset_page(self.get_queryset())
+        serializer = self.get_serializer(page, many=True)
+        return Response({"next": next_cursor, "results": serializer.data})
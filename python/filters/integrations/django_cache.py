@@ -0,0 +1,474 @@
+"""
+Result cache for filtered querysets, invalidated by model signals.
+
+    cache = FilterCache()
+    books = cache.get_objects(Book.objects.all(), filter_query)
+
+Entries are keyed by the model, the SQL of the base queryset and the canonical serialization of
+the FilterQuery. An entry stores the primary keys of the matching page (the objects are fetched
+by primary key on a hit) or, with `get_page(qs, filter_query, serialize)`, the serialized page.
+
+Every entry depends on tags: the fields its filter and sort keys read, e.g. `book.year` and
+`author.name` for `author__name:Ann sort=year`, and the rows of the models they traverse.
+Saving an object bumps the version of the tags of the fields that changed, so entries which
+don't read them stay valid; creating or deleting an object bumps the rows tag of the model.
+Entries store the tag versions they were computed with and are discarded on lookup when a
+version changed.
+
+Writes that don't send signals (`QuerySet.update`, `bulk_create`, raw SQL) have to be followed
+by `cache.invalidate(model)`.
+"""
+
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.core.exceptions import EmptyResultSet, FieldDoesNotExist
+from django.db.models import QuerySet, signals
+
+from ..serialization import SerializationError, dumps
+from ..types import FilterQuery
+from .django import filter_queryset, leaf_keys, plan_relations
+
+RESULT_CACHE_SIZE = 1024
+
+# tag bumped when objects of a model are created or deleted
+ROWS = "+"
+# tag bumped on every write to a model
+ANY = "*"
+
+
+# Backends
+#
+# A backend stores values by string key with `get`, `get_many`, `set` and `delete`, the same
+# methods as django's cache framework, so `django.core.cache.caches["default"]` works as well.
+
+
+class LocalMemoryBackend:
+    """Bounded, thread-safe in-process LRU cache."""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE):
+        self._lock = threading.Lock()
+        # key -> (value, expiry time or None)
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value, expires = self._entries[key]
+            except KeyError:
+                return default
+
+            if expires is not None and expires <= time.monotonic():
+                del self._entries[key]
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def get_many(self, keys: Iterable[str]) -> dict:
+        missing = object()
+        values = {key: self.get(key, missing) for key in keys}
+        return {key: value for key, value in values.items() if value is not missing}
+
+    def set(self, key, value, timeout: Optional[float] = None):
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class RedisBackend:
+    """Stores pickled values with a redis client (`redis.Redis` or `LocalRedis`)."""
+
+    def __init__(self, client, prefix: str = ""):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        data = self.client.get(self.prefix + key)
+        return default if data is None else pickle.loads(data)
+
+    def get_many(self, keys: Iterable[str]) -> dict:
+        keys = list(keys)
+        values = self.client.mget([self.prefix + key for key in keys]) if keys else []
+        return {
+            key: pickle.loads(data)
+            for key, data in zip(keys, values)
+            if data is not None
+        }
+
+    def set(self, key, value, timeout: Optional[float] = None):
+        # redis expects whole seconds
+        ex = None if timeout is None else max(1, round(timeout))
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ex)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the subset of the redis client API used by RedisBackend, for tests
+    and development without a redis server. Values are stored as bytes like redis does.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (bytes, expiry time or None)
+        self._data = {}
+
+    def _get(self, name):
+        item = self._data.get(name)
+        if item is None:
+            return None
+        data, expires = item
+        if expires is not None and expires <= time.monotonic():
+            del self._data[name]
+            return None
+        return data
+
+    def get(self, name) -> Optional[bytes]:
+        with self._lock:
+            return self._get(name)
+
+    def mget(self, names) -> List[Optional[bytes]]:
+        with self._lock:
+            return [self._get(name) for name in names]
+
+    def set(self, name, value, ex: Optional[int] = None):
+        if isinstance(value, str):
+            value = value.encode()
+        with self._lock:
+            self._data[name] = (
+                bytes(value),
+                None if ex is None else time.monotonic() + ex,
+            )
+        return True
+
+    def delete(self, *names) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def flushdb(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Dependencies
+
+
+def key_dependencies(model, key: str) -> List[Tuple[type, str]]:
+    """
+    The (model, tag) pairs the value of a filter or sort key depends on, e.g. for
+    `author__team__name` on Book: (Book, "author"), (Author, ROWS), (Author, "team"),
+    (Team, ROWS) and (Team, "name").
+    """
+    dependencies = []
+    for name in key.split("__"):
+        if name == "pk":
+            name = model._meta.pk.name
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # the rest of the key is a lookup or transform, e.g. `name__iexact`
+            break
+
+        if field.concrete:
+            dependencies.append((model, field.name))
+        elif field.is_relation and getattr(field, "field", None) is not None:
+            # reverse relation, it is stored in the foreign key (or m2m field) of the other model
+            dependencies.append((field.field.model, field.field.name))
+
+        if not field.is_relation or field.related_model is None:
+            break
+        model = field.related_model
+        dependencies.append((model, ROWS))
+
+    return dependencies
+
+
+def query_dependencies(model, filter_query: FilterQuery) -> List[Tuple[type, str]]:
+    keys = [*leaf_keys(filter_query.query), *(s.key for s in filter_query.sort)]
+    dependencies = {(model, ROWS): True}
+    for key in keys:
+        for dependency in key_dependencies(model, key):
+            dependencies[dependency] = True
+    return list(dependencies)
+
+
+def tag_name(model, tag: str) -> str:
+    return f"{model._meta.label_lower}:{tag}"
+
+
+class FilterCache:
+    """
+    Caches the results of `filter_queryset`, see the module docstring.
+
+    `backend` defaults to a LocalMemoryBackend, `timeout` (seconds) bounds the lifetime of
+    entries in addition to the invalidation.
+    """
+
+    def __init__(
+        self, backend=None, timeout: Optional[float] = None, prefix: str = "filters"
+    ):
+        self.backend = LocalMemoryBackend() if backend is None else backend
+        self.timeout = timeout
+        self.prefix = prefix
+        # model -> names of its concrete fields entries depend on
+        self.tracked: Dict[type, set] = {}
+        # the (model, tag) dependencies whose signals are connected
+        self.tags = set()
+        self.through_models = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Lookup
+
+    def get_objects(self, qs: QuerySet, filter_query: FilterQuery) -> list:
+        """
+        The objects `filter_queryset` returns. The primary keys are cached, on a hit the
+        objects are fetched by primary key, so fields the filter doesn't read are always fresh.
+        """
+        dependencies = query_dependencies(qs.model, filter_query)
+        if qs.query.has_filters():
+            # the filters of the base queryset may read any field
+            dependencies.append((qs.model, ANY))
+
+        def compute():
+            objects = list(filter_queryset(qs, filter_query))
+            return objects, [obj.pk for obj in objects]
+
+        found, result = self.lookup(qs, filter_query, "pk", dependencies, compute)
+        return self.fetch(qs, filter_query, result) if found else result
+
+    def get_page(
+        self,
+        qs: QuerySet,
+        filter_query: FilterQuery,
+        serialize: Callable[[list], object],
+        name: Optional[str] = None,
+    ):
+        """
+        `serialize(objects)` of the objects `filter_queryset` returns, e.g. the data of a
+        serializer. Any write to the model or the related models the query traverses
+        invalidates the page, since it may contain any field. Pages are keyed by `name`,
+        which defaults to the qualified name of `serialize` (pass one for lambdas).
+        """
+        dependencies = query_dependencies(qs.model, filter_query)
+        dependencies += [(model, ANY) for model in {model for model, _ in dependencies}]
+
+        def compute():
+            page = serialize(list(filter_queryset(qs, filter_query)))
+            return page, page
+
+        name = name or f"{serialize.__module__}.{serialize.__qualname__}"
+        return self.lookup(qs, filter_query, f"page:{name}", dependencies, compute)[1]
+
+    def key(self, qs: QuerySet, filter_query: FilterQuery, kind: str) -> Optional[str]:
+        """The cache key, None if the query can't be cached."""
+        try:
+            # the SQL identifies the base queryset (its filters, annotations and joins)
+            sql = str(qs.query)
+            query = dumps(filter_query)
+        except (EmptyResultSet, SerializationError):
+            return None
+
+        identity = "\0".join((qs.model._meta.label_lower, qs.db, sql, query, kind))
+        return f"{self.prefix}:e:{hashlib.sha1(identity.encode()).hexdigest()}"
+
+    def lookup(
+        self, qs, filter_query, kind, dependencies, compute
+    ) -> Tuple[bool, object]:
+        """
+        Return (True, cached value) or (False, result) after calling `compute()`, which returns
+        the result and the value to cache.
+        """
+        key = self.key(qs, filter_query, kind)
+        if key is None:
+            return False, compute()[0]
+
+        for model, tag in dependencies:
+            self.track(model, tag)
+
+        # read the versions before querying, a write in between makes the new entry stale
+        versions = self.versions(dependencies)
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == versions:
+            self.hits += 1
+            return True, entry[1]
+
+        self.misses += 1
+        result, value = compute()
+        self.backend.set(key, (versions, value), self.timeout)
+        return False, result
+
+    def fetch(self, qs: QuerySet, filter_query: FilterQuery, pks: list) -> list:
+        """The objects with the primary keys, in the same order."""
+        plan = plan_relations(qs.model, filter_query)
+        qs = qs.filter(pk__in=pks).order_by()
+        if plan.select_related:
+            qs = qs.select_related(*plan.select_related)
+        if plan.prefetch_related:
+            qs = qs.prefetch_related(*plan.prefetch_related)
+
+        objects = {obj.pk: obj for obj in qs}
+        return [objects[pk] for pk in pks if pk in objects]
+
+    # Versions
+
+    def version_key(self, model, tag: str) -> str:
+        return f"{self.prefix}:v:{tag_name(model, tag)}"
+
+    def versions(self, dependencies) -> tuple:
+        keys = [self.version_key(model, tag) for model, tag in dependencies]
+        found = self.backend.get_many(keys)
+
+        versions = []
+        for key in keys:
+            version = found.get(key)
+            if version is None:
+                # random instead of counting from zero: a version evicted from the backend
+                # must not come back with a value an old entry was stored with
+                version = uuid.uuid4().hex
+                self.backend.set(key, version)
+            versions.append(version)
+        return tuple(versions)
+
+    def bump(self, model, tags: Iterable[str]):
+        for tag in tags:
+            self.backend.set(self.version_key(model, tag), uuid.uuid4().hex)
+
+    def invalidate(self, model, fields: Optional[Iterable[str]] = None):
+        """
+        Invalidate the entries depending on the fields of the model, all entries reading the
+        model if `fields` is None.
+        """
+        if fields is None:
+            self.bump(model, (ROWS, ANY))
+        else:
+            self.bump(model, (*fields, ANY))
+
+    # Signals
+
+    def track(self, model, tag: str):
+        if (model, tag) in self.tags:
+            return
+
+        with self._lock:
+            if model not in self.tracked:
+                self.tracked[model] = set()
+                self.connect(model)
+
+            if tag not in (ROWS, ANY):
+                field = model._meta.get_field(tag)
+                if field.many_to_many:
+                    through = field.remote_field.through
+                    signals.m2m_changed.connect(
+                        self.on_m2m_changed,
+                        sender=through,
+                        weak=False,
+                        dispatch_uid=(id(self), through),
+                    )
+                    self.through_models.add(through)
+                else:
+                    # replaced, not changed in place, signal handlers iterate it concurrently
+                    self.tracked[model] = self.tracked[model] | {tag}
+
+            self.tags.add((model, tag))
+
+    def connect(self, model):
+        uid = (id(self), model)
+        signals.post_init.connect(
+            self.on_post_init, sender=model, weak=False, dispatch_uid=uid
+        )
+        signals.post_save.connect(
+            self.on_post_save, sender=model, weak=False, dispatch_uid=uid
+        )
+        signals.post_delete.connect(
+            self.on_post_delete, sender=model, weak=False, dispatch_uid=uid
+        )
+
+    def disconnect(self):
+        """Stop receiving signals, e.g. before dropping the cache."""
+        with self._lock:
+            for model in self.tracked:
+                uid = (id(self), model)
+                signals.post_init.disconnect(sender=model, dispatch_uid=uid)
+                signals.post_save.disconnect(sender=model, dispatch_uid=uid)
+                signals.post_delete.disconnect(sender=model, dispatch_uid=uid)
+            for through in self.through_models:
+                signals.m2m_changed.disconnect(
+                    sender=through, dispatch_uid=(id(self), through)
+                )
+            self.tracked = {}
+            self.tags = set()
+            self.through_models = set()
+
+    def snapshot(self, instance) -> dict:
+        # values of the tracked fields as loaded, deferred fields are missing
+        values = instance.__dict__
+        state = {}
+        for name in self.tracked.get(instance.__class__, ()):
+            attname = instance._meta.get_field(name).attname
+            if attname in values:
+                state[name] = values[attname]
+        return state
+
+    @property
+    def state_name(self):
+        # attribute of model instances holding the snapshot
+        return f"_filter_cache_{id(self)}"
+
+    def on_post_init(self, sender, instance, **kwargs):
+        instance.__dict__[self.state_name] = self.snapshot(instance)
+
+    def on_post_save(self, sender, instance, created, update_fields=None, **kwargs):
+        previous = instance.__dict__.get(self.state_name)
+        current = self.snapshot(instance)
+        instance.__dict__[self.state_name] = current
+
+        if created:
+            self.invalidate(sender)
+        elif update_fields is not None:
+            self.invalidate(
+                sender, self.tracked.get(sender, set()) & set(update_fields)
+            )
+        elif previous is None:
+            self.invalidate(sender, self.tracked.get(sender, ()))
+        else:
+            # fields missing in the snapshot were deferred or tracked after loading
+            changed = [
+                name
+                for name in self.tracked.get(sender, ())
+                if name not in previous or previous[name] != current.get(name)
+            ]
+            self.invalidate(sender, changed)
+
+    def on_post_delete(self, sender, instance, **kwargs):
+        self.invalidate(sender)
+
+    def on_m2m_changed(self, sender, instance, action, reverse, model, **kwargs):
+        if not action.startswith("post_"):
+            return
+
+        # the tag belongs to the model declaring the ManyToManyField
+        owner = model if reverse else instance.__class__
+        for field in owner._meta.many_to_many:
+            if field.remote_field.through is sender:
+                self.invalidate(owner, (field.name,))
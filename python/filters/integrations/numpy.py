@@ -0,0 +1,226 @@
+from typing import Mapping
+
+import numpy as np
+
+from .. import types as fqt
+from ..types import FilterQuery, OperatorError
+
+# Evaluate the remaining children of And/Or only on the still undecided rows once fewer than
+# this fraction of rows is undecided. Above it, gathering the subset costs more than it saves.
+SUBSET_THRESHOLD = 0.5
+
+COMPARISONS = {
+    fqt.Eq: np.equal,
+    fqt.Gt: np.greater,
+    fqt.Ge: np.greater_equal,
+    fqt.Lt: np.less,
+    fqt.Le: np.less_equal,
+}
+
+
+def as_columns(data) -> Mapping[str, np.ndarray]:
+    """Accept a mapping of column name to array or a structured array."""
+    if isinstance(data, np.ndarray) and data.dtype.names:
+        return {name: data[name] for name in data.dtype.names}
+
+    columns = {name: np.asarray(column) for name, column in data.items()}
+
+    lengths = {len(column) for column in columns.values()}
+    if len(lengths) > 1:
+        raise OperatorError(
+            f"All columns must have the same length. Got {sorted(lengths)}"
+        )
+
+    return columns
+
+
+def row_count(columns) -> int:
+    return len(next(iter(columns.values()))) if columns else 0
+
+
+def coerce(literal, column: np.ndarray):
+    """Convert a (string) literal to a scalar comparable with the column's dtype."""
+    kind = column.dtype.kind
+
+    try:
+        if not isinstance(literal, str):
+            if kind == "M" and not isinstance(literal, np.datetime64):
+                return np.datetime64(literal)
+            return literal
+
+        if kind in "iu":
+            try:
+                return int(literal)
+            except ValueError:
+                return float(literal)
+        if kind == "f":
+            return float(literal)
+        if kind == "b":
+            return {"true": True, "false": False}[literal.lower()]
+        if kind == "M":
+            return np.datetime64(literal)
+        if kind == "S":
+            return literal.encode()
+    except (KeyError, ValueError, TypeError) as e:
+        raise OperatorError(
+            f"Value {literal!r} is not compatible with column of type {column.dtype}"
+        ) from e
+
+    return literal
+
+
+def get_column(columns, key, rows):
+    try:
+        column = columns[key]
+    except KeyError:
+        raise OperatorError(f"Unknown column {key!r}")
+
+    return column if rows is None else column[rows]
+
+
+def check_columns(operator, columns):
+    """Raise OperatorError for a key without a column, whichever rows are evaluated."""
+    if isinstance(operator, fqt.LogicalOperator):
+        for arg in operator.args:
+            check_columns(arg, columns)
+    elif operator.key not in columns:
+        raise OperatorError(f"Unknown column {operator.key!r}")
+
+
+def leaf_mask(operator, columns, rows) -> np.ndarray:
+    """
+    The mask of a key-value operator. Like in the evaluator, a literal which can't be compared
+    with the column matches no row.
+    """
+    column = get_column(columns, operator.key, rows)
+
+    try:
+        if isinstance(operator, fqt.In):
+            values = []
+            for value in operator.value:
+                try:
+                    values.append(coerce(value, column))
+                except OperatorError:
+                    pass
+            return np.isin(column, values)
+
+        if isinstance(operator, fqt.Co):
+            strings = column if column.dtype.kind in "US" else column.astype(str)
+            return np.char.find(strings, coerce(operator.value, strings)) >= 0
+
+        for operator_class, compare in COMPARISONS.items():
+            if isinstance(operator, operator_class):
+                return compare(column, coerce(operator.value, column))
+    except (OperatorError, TypeError):
+        return np.zeros(len(column), dtype=bool)
+
+    raise OperatorError(f"Unsupported operator: {operator}")
+
+
+def logical_mask(operator, columns, rows, size, statistics=None) -> np.ndarray:
+    """
+    Combine child masks with short-circuiting: for And, rows already rejected are not
+    evaluated again (for Or, rows already accepted), and evaluation stops once every row is
+    decided.
+    """
+    is_and = isinstance(operator, fqt.And)
+    result = np.full(size, is_and)
+
+    for child in operator.args:
+        # rows whose result can still change
+        undecided = result if is_and else ~result
+        count = np.count_nonzero(undecided)
+
+        if count == 0:
+            break
+
+        if count == size or count > size * SUBSET_THRESHOLD:
+            child_mask = compute_mask(child, columns, rows, size, statistics)
+            if is_and:
+                result &= child_mask
+            else:
+                result |= child_mask
+            continue
+
+        positions = np.flatnonzero(undecided)
+        child_rows = positions if rows is None else rows[positions]
+        result[positions] = compute_mask(
+            child, columns, child_rows, len(positions), statistics
+        )
+
+    return result
+
+
+def compute_mask(
+    operator, columns, rows=None, size=None, statistics=None
+) -> np.ndarray:
+    """
+    Return a boolean mask of the rows matching `operator`. If `rows` is given, only those row
+    indices are evaluated and the mask has one entry per index. The hit rates of the leaves are
+    recorded in `statistics` (see `statistics.py`) if given.
+    """
+    if size is None:
+        size = row_count(columns) if rows is None else len(rows)
+
+    if isinstance(operator, fqt.Not):
+        return ~compute_mask(operator.args[0], columns, rows, size, statistics)
+
+    if isinstance(operator, (fqt.And, fqt.Or)):
+        return logical_mask(operator, columns, rows, size, statistics)
+
+    mask = leaf_mask(operator, columns, rows)
+    if statistics is not None:
+        statistics.observe(operator, int(np.count_nonzero(mask)), len(mask))
+    return mask
+
+
+def sort_key(column: np.ndarray, descending: bool) -> np.ndarray:
+    if not descending:
+        return column
+
+    if column.dtype.kind in "if":
+        return -column
+
+    # dense ranks work for every orderable dtype (strings, dates, unsigned, ...)
+    _, ranks = np.unique(column, return_inverse=True)
+    return -ranks.reshape(column.shape)
+
+
+def evaluate_indices(filter_query: FilterQuery, data, statistics=None) -> np.ndarray:
+    """
+    Return the indices of the matching rows in sort order, with offset and limit applied. With
+    `statistics` the And / Or children are evaluated in the estimated cheapest order.
+    """
+    columns = as_columns(data)
+    query = filter_query.query
+    if statistics is not None:
+        from ..statistics import reorder
+
+        query = reorder(query, statistics)
+    check_columns(query, columns)
+
+    indices = np.flatnonzero(compute_mask(query, columns, statistics=statistics))
+
+    if filter_query.sort:
+        keys = [
+            sort_key(get_column(columns, s.key, indices), s.descending)
+            for s in filter_query.sort
+        ]
+        # lexsort uses the last key as the primary one
+        indices = indices[np.lexsort(keys[::-1])]
+
+    start = filter_query.offset or 0
+    stop = None if filter_query.limit is None else start + filter_query.limit
+    return indices[start:stop]
+
+
+def evaluate(
+    filter_query: FilterQuery, data, statistics=None
+) -> Mapping[str, np.ndarray]:
+    """Return the matching rows as a mapping of column name to array (or a structured array)."""
+    indices = evaluate_indices(filter_query, data, statistics)
+
+    if isinstance(data, np.ndarray):
+        return data[indices]
+
+    return {name: column[indices] for name, column in as_columns(data).items()}
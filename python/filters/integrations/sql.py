@@ -0,0 +1,240 @@
+"""
+Compiles FilterQuery objects to parameterized SQL for DB-API connections, without Django.
+
+    compiler = SqlCompiler({"age": "age", "town": "city"})
+    statement = compiler.compile(filter_query)
+    cursor.execute(f"SELECT * FROM person {statement.sql}", statement.params)
+
+Only the keys of the column allowlist can be filtered and sorted by. Values are always passed
+as parameters. Identifiers are quoted and LIKE patterns escaped for the `dialect` of the
+compiler, standard SQL by default or "mysql" for MySQL and MariaDB. The tree is simplified with
+`optimizer.optimize` first. The SQL text only depends on the shape of the simplified tree
+(operators, keys and the number of `in` values), not on the values, so it is cached per shape
+and repeated requests with other values only extract the parameters.
+"""
+
+from functools import lru_cache
+from itertools import count
+from typing import Iterable, Mapping, NamedTuple, Optional, Union
+
+from .. import types as fqt
+from ..optimizer import optimize
+from ..types import FilterQuery
+
+SQL_CACHE_SIZE = 1024
+
+COMPARISONS = {
+    fqt.Eq: "=",
+    fqt.Gt: ">",
+    fqt.Ge: ">=",
+    fqt.Lt: "<",
+    fqt.Le: "<=",
+}
+
+# DB-API paramstyles (PEP 249), called with the index of the parameter
+PLACEHOLDERS = {
+    "qmark": lambda i: "?",
+    "format": lambda i: "%s",
+    "numeric": lambda i: f":{i + 1}",
+    "named": lambda i: f":p{i}",
+    "pyformat": lambda i: f"%(p{i})s",
+}
+
+
+class Dialect(NamedTuple):
+    # quote character of identifiers
+    quote: str
+    # escape character of LIKE patterns
+    like_escape: str
+
+
+DIALECTS = {
+    # standard SQL, e.g. PostgreSQL and SQLite
+    "ansi": Dialect('"', "\\"),
+    # MySQL and MariaDB: double quotes are string literals and backslashes escape characters
+    # within them, unless ANSI_QUOTES and NO_BACKSLASH_ESCAPES are set
+    "mysql": Dialect("`", "!"),
+}
+
+
+class FilterError(ValueError):
+    pass
+
+
+class SqlStatement(NamedTuple):
+    where: str
+    order_by: str
+    limit: str
+    # a list, or a dict for the named and pyformat paramstyles
+    params: Union[list, dict]
+
+    @property
+    def sql(self) -> str:
+        """`WHERE ... ORDER BY ... LIMIT ...`, to append to a SELECT."""
+        return " ".join(
+            part for part in (f"WHERE {self.where}", self.order_by, self.limit) if part
+        )
+
+
+def quote_identifier(name: str, quote: str = '"') -> str:
+    # `table.column` is quoted per part
+    return ".".join(
+        quote + part.replace(quote, quote * 2) + quote for part in name.split(".")
+    )
+
+
+def escape_like(value: str, escape: str = "\\") -> str:
+    for char in (escape, "%", "_"):
+        value = value.replace(char, escape + char)
+    return value
+
+
+def leaf_class(operator: fqt.Operator):
+    for operator_class in (*COMPARISONS, fqt.In, fqt.Co):
+        if isinstance(operator, operator_class):
+            return operator_class
+    raise FilterError(f"Unsupported operator: {operator}")
+
+
+def split_shape(operator: fqt.Operator, params: list, like_escape: str = "\\"):
+    """
+    Return the shape of the tree, a hashable structure without the values, and append the
+    values to `params` in the order of their placeholders.
+    """
+    if isinstance(operator, fqt.LogicalOperator):
+        return (
+            operator.__class__,
+            *(split_shape(arg, params, like_escape) for arg in operator.args),
+        )
+
+    operator_class = leaf_class(operator)
+
+    if operator_class is fqt.In:
+        params.extend(operator.value)
+        return (operator_class, operator.key, len(operator.value))
+
+    if operator_class is fqt.Co:
+        params.append(f"%{escape_like(str(operator.value), like_escape)}%")
+    else:
+        params.append(operator.value)
+    return (operator_class, operator.key)
+
+
+class SqlCompiler:
+    """Compiles FilterQuery objects to SQL using an allowlist of columns."""
+
+    def __init__(
+        self,
+        columns: Union[Mapping[str, str], Iterable[str]],
+        paramstyle: str = "qmark",
+        no_limit: Optional[str] = None,
+        cache_size: int = SQL_CACHE_SIZE,
+        dialect: str = "ansi",
+    ):
+        """
+        `columns` maps the keys used in queries to column names (or is a list of names used for
+        both). `no_limit` is the LIMIT used when only an offset is given, for databases which
+        require one (e.g. "-1" for SQLite). `dialect` decides how identifiers are quoted and LIKE
+        patterns escaped, "ansi" (PostgreSQL, SQLite, ...) or "mysql".
+        """
+        if paramstyle not in PLACEHOLDERS:
+            raise ValueError(
+                f"Unknown paramstyle {paramstyle!r}. Choose one of {[*PLACEHOLDERS]}"
+            )
+        if dialect not in DIALECTS:
+            raise ValueError(
+                f"Unknown dialect {dialect!r}. Choose one of {[*DIALECTS]}"
+            )
+
+        if not isinstance(columns, Mapping):
+            columns = {name: name for name in columns}
+
+        self.dialect = DIALECTS[dialect]
+        self.columns = {
+            key: quote_identifier(column, self.dialect.quote)
+            for key, column in columns.items()
+        }
+        self.paramstyle = paramstyle
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.no_limit = no_limit
+        self.build = lru_cache(maxsize=cache_size)(self.build)
+
+    def column(self, key: str) -> str:
+        try:
+            return self.columns[key]
+        except KeyError:
+            raise FilterError(f"Unknown field {key!r}")
+
+    def compile(self, filter_query: FilterQuery) -> SqlStatement:
+        params = []
+        shape = split_shape(
+            optimize(filter_query.query), params, self.dialect.like_escape
+        )
+        sort = tuple((s.key, s.descending) for s in filter_query.sort)
+        has_limit = filter_query.limit is not None
+        has_offset = bool(filter_query.offset)
+
+        where, order_by, limit = self.build(shape, sort, has_limit, has_offset)
+
+        if has_limit:
+            params.append(filter_query.limit)
+        if has_offset:
+            params.append(filter_query.offset)
+
+        if self.paramstyle in ("named", "pyformat"):
+            params = {f"p{i}": value for i, value in enumerate(params)}
+
+        return SqlStatement(where, order_by, limit, params)
+
+    def build(self, shape, sort, has_limit, has_offset):
+        """SQL text for a shape, cached (see __init__)."""
+        counter = count()
+        where = self.build_condition(shape, counter)
+
+        order_by = ""
+        if sort:
+            keys = [
+                f"{self.column(key)} {'DESC' if descending else 'ASC'}"
+                for key, descending in sort
+            ]
+            order_by = f"ORDER BY {', '.join(keys)}"
+
+        limit = []
+        if has_limit:
+            limit.append(f"LIMIT {self.placeholder(next(counter))}")
+        elif has_offset and self.no_limit is not None:
+            limit.append(f"LIMIT {self.no_limit}")
+        if has_offset:
+            limit.append(f"OFFSET {self.placeholder(next(counter))}")
+
+        return where, order_by, " ".join(limit)
+
+    def build_condition(self, shape, counter) -> str:
+        operator_class, *args = shape
+
+        if operator_class is fqt.Not:
+            return f"NOT ({self.build_condition(args[0], counter)})"
+
+        if operator_class in (fqt.And, fqt.Or):
+            if not args:
+                # empty conjunction matches everything, empty disjunction nothing
+                return "1 = 1" if operator_class is fqt.And else "1 = 0"
+            connector = " AND " if operator_class is fqt.And else " OR "
+            return connector.join(
+                f"({self.build_condition(arg, counter)})" for arg in args
+            )
+
+        column = self.column(args[0])
+
+        if operator_class is fqt.In:
+            if not args[1]:
+                return "1 = 0"
+            placeholders = ", ".join(
+                self.placeholder(next(counter)) for _ in range(args[1])
+            )
+            return f"{column} IN ({placeholders})"
+
+        placeholder = self.placeholder(next(counter))
+        if operator_class is fqt.Co:
+            return f"{column} LIKE {placeholder} ESCAPE '{self.dialect.like_escape}'"
+        return f"{column} {COMPARISONS[operator_class]} {placeholder}"
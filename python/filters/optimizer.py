@@ -0,0 +1,245 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Callable, Optional
+
+from .types import (
+    ALLOWED_NUMERIC_TYPES,
+    And,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    Lt,
+    Not,
+    Operator,
+    Or,
+    value_key,
+)
+
+LOWER_BOUNDS = (Gt, Ge)
+UPPER_BOUNDS = (Lt, Le)
+
+
+def optimize(
+    operator: Operator, foldable: Optional[Callable[[str], bool]] = None
+) -> Operator:
+    """
+    Simplify an Operator tree without changing its meaning:
+
+    - flatten nested And / Or nodes
+    - remove duplicate children
+    - eliminate double negation
+    - fold Or of Eq (and In) on the same key into a single In
+    - merge range bounds (Gt/Ge/Lt/Le) on the same key into the tightest bounds
+
+    `foldable(key)` restricts folding to the keys an In can be used with, e.g. not Django keys
+    ending in a lookup (`name__iexact`). The Django and SQL backends optimize every tree before
+    compiling it.
+    """
+    if isinstance(operator, Not):
+        child = optimize(operator.args[0], foldable)
+        if isinstance(child, Not):
+            return child.args[0]
+        return Not(child)
+
+    if isinstance(operator, (And, Or)):
+        children = flatten(
+            operator.__class__, [optimize(arg, foldable) for arg in operator.args]
+        )
+        children = deduplicate(children)
+
+        if isinstance(operator, Or):
+            children = fold_in(children, foldable)
+        else:
+            children = merge_ranges(children)
+
+        if len(children) == 1:
+            return children[0]
+
+        return operator.__class__(*children)
+
+    return operator
+
+
+def optimize_query(filter_query: FilterQuery) -> FilterQuery:
+    """Return a copy of the FilterQuery with an optimized operator tree."""
+    filter_query = filter_query.copy()
+    filter_query.query = optimize(filter_query.query)
+    return filter_query
+
+
+def flatten(operator_class, children):
+    """Inline children of the same (associative) operator class."""
+    flat = []
+    for child in children:
+        if child.__class__ is operator_class:
+            flat.extend(child.args)
+        else:
+            flat.append(child)
+    return flat
+
+
+def deduplicate(children):
+    """Remove duplicate children, keeping the first occurrence."""
+    return list(dict.fromkeys(children))
+
+
+def fold_in(children, foldable=None):
+    """Fold Eq and In children on the same key into one In at the position of the first one."""
+
+    def is_folded(child):
+        return child.__class__ in (Eq, In) and (foldable is None or foldable(child.key))
+
+    values_by_key = {}
+    for child in children:
+        if is_folded(child):
+            values = [child.value] if isinstance(child, Eq) else list(child.value)
+            values_by_key.setdefault(child.key, []).extend(values)
+
+    folded = []
+    seen = set()
+    for child in children:
+        if not is_folded(child):
+            folded.append(child)
+            continue
+
+        if child.key in seen:
+            continue
+        seen.add(child.key)
+
+        # by value and type, like the operators themselves (1 and True are different values)
+        values = list(
+            {value_key(value): value for value in values_by_key[child.key]}.values()
+        )
+        if len(values) == 1:
+            folded.append(Eq(child.key, values[0]))
+        else:
+            folded.append(In(child.key, tuple(values)))
+
+    return folded
+
+
+def comparable(a, b):
+    """Whether two (non-string) literals can be ordered safely."""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return False
+    if isinstance(a, ALLOWED_NUMERIC_TYPES) and isinstance(b, ALLOWED_NUMERIC_TYPES):
+        return True
+    return type(a) is type(b) and not isinstance(a, str)
+
+
+def parse_string(value: str):
+    """The number or ISO datetime a parsed string stands for, None if it is neither."""
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        pass
+    else:
+        return number if number.is_finite() else None
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def compare(a, b) -> Optional[int]:
+    """
+    -1, 0 or 1 if `a` is smaller, equal or greater than `b`, None if they can't be ordered
+    safely. The parser keeps every value as a string, which the backends convert to the type of
+    the field. Strings are only ordered if they compare the same as text and as numbers (or
+    dates), e.g. "20" and "30" but not "100" and "30", so the result holds for text and numeric
+    fields alike.
+    """
+    if isinstance(a, str) and isinstance(b, str):
+        parsed_a, parsed_b = parse_string(a), parse_string(b)
+        if parsed_a is None or parsed_b is None:
+            return None
+        order = compare(parsed_a, parsed_b)
+        as_text = (a > b) - (a < b)
+        return as_text if order == as_text else None
+
+    if not comparable(a, b):
+        return None
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        # e.g. naive and aware datetimes
+        return None
+
+
+def tightest(bounds, pick_lower):
+    """Return the tightest of the given bounds, or None if they can't be compared."""
+    best = bounds[0]
+    for bound in bounds[1:]:
+        order = compare(bound.value, best.value)
+        if order is None:
+            return None
+
+        if order == 0:
+            # the strict bound is the tighter one
+            if isinstance(bound, (Gt, Lt)):
+                best = bound
+        elif (order > 0) == pick_lower:
+            best = bound
+
+    return best
+
+
+def merge_ranges(children):
+    """Merge range bounds on the same key, e.g. `gt(a, 1), gt(a, 5)` becomes `gt(a, 5)`."""
+    bounds_by_key = {}
+    for child in children:
+        if isinstance(child, LOWER_BOUNDS + UPPER_BOUNDS):
+            bounds_by_key.setdefault(child.key, []).append(child)
+
+    merged_by_key = {}
+    for key, bounds in bounds_by_key.items():
+        if len(bounds) < 2:
+            continue
+
+        lower = [bound for bound in bounds if isinstance(bound, LOWER_BOUNDS)]
+        upper = [bound for bound in bounds if isinstance(bound, UPPER_BOUNDS)]
+
+        merged = []
+        for group, pick_lower in ((lower, True), (upper, False)):
+            if not group:
+                continue
+            best = tightest(group, pick_lower)
+            if best is None:
+                merged = None
+                break
+            merged.append(best)
+
+        if merged is None:
+            continue
+
+        # ge(a, x) and le(a, x) can only match a == x
+        if (
+            len(merged) == 2
+            and isinstance(merged[0], Ge)
+            and isinstance(merged[1], Le)
+            and merged[0].value == merged[1].value
+        ):
+            merged = [Eq(key, merged[0].value)]
+
+        merged_by_key[key] = merged
+
+    result = []
+    emitted = set()
+    for child in children:
+        key = getattr(child, "key", None)
+        if (
+            not isinstance(child, LOWER_BOUNDS + UPPER_BOUNDS)
+            or key not in merged_by_key
+        ):
+            result.append(child)
+            continue
+
+        if key not in emitted:
+            emitted.add(key)
+            result.extend(merged_by_key[key])
+
+    return result
@@ -1,6 +1,13 @@
 from python.filters.types import FilterQuery
 
 
+class ParserError(ValueError):
+    def __init__(self, message: str, position: int = None):
+        super().__init__(message)
+        self.message = message
+        self.position = position
+
+
 class BaseParser:
     def __init__(self, query: str):
         self.query = query
@@ -0,0 +1,87 @@
+"""
+Parsing many GitHub syntax queries at once, e.g. to re-validate stored filters.
+
+Identical queries are parsed once and the resulting trees are interned, so subtrees shared
+between queries (e.g. the same `is:open` in thousands of saved searches) are a single object.
+With `workers`, the unique queries are parsed in a process pool in chunks.
+
+    results = parse_batch(saved_queries, workers=4)
+    invalid = [result for result in results if result.error is not None]
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from typing import Iterable, List, NamedTuple, Optional
+
+from .base import ParserError
+from .github import GithubSyntaxParser
+from ..types import FilterQuery, Interner
+
+CHUNK_SIZE = 512
+
+
+class BatchResult(NamedTuple):
+    query: str
+    filter_query: Optional[FilterQuery]
+    error: Optional[ParserError]
+
+
+def parse_chunk(queries: List[str], backend: str) -> list:
+    """Parse queries to `(tree, error)` pairs. Runs in the worker processes."""
+    results = []
+    for query in queries:
+        # parse_expression bypasses the shared parse cache, a batch would only evict it
+        try:
+            results.append(
+                (GithubSyntaxParser(query, backend).parse_expression(), None)
+            )
+        except ParserError as e:
+            results.append((None, e))
+    return results
+
+
+def chunked(items: list, size: int):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_batch(
+    queries: Iterable[str],
+    backend: str = "pratt",
+    workers: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    interner: Optional[Interner] = None,
+) -> List[BatchResult]:
+    """
+    Parse every query, returning one BatchResult per input in the same order. Invalid queries
+    have an `error` instead of a `filter_query`. `workers` > 1 parses in a process pool.
+    """
+    queries = list(queries)
+    unique = list(dict.fromkeys(queries))
+    interner = interner if interner is not None else Interner()
+
+    if workers is not None and workers > 1 and len(unique) > chunk_size:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = executor.map(
+                parse_chunk, chunked(unique, chunk_size), repeat(backend)
+            )
+            parsed = [result for chunk in chunks for result in chunk]
+    else:
+        parsed = parse_chunk(unique, backend)
+
+    # trees from the workers are separate copies, interning shares their common subtrees
+    trees = {}
+    for query, (tree, error) in zip(unique, parsed):
+        trees[query] = (interner.intern(tree) if tree is not None else None, error)
+
+    results = []
+    for query in queries:
+        tree, error = trees[query]
+        filter_query = None
+        if tree is not None:
+            # the tree is shared, but every result gets its own (mutable) FilterQuery
+            filter_query = FilterQuery(query=tree, sort=None, limit=None, offset=None)
+        results.append(BatchResult(query, filter_query, error))
+
+    return results
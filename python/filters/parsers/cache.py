@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from ..types import FilterQuery
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+
+class ParseCache:
+    """
+    Bounded, thread-safe LRU cache mapping raw query strings to parsed FilterQuery objects.
+
+    Operator trees are immutable, so cached trees are shared between callers. Every lookup
+    returns a fresh FilterQuery wrapper so that sort, limit and offset can be changed by the
+    caller without affecting the cached entry.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key) -> Optional[FilterQuery]:
+        with self._lock:
+            try:
+                filter_query = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return filter_query.copy()
+
+    def set(self, key, filter_query: FilterQuery):
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = filter_query.copy()
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize: int):
+        """Change the maximum number of entries, evicting the least recently used ones if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                maxsize=self.maxsize,
+                currsize=len(self._entries),
+            )
+
+    def _evict(self):
+        while len(self._entries) > max(self.maxsize, 0):
+            self._entries.popitem(last=False)
+            self.evictions += 1
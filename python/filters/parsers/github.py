@@ -1,48 +1,33 @@
+"""
+Parser for the GitHub style filter syntax, e.g. `is:open author:john -label:bug`.
+
+Two backends build the same Operator trees: "pyparsing" (the default) and the hand written
+"pratt" parser, which is faster and needs no third party package.
+
+pyparsing backtracks into nested groups. Its packrat memoization avoids re-parsing them, but it
+is a process wide pyparsing setting, which changes every pyparsing grammar of the host process.
+It is therefore not turned on by this module; call `enable_packrat()` to opt in.
+"""
+
+from functools import cache
 from itertools import chain
 
-from pyparsing import (
-    Word,
-    alphas,
-    alphanums,
-    quotedString,
-    Group,
-    Forward,
-    infixNotation,
-    opAssoc,
-    Suppress,
-    oneOf,
-    delimitedList,
-    Combine,
-    OneOrMore,
-)
-
-from .base import BaseParser
+from .base import BaseParser, ParserError
+from .cache import ParseCache
 from ..types import Le, Lt, Ge, Gt, Eq, Or, And, Not, Co, FilterQuery
 
-# Define the basic elements
-identifier = Word(alphas, alphanums + "_")
-negated_identifier = Combine("-" + identifier)
-value = quotedString | Word(alphanums)
-
 # Define the operators and their corresponding classes
 operators = {":": Eq, ":<": Lt, ":<=": Le, ":>": Gt, ":>=": Ge, ":~": Co}
 
-# Define the grammar for key-value pairs with operators
-operator = oneOf(list(operators.keys()))
-multiple_values = delimitedList(value, delim=",") | Group(value)
+# Maximum number of entries in pyparsing's packrat memo, see `enable_packrat`
+PACKRAT_CACHE_SIZE = 1024
 
-key_value = Group((negated_identifier | identifier) + operator + multiple_values)
 
-# Define logical operators as constants
-and_ = Suppress("AND")
-or_ = Suppress("OR")
-not_ = Suppress("NOT")
+def enable_packrat(cache_size: int = PACKRAT_CACHE_SIZE):
+    """Turn on pyparsing's packrat memoization, for all pyparsing grammars of the process."""
+    from pyparsing import ParserElement
 
-# Define the overall expression
-expr = Forward()
-
-# Define a term as either a key-value pair or a grouped expression
-term = Group(Suppress("(") + expr + Suppress(")")) | key_value
+    ParserElement.enable_packrat(cache_size_limit=cache_size)
 
 
 def flatten(list_):
@@ -82,6 +67,11 @@ def handle_sequence(tokens):
 def parse_key_value(tokens):
     """Convert tokens to key-value class instances."""
     key, op, *op_values = tokens[0]
+    return build_key_value(key, op, op_values)
+
+
+def build_key_value(key, op, op_values):
+    """Build the operator for a (possibly negated) key with one or more values."""
     operator_class = operators[op]
     key_name = key[1:] if key.startswith("-") else key
 
@@ -97,30 +87,119 @@ def parse_key_value(tokens):
     return result
 
 
-# Attach parsing actions
-key_value.setParseAction(parse_key_value)
+@cache
+def get_grammar():
+    """
+    Build the pyparsing grammar on first use.
+
+    Importing pyparsing and constructing `infixNotation` is expensive, so this is deferred until
+    the first query is parsed rather than paid by every process importing this module.
+    """
+    from pyparsing import (
+        Word,
+        alphas,
+        alphanums,
+        quotedString,
+        Group,
+        Forward,
+        infixNotation,
+        opAssoc,
+        Suppress,
+        oneOf,
+        delimitedList,
+        Combine,
+        OneOrMore,
+    )
+
+    # Define the basic elements
+    identifier = Word(alphas, alphanums + "_")
+    negated_identifier = Combine("-" + identifier)
+    value = quotedString | Word(alphanums)
+
+    # Define the grammar for key-value pairs with operators
+    operator = oneOf(list(operators.keys()))
+    multiple_values = delimitedList(value, delim=",") | Group(value)
+
+    key_value = Group((negated_identifier | identifier) + operator + multiple_values)
+
+    # Define logical operators as constants
+    and_ = Suppress("AND")
+    or_ = Suppress("OR")
+    not_ = Suppress("NOT")
 
+    # Define the overall expression
+    expr = Forward()
+
+    # Define a term as either a key-value pair or a grouped expression
+    term = Group(Suppress("(") + expr + Suppress(")")) | key_value
+
+    # Attach parsing actions
+    key_value.setParseAction(parse_key_value)
+
+    # Define the expression using infix notation
+    expr <<= infixNotation(
+        Group(OneOrMore(term)).setParseAction(handle_sequence),
+        [
+            (not_, 1, opAssoc.RIGHT, parse_not),
+            (and_, 2, opAssoc.LEFT, parse_and),
+            (or_, 2, opAssoc.LEFT, parse_or),
+        ],
+    )
 
-# Define the expression using infix notation
-expr <<= infixNotation(
-    Group(OneOrMore(term)).setParseAction(handle_sequence),
-    [
-        (not_, 1, opAssoc.RIGHT, parse_not),
-        (and_, 2, opAssoc.LEFT, parse_and),
-        (or_, 2, opAssoc.LEFT, parse_or),
-    ],
-)
+    return expr
+
+
+# Shared by all GithubSyntaxParser instances; use `parse_cache.resize(n)` to configure the size.
+parse_cache = ParseCache(maxsize=1024)
+
+
+BACKENDS = ("pyparsing", "pratt")
 
 
 class GithubSyntaxParser(BaseParser):
+    # set to None (e.g. on a subclass) to disable caching
+    cache = parse_cache
+
+    def __init__(self, query: str, backend: str = "pyparsing"):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend!r}. Choose one of {BACKENDS}")
+
+        super().__init__(query)
+        self.backend = backend
+
     def parse(self) -> FilterQuery:
         """Parse the query string into a FilterQuery object."""
 
-        parsed_result = expr.parseString(self.query, parseAll=True)[0]
+        cache_key = (self.backend, self.query)
+
+        if self.cache is not None:
+            filter_query = self.cache.get(cache_key)
+            if filter_query is not None:
+                return filter_query
 
-        return FilterQuery(
-            query=parsed_result,
+        filter_query = FilterQuery(
+            query=self.parse_expression(),
             sort=None,
             limit=None,
             offset=None,
         )
+
+        if self.cache is not None:
+            self.cache.set(cache_key, filter_query)
+
+        return filter_query
+
+    def parse_expression(self):
+        """Parse the query string into an Operator tree using the selected backend."""
+
+        if self.backend == "pratt":
+            from .github_pratt import PrattGithubSyntaxParser
+
+            return PrattGithubSyntaxParser(self.query).parse_expression()
+
+        from pyparsing import ParseException
+
+        try:
+            return get_grammar().parseString(self.query, parseAll=True)[0]
+        except ParseException as e:
+            raise ParserError(str(e), e.loc) from e
@@ -0,0 +1,173 @@
+"""
+Incremental parsing of the GitHub filter syntax for type-ahead filter boxes.
+
+A filter box sends the full query on every keystroke, while the query usually changes in a
+single place. `IncrementalGithubSyntaxParser` keeps the tokens and the parsed groups of the
+previous version of the query: only the tokens around the edit are scanned again, the tokens
+after it are reused (shifted), and parenthesized groups whose text did not change are not
+parsed again.
+
+    parser = IncrementalGithubSyntaxParser()
+    parser.update("(author:nico OR author:jo) is:op")
+    result = parser.update("(author:nico OR author:jo) is:open")
+    result.filter_query, result.errors
+"""
+
+from bisect import bisect_left
+from typing import List, NamedTuple, Optional
+
+from .base import ParserError
+from .github_pratt import (
+    END,
+    LPAREN,
+    RPAREN,
+    PrattGithubSyntaxParser,
+    Token,
+    scan,
+    tokenize,
+)
+from ..types import FilterQuery
+
+
+class IncrementalResult(NamedTuple):
+    filter_query: Optional[FilterQuery]
+    errors: List[ParserError]
+
+
+def common_prefix_length(a: str, b: str) -> int:
+    # binary search over slice comparisons, which run in C
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def common_suffix_length(a: str, b: str, limit: int) -> int:
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle :] == b[len(b) - middle :]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def retokenize(old_query: str, old_tokens: List[Token], query: str) -> List[Token]:
+    """
+    Tokenize `query` reusing the tokens of `old_query`. The tokenizer only looks ahead, so a
+    token is unchanged if it (and the character after it) lies before the edit, and once
+    scanning after the edit reaches the start of an old token, all following tokens are
+    the old ones shifted by the length difference.
+    """
+    prefix = common_prefix_length(old_query, query)
+    suffix = common_suffix_length(
+        old_query, query, min(len(old_query), len(query)) - prefix
+    )
+    delta = len(query) - len(old_query)
+    old_tokens = old_tokens[:-1]  # without END
+
+    head = bisect_left(old_tokens, prefix, key=lambda token: token.end)
+    tokens = old_tokens[:head]
+    pos = tokens[-1].end if tokens else 0
+
+    unchanged_from = len(query) - suffix
+    for token in scan(query, pos):
+        if token.start >= unchanged_from:
+            old_start = token.start - delta
+            i = bisect_left(
+                old_tokens, old_start, lo=head, key=lambda token: token.start
+            )
+            if i < len(old_tokens) and old_tokens[i].start == old_start:
+                tokens.extend(
+                    Token(old.kind, old.text, old.start + delta, old.end + delta)
+                    for old in old_tokens[i:]
+                )
+                break
+        tokens.append(token)
+
+    tokens.append(Token(END, "", len(query), len(query)))
+    return tokens
+
+
+def match_parentheses(tokens: List[Token]) -> dict:
+    """Map the index of every `(` token to the index of its matching `)`."""
+    matching = {}
+    stack = []
+    for i, token in enumerate(tokens):
+        if token.kind == LPAREN:
+            stack.append(i)
+        elif token.kind == RPAREN and stack:
+            matching[stack.pop()] = i
+    return matching
+
+
+class IncrementalGithubSyntaxParser(PrattGithubSyntaxParser):
+    """Parses successive versions of a query, reusing the work done for the previous one."""
+
+    # the parse cache holds whole queries, which rarely repeat while typing
+    cache = None
+
+    def __init__(self):
+        super().__init__("")
+        self.previous_tokens = None
+        self.groups = {}
+
+    def update(self, query: str) -> IncrementalResult:
+        """Parse the new version of the query. Errors are returned instead of raised."""
+        try:
+            if self.previous_tokens is None:
+                tokens = tokenize(query)
+            else:
+                tokens = retokenize(self.query, self.previous_tokens, query)
+        except ParserError as e:
+            self.query, self.previous_tokens = query, None
+            return IncrementalResult(None, [e])
+
+        self.query = query
+        self.previous_tokens = tokens
+
+        self.used_groups = {}
+        try:
+            filter_query = self.parse()
+        except ParserError as e:
+            return IncrementalResult(None, [e])
+        finally:
+            # only keep the groups of the latest version, so memory doesn't grow while typing
+            self.groups = self.used_groups
+
+        return IncrementalResult(filter_query, [])
+
+    def parse_expression(self):
+        # parsing splits `NOT`/`AND`/`OR` prefixes off tokens in place, keep the originals
+        self.tokens = list(self.previous_tokens)
+        self.matching = match_parentheses(self.tokens)
+        self.index = 0
+
+        result = self.parse_binary(0)
+
+        if self.current.kind != END:
+            self.error("Expected end of text")
+
+        return result
+
+    def parse_term(self):
+        if self.current.kind != LPAREN or self.index not in self.matching:
+            return super().parse_term()
+
+        # a group parses the same wherever it appears, look it up by its text
+        start, end = self.index, self.matching[self.index]
+        text = self.query[self.tokens[start].start : self.tokens[end].end]
+
+        result = self.groups.get(text)
+        if result is None:
+            result = super().parse_term()
+        else:
+            self.index = end + 1
+
+        self.used_groups[text] = result
+        return result
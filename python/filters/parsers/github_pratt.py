@@ -0,0 +1,247 @@
+"""
+Hand-written backend for the GitHub filter syntax.
+
+The query is tokenized in a single linear pass and parsed with precedence climbing over the
+binary operators. It produces exactly the same Operator trees as the pyparsing grammar in
+`github.py`, including its quirks (e.g. `NOT` is matched as a literal prefix, so `NOTa:1` is
+`not(eq(a, 1))`), but never backtracks.
+"""
+
+import re
+from typing import Iterator, List, NamedTuple
+
+from .base import ParserError
+from .github import GithubSyntaxParser, build_key_value
+from ..types import And, Not, Or
+
+WORD = "word"
+QUOTED = "quoted"
+OPERATOR = "operator"
+MINUS = "minus"
+COMMA = "comma"
+LPAREN = "lparen"
+RPAREN = "rparen"
+END = "end"
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+
+
+# Same whitespace and quoting rules as pyparsing
+whitespace_re = re.compile(r"[ \t\n\r]*")
+word_re = re.compile(r"[A-Za-z0-9_]+")
+operator_re = re.compile(r":(?:<=|>=|<|>|~)?")
+quoted_prefix_re = {
+    '"': re.compile(r'"(?:[^"\n\r\\]|(?:"")|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*'),
+    "'": re.compile(r"'(?:[^'\n\r\\]|(?:'')|(?:\\(?:[^x]|x[0-9a-fA-F]+)))*"),
+}
+identifier_re = re.compile(r"[A-Za-z][A-Za-z0-9_]*")
+value_re = re.compile(r"[A-Za-z0-9]+")
+
+punctuation = {"-": MINUS, ",": COMMA, "(": LPAREN, ")": RPAREN}
+
+# Binary operators from lowest to highest precedence. A sequence of terms separated by
+# whitespace binds tighter than all of them and is an implicit AND.
+binary_operators = [("OR", Or), ("AND", And)]
+
+
+def scan(query: str, pos: int = 0) -> Iterator[Token]:
+    """Yield the tokens of the query from `pos` on, without the END token."""
+    length = len(query)
+
+    while True:
+        pos = whitespace_re.match(query, pos).end()
+        if pos >= length:
+            return
+
+        char = query[pos]
+
+        if char in punctuation:
+            yield Token(punctuation[char], char, pos, pos + 1)
+            pos += 1
+            continue
+
+        if char == ":":
+            end = operator_re.match(query, pos).end()
+            yield Token(OPERATOR, query[pos:end], pos, end)
+            pos = end
+            continue
+
+        if char in quoted_prefix_re:
+            end = quoted_prefix_re[char].match(query, pos).end()
+            if end >= length or query[end] != char:
+                raise ParserError("Unterminated quoted string", pos)
+            yield Token(QUOTED, query[pos : end + 1], pos, end + 1)
+            pos = end + 1
+            continue
+
+        match = word_re.match(query, pos)
+        if match is None:
+            raise ParserError(f"Unexpected character {char!r}", pos)
+
+        yield Token(WORD, match.group(), pos, match.end())
+        pos = match.end()
+
+
+def tokenize(query: str) -> List[Token]:
+    """Split the query into tokens in a single pass. The list always ends with an END token."""
+    tokens = list(scan(query))
+    tokens.append(Token(END, "", len(query), len(query)))
+    return tokens
+
+
+class PrattGithubSyntaxParser(GithubSyntaxParser):
+    """GitHub syntax parser using the single-pass tokenizer instead of pyparsing."""
+
+    def __init__(self, query: str):
+        super().__init__(query, backend="pratt")
+
+    def parse_expression(self):
+        self.tokens = tokenize(self.query)
+        self.index = 0
+
+        result = self.parse_binary(0)
+
+        if self.current.kind != END:
+            self.error("Expected end of text")
+
+        return result
+
+    @property
+    def current(self) -> Token:
+        return self.tokens[self.index]
+
+    def peek(self, offset=1) -> Token:
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def error(self, message, token=None):
+        token = token or self.current
+        found = f", found {token.text!r}" if token.kind != END else ""
+        raise ParserError(f"{message}{found} (at char {token.start})", token.start)
+
+    def expect(self, kind, message):
+        token = self.current
+        if token.kind != kind:
+            self.error(message)
+        self.index += 1
+        return token
+
+    def accept_keyword(self, keyword):
+        """
+        Consume `keyword` if the current word starts with it. Like the pyparsing literals the
+        keyword does not need to be followed by a word boundary; the rest of the word is left
+        as the next token.
+        """
+        token = self.current
+        if token.kind != WORD or not token.text.startswith(keyword):
+            return False
+
+        if len(token.text) == len(keyword):
+            self.index += 1
+        else:
+            start = token.start + len(keyword)
+            self.tokens[self.index] = Token(
+                WORD, token.text[len(keyword) :], start, token.end
+            )
+
+        return True
+
+    def parse_binary(self, precedence):
+        """Parse all operators binding at least as tight as `precedence` (precedence climbing)."""
+        if precedence == len(binary_operators):
+            return self.parse_unary()
+
+        keyword, operator_class = binary_operators[precedence]
+
+        operands = [self.parse_binary(precedence + 1)]
+        while self.accept_keyword(keyword):
+            operands.append(self.parse_binary(precedence + 1))
+
+        return operator_class(*operands) if len(operands) > 1 else operands[0]
+
+    def parse_unary(self):
+        if self.accept_keyword("NOT"):
+            return Not(self.parse_unary())
+
+        return self.parse_sequence()
+
+    def parse_sequence(self):
+        """Parse terms separated by whitespace as implicit AND."""
+        if not self.at_term():
+            self.error("Expected a key:value pair or a group")
+
+        terms = [self.parse_term()]
+        while self.at_term():
+            terms.append(self.parse_term())
+
+        return And(*terms) if len(terms) > 1 else terms[0]
+
+    def at_term(self):
+        token = self.current
+
+        if token.kind == LPAREN:
+            return True
+
+        if token.kind == MINUS:
+            identifier = self.peek()
+            return (
+                identifier.start == token.end
+                and self.is_identifier(identifier)
+                and self.peek(2).kind == OPERATOR
+            )
+
+        return self.is_identifier(token) and self.peek().kind == OPERATOR
+
+    @staticmethod
+    def is_identifier(token):
+        return token.kind == WORD and identifier_re.fullmatch(token.text) is not None
+
+    def parse_term(self):
+        if self.current.kind == LPAREN:
+            self.index += 1
+            result = self.parse_binary(0)
+            self.expect(RPAREN, "Expected ')'")
+            return result
+
+        negated = self.current.kind == MINUS
+        if negated:
+            self.index += 1
+
+        key = self.expect(WORD, "Expected a key").text
+        op = self.expect(OPERATOR, "Expected an operator").text
+
+        values = [self.parse_value()]
+        while self.current.kind == COMMA:
+            self.index += 1
+            values.append(self.parse_value())
+
+        return build_key_value(f"-{key}" if negated else key, op, values)
+
+    def parse_value(self):
+        token = self.current
+
+        if token.kind == QUOTED:
+            self.index += 1
+            return token.text
+
+        if token.kind == WORD:
+            match = value_re.match(token.text)
+            if match is None:
+                self.error("Expected a value")
+            if match.end() != len(token.text):
+                # values may not contain underscores, only the alphanumeric prefix is a value
+                rest = Token(
+                    WORD,
+                    token.text[match.end() :],
+                    token.start + match.end(),
+                    token.end,
+                )
+                self.error("Expected end of text", rest)
+            self.index += 1
+            return token.text
+
+        self.error("Expected a value")
@@ -0,0 +1,481 @@
+"""
+Parser for RQL (Resource Query Language), e.g. `eq(a,1)&lt(b,2)` or `a=ge=3&sort(-b)`.
+
+A port of `js/packages/filters-rql/parser.js`. The JavaScript version normalizes the query with
+a chain of regular expression rewrites over the whole string (FIQL `a=ge=3` to `ge(a,3)`, slash
+arrays to parentheses, ...) before parsing it. Here the query is tokenized in a single pass and
+parsed by recursive descent, so the time is linear in the length of the query.
+"""
+
+import json
+import math
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Sequence
+from urllib.parse import quote, unquote
+
+from .base import BaseParser, ParserError
+from .github_pratt import Token
+from ..types import (
+    And,
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    Lt,
+    Not,
+    Operator,
+    OperatorError,
+    Or,
+    Sort,
+)
+
+WORD = "word"
+COMPARISON = "comparison"
+AMPERSAND = "ampersand"
+PIPE = "pipe"
+COMMA = "comma"
+LPAREN = "lparen"
+RPAREN = "rparen"
+END = "end"
+
+token_re = re.compile(
+    r"""
+    (?P<comparison>[<>!]?=(?:\w*=)?|[<>]|%3C=?|%3E=?)
+    |(?P<word>(?:[+*$\-:\w._/]|%(?!3[CE]))+)
+    |(?P<ampersand>&)|(?P<pipe>\|)|(?P<comma>,)|(?P<lparen>\()|(?P<rparen>\))
+    """,
+    re.VERBOSE,
+)
+
+comparison_names = {
+    "=": "eq",
+    "==": "eq",
+    "!=": "ne",
+    ">": "gt",
+    ">=": "ge",
+    "<": "lt",
+    "<=": "le",
+    # URL encoded `<` and `>`, like `jsonQueryCompatible` in the JavaScript parser
+    "%3C": "lt",
+    "%3C=": "le",
+    "%3E": "gt",
+    "%3E=": "ge",
+}
+
+comparisons = {"eq": Eq, "gt": Gt, "ge": Ge, "lt": Lt, "le": Le, "contains": Co}
+
+auto_converted = {
+    "true": True,
+    "false": False,
+    "Infinity": math.inf,
+    "-Infinity": -math.inf,
+}
+
+
+def to_number(string):
+    try:
+        return int(string)
+    except ValueError:
+        return float(string)
+
+
+def auto_convert(string):
+    if string in auto_converted:
+        return auto_converted[string]
+
+    try:
+        number = to_number(string)
+    except ValueError:
+        number = None
+
+    # like JavaScript, only canonical numbers (`3`, `1.5` but not `007`) are converted
+    if number is not None and str(number) == string:
+        return number
+
+    string = unquote(string)
+    if len(string) > 1 and string[0] == string[-1] == "'":
+        return json.loads(f'"{string[1:-1]}"')
+    return string
+
+
+def to_date(string):
+    return datetime.fromisoformat(string.replace("Z", "+00:00"))
+
+
+def to_isodate(string):
+    # partial dates like `2020` or `2020-05` are padded to a full timestamp
+    padded = string.rjust(4, "0")
+    return to_date(padded + "0000-01-01T00:00:00Z"[len(padded) :])
+
+
+def to_epoch(string):
+    return datetime.fromtimestamp(to_number(string) / 1000, tz=timezone.utc)
+
+
+def to_decimal(string):
+    try:
+        number = Decimal(string)
+    except InvalidOperation:
+        raise ValueError(f"Invalid decimal {string!r}")
+    # NaN and Infinity aren't filter values, and a signaling NaN can't even be hashed
+    if not number.is_finite():
+        raise ValueError(f"Invalid decimal {string!r}")
+    return number
+
+
+def to_timedelta(string):
+    # whole microseconds, exact unlike seconds as a float
+    return timedelta(microseconds=int(string))
+
+
+converters = {
+    "auto": auto_convert,
+    "number": to_number,
+    "string": unquote,
+    "boolean": lambda string: string == "true",
+    "date": to_date,
+    "isodate": to_isodate,
+    "epoch": to_epoch,
+    # not in the JavaScript parser, for the Python types `to_rql` writes
+    "decimal": to_decimal,
+    "day": date.fromisoformat,
+    "time": time.fromisoformat,
+    "timedelta": to_timedelta,
+}
+
+
+def tokenize(query: str) -> List[Token]:
+    """Split the query into tokens in a single pass. The list always ends with an END token."""
+    tokens = []
+    pos = 0
+    length = len(query)
+
+    while pos < length:
+        match = token_re.match(query, pos)
+        if match is None:
+            raise ParserError(f"Illegal character {query[pos]!r} (at char {pos})", pos)
+
+        tokens.append(Token(match.lastgroup, match.group(), pos, match.end()))
+        pos = match.end()
+
+    tokens.append(Token(END, "", length, length))
+    return tokens
+
+
+class RqlSyntaxParser(BaseParser):
+    """Parses RQL into a FilterQuery. `sort()` and `limit()` set the sort, limit and offset."""
+
+    def __init__(self, query: str, parameters: Optional[Sequence] = None):
+        super().__init__(query)
+        # values for `$1`, `$2`, ... placeholders
+        self.parameters = parameters
+
+    def parse(self) -> FilterQuery:
+        if self.query.startswith("?"):
+            raise ParserError("Query must not start with '?'", 0)
+
+        self.tokens = tokenize(self.query)
+        self.index = 0
+        self.sort = []
+        self.limit = None
+        self.offset = None
+
+        terms = self.parse_group(top=True) if self.current.kind != END else []
+        if self.current.kind != END:
+            self.error("Closing parenthesis without an opening parenthesis")
+
+        query = terms[0] if len(terms) == 1 else And(*terms)
+
+        return FilterQuery(
+            query=query, sort=self.sort, limit=self.limit, offset=self.offset
+        )
+
+    @property
+    def current(self) -> Token:
+        return self.tokens[self.index]
+
+    def peek(self) -> Token:
+        return self.tokens[min(self.index + 1, len(self.tokens) - 1)]
+
+    def error(self, message, token=None):
+        token = token or self.current
+        found = f", found {token.text!r}" if token.kind != END else ""
+        raise ParserError(f"{message}{found} (at char {token.start})", token.start)
+
+    def expect(self, kind, message):
+        token = self.current
+        if token.kind != kind:
+            self.error(message)
+        self.index += 1
+        return token
+
+    def parse_group(self, top=False) -> List[Optional[Operator]]:
+        """Parse terms joined by `&`/`,` (and) or `|` (or), which may not be mixed."""
+        terms = [self.parse_term(top)]
+        conjunction = None
+
+        while self.current.kind in (AMPERSAND, PIPE, COMMA):
+            name = "or" if self.current.kind == PIPE else "and"
+            if conjunction is not None and conjunction != name:
+                self.error(
+                    "Can not mix conjunctions within a group, use parentheses around each set "
+                    "of same conjunctions (& and |)"
+                )
+            conjunction = name
+            self.index += 1
+            terms.append(self.parse_term(top))
+
+        # sort() and limit() are no filters
+        terms = [term for term in terms if term is not None]
+
+        if conjunction == "or":
+            return [Or(*terms)]
+        return terms
+
+    def parse_term(self, top=False) -> Optional[Operator]:
+        token = self.current
+
+        if token.kind == LPAREN:
+            self.index += 1
+            terms = self.parse_group()
+            self.expect(RPAREN, "Opening parenthesis without a closing parenthesis")
+            return terms[0] if len(terms) == 1 else And(*terms)
+
+        if token.kind == WORD and self.peek().kind == LPAREN:
+            return self.parse_call(top)
+
+        if token.kind == WORD and self.peek().kind == COMPARISON:
+            return self.parse_comparison()
+
+        self.error("Expected a call, a comparison or a group")
+
+    def parse_comparison(self) -> Operator:
+        """FIQL style comparison, e.g. `a=3`, `a<=3` or `a=in=(1,2)`."""
+        key = self.parse_key()
+        token = self.expect(COMPARISON, "Expected a comparison")
+
+        name = comparison_names.get(token.text)
+        if name is None:
+            name = token.text[1:-1] if len(token.text) > 2 else None
+        if not name:
+            self.error("Illegal operator", token)
+
+        if self.current.kind == LPAREN:
+            value = self.parse_array()
+        else:
+            value = self.parse_value()
+
+        return self.build(name, [key, value], token)
+
+    def parse_call(self, top=False) -> Optional[Operator]:
+        token = self.expect(WORD, "Expected an operator")
+        self.expect(LPAREN, "Expected '('")
+
+        args = []
+        if self.current.kind != RPAREN:
+            args.append(self.parse_argument())
+            while self.current.kind == COMMA:
+                self.index += 1
+                args.append(self.parse_argument())
+
+        self.expect(RPAREN, "Opening parenthesis without a closing parenthesis")
+
+        if token.text in ("sort", "limit"):
+            if not top:
+                self.error(f"{token.text}() is only allowed at the top level", token)
+            self.apply_modifier(token, args)
+            return None
+
+        return self.build(token.text, args, token)
+
+    def parse_argument(self):
+        token = self.current
+
+        if token.kind == WORD and self.peek().kind == LPAREN:
+            return self.parse_call()
+        if token.kind == WORD and self.peek().kind == COMPARISON:
+            return self.parse_comparison()
+        if token.kind == LPAREN:
+            return self.parse_array()
+        return self.parse_value()
+
+    def parse_array(self) -> tuple:
+        self.expect(LPAREN, "Expected '('")
+
+        values = []
+        if self.current.kind != RPAREN:
+            values.append(self.parse_value())
+            while self.current.kind == COMMA:
+                self.index += 1
+                values.append(self.parse_value())
+
+        self.expect(RPAREN, "Expected ')'")
+        return tuple(values)
+
+    def parse_key(self) -> str:
+        token = self.expect(WORD, "Expected a property")
+        # slash separated paths (`author/name`) are nested properties
+        return "__".join(unquote(part) for part in token.text.split("/"))
+
+    def parse_value(self):
+        token = self.current
+
+        if token.kind != WORD:
+            # empty value, e.g. `eq(a,)`
+            if token.kind in (COMMA, RPAREN, AMPERSAND, PIPE, END):
+                return ""
+            self.error("Expected a value")
+
+        self.index += 1
+
+        if "/" in token.text:
+            # slash separated values are arrays
+            return tuple(self.convert(part, token) for part in token.text.split("/"))
+        return self.convert(token.text, token)
+
+    def convert(self, string: str, token: Token):
+        if string.startswith("$"):
+            index = int(string[1:]) - 1 if string[1:].isdigit() else -1
+            if index < 0 or not self.parameters or index >= len(self.parameters):
+                self.error(f"Missing parameter {string}", token)
+            return self.parameters[index]
+
+        converter = converters["auto"]
+        if ":" in string:
+            prefix, string = string.split(":", 1)
+            if prefix not in converters:
+                self.error(f"Unknown converter {prefix!r}", token)
+            converter = converters[prefix]
+
+        try:
+            return converter(string)
+        except (ValueError, ArithmeticError, TypeError, OSError):
+            # e.g. OverflowError for `epoch:1e999`, OSError from fromtimestamp on some platforms
+            self.error(f"Invalid value {string!r}", token)
+
+    def apply_modifier(self, token, args):
+        try:
+            if token.text == "sort":
+                self.sort.extend(Sort(str(key)) for key in args)
+                return
+
+            # an empty count (`limit(,20)`) only sets the start
+            args = [None if arg == "" else arg for arg in args]
+            if (
+                not args
+                or len(args) > 2
+                or not all(a is None or isinstance(a, int) for a in args)
+            ):
+                self.error("limit() expects a count and an optional start", token)
+            self.limit = args[0]
+            self.offset = args[1] if len(args) > 1 else None
+        except OperatorError as e:
+            self.error(str(e), token)
+
+    def build(self, name: str, args: list, token: Token) -> Operator:
+        """Translate an RQL operator with its arguments to an Operator."""
+        try:
+            if name in ("and", "or"):
+                if not all(isinstance(arg, Operator) for arg in args):
+                    self.error(f"{name}() expects queries as arguments", token)
+                return (And if name == "and" else Or)(*args)
+
+            if name == "not":
+                if len(args) != 1 or not isinstance(args[0], Operator):
+                    self.error("not() expects a single query", token)
+                return Not(args[0])
+
+            if not args or not isinstance(args[0], str):
+                self.error(f"{name}() expects a property as first argument", token)
+            key, values = args[0], args[1:]
+
+            if name in ("in", "out"):
+                # `in(a,(1,2))` or `in(a,1,2)`
+                if len(values) == 1 and isinstance(values[0], tuple):
+                    values = values[0]
+                operator = In(key, tuple(values))
+                return operator if name == "in" else Not(operator)
+
+            if len(values) != 1:
+                self.error(f"{name}() expects a property and a value", token)
+
+            if name == "ne":
+                return Not(Eq(key, values[0]))
+            if name == "excludes":
+                return Not(Co(key, values[0]))
+            if name in comparisons:
+                return comparisons[name](key, values[0])
+        except OperatorError as e:
+            self.error(str(e), token)
+
+        self.error(f"Unknown operator {name!r}", token)
+
+
+def parse(query: str, parameters: Optional[Sequence] = None) -> FilterQuery:
+    """Parse an RQL query string into a FilterQuery."""
+    return RqlSyntaxParser(query or "", parameters).parse()
+
+
+rql_names = {Eq: "eq", Gt: "gt", Ge: "ge", Lt: "lt", Le: "le", Co: "contains", In: "in"}
+
+
+def value_to_rql(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            # `decimal:` only reads finite values
+            return value_to_rql(float("nan") if value.is_nan() else float(value))
+        return f"decimal:{value}"
+    if isinstance(value, datetime):
+        return f"date:{quote(value.isoformat(), safe=':+')}"
+    if isinstance(value, date):
+        return f"day:{value.isoformat()}"
+    if isinstance(value, time):
+        return f"time:{quote(value.isoformat(), safe=':+')}"
+    if isinstance(value, timedelta):
+        return f"timedelta:{value // timedelta(microseconds=1)}"
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return f"({','.join(map(value_to_rql, value))})"
+
+    string = quote(str(value), safe="")
+    # strings that would be converted otherwise (`3`, `true`, `a:b`) are marked as strings, and
+    # so is the empty string, `()` would be read as an empty array
+    if not string or auto_convert(string) != str(value) or ":" in str(value):
+        return f"string:{string}"
+    return string
+
+
+def operator_to_rql(operator: Operator) -> str:
+    if isinstance(operator, (And, Or, Not)):
+        return f"{operator.operation}({','.join(map(operator_to_rql, operator.args))})"
+
+    # keys are read like values, e.g. `true` would become a boolean
+    key = value_to_rql(operator.key)
+    return f"{rql_names[operator.__class__]}({key},{value_to_rql(operator.value)})"
+
+
+def to_rql(filter_query: FilterQuery) -> str:
+    """
+    Serialize a FilterQuery to RQL, which `parse` reads back with the same values for strings,
+    numbers, booleans, Decimal, date, datetime, time, timedelta and tuples of them (NaN is read
+    back as NaN). Other values are written as strings.
+    """
+    parts = []
+    if not isinstance(filter_query.query, And) or filter_query.query.args:
+        parts.append(operator_to_rql(filter_query.query))
+    if filter_query.sort:
+        keys = [("-" if s.descending else "+") + s.key for s in filter_query.sort]
+        parts.append(f"sort({','.join(keys)})")
+    if filter_query.limit is not None or filter_query.offset is not None:
+        limit = "" if filter_query.limit is None else str(filter_query.limit)
+        offset = "" if filter_query.offset is None else f",{filter_query.offset}"
+        parts.append(f"limit({limit}{offset})")
+    return "&".join(parts)
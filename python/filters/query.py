@@ -1,121 +1,229 @@
+"""
+Chainable query builder, for example:
 
-import urllib.parse as urlparse
-
-# Provides a Query constructor with chainable capability
-# For example:
-# query = Query()
-# query.executor = lambda query: require("./js-array").query(query, params, data)  # if we want to operate on an array
-# query.eq("a", 3).le("b", 4).forEach(lambda object: None)
-
-def parseQuery(query, params):
-    try:
-        import promised_io.promise as promise
-    except Exception as e:
-        promise = lambda value, callback: callback(value)
-
-    class Query:
-        def __init__(self, seed=None, params=None):
-            if isinstance(seed, str):
-                return parseQuery(seed, params)
-            q = Query()
-            if seed and seed.name and seed.args:
-                q.name, q.args = seed.name, seed.args
-            return q
-
-    exports = {'Query': Query}
-    # export more functions and update query methods
-    def queryToString(part):
-        if isinstance(part, list):
-            return "(" + serializeArgs(part, ",") + ")"
-        if part and part.name and part.args:
-            return [part.name, "(", serializeArgs(part.args, ","), ")"].join("")
-
-    def encodeString(s):
-        if isinstance(s, str):
-            s = urlparse.quote(s)
-            if any(c in ["(", ")"] for c in s):
-                s = s.replace("(", "%28").replace(")", "%29")
-        return s
-
-    def encodeValue(val):
-        encoded = None
-        if val is None:
-            val = 'null'
-        if val != parser.converters["default"](str(val):
-            type_ = type(val)
-            if isinstance(val, re.Pattern):
-                val = val.pattern
-                i = val.rfind('/')
-                type_ = "re" if 'i' in val[i:] else "RE"
-                val = encodeString(val[1:i])
-                encoded = True
-            if type_ == "object":
-                type_ = "epoch"
-                val = val.getTime()
-                encoded = True
-            if type_ == "string":
-                val = encodeString(val)
-                encoded = True
-            val = ":".join([type_, val])
-        if not encoded and type(val) == "string":
-            val = encodeString(val)
-        return val
-
-    def updateQueryMethods():
-        for name in exports.knownOperators:
-            def new_method(self, *args):
-                newQuery = Query()
-                newQuery.executor = self.executor
-                newTerm = Query(name)
-                newTerm.args = list(args)
-                newQuery.args = self.args + [newTerm]
-                return newQuery
-
-            setattr(Query, name, new_method)
-
-        for name in exports.knownScalarOperators:
-            def new_method(self, *args):
-                newQuery = Query()
-                newQuery.executor = self.executor
-                newTerm = Query(name)
-                newTerm.args = list(args)
-                newQuery.args = self.args + [newTerm]
-                return newQuery.executor(newQuery)
-
-            setattr(Query, name, new_method)
-
-        for name in exports.arrayMethods:
-            def new_method(self, *args):
-                def callback(results):
-                    return getattr(results, name)(*args)
-                    
-                return promise(self.executor(self), callback)
-
-            setattr(Query, name, new_method)
-
-    exports.updateQueryMethods = updateQueryMethods
-    exports.updateQueryMethods()
-
-    return exports
-
-# Recursively iterate over query terms calling 'fn' for each term
-Query.walk = lambda self, fn, options=None: None # Implement the walk method
-
-# Append a new term
-Query.push = lambda self, term: self.args.append(term)
-
-# Disambiguate query
-Query.normalize = lambda self, options=None: None # Implement the normalize method
-
-# An example will be welcome
-Query.toMongo = lambda self, options=None: self.normalize({
-    'primaryKey': '_id',
-    'map': {
-        'ge': 'gte',
-        'le': 'lte'
-    },
-    'known': ['lt', 'lte', 'gt', 'gte', 'ne', 'in', 'nin', 'not', 'mod', 'all', 'size', 'exists', 'type', 'elemMatch']
-})
-
-exports = parseQuery
-return exports
+    query = Query(executor=InMemoryExecutor(records))
+    for record in query.eq("a", 3).le("b", 4).sort("-b").limit(10):
+        ...
+
+Every call returns a new Query and nothing is executed until the results are requested, then
+the FilterQuery is passed to the executor: `InMemoryExecutor` for lists of dicts or objects,
+`index.IndexedCollection` for indexed collections, `QuerySetExecutor` in
+`integrations/django.py` for querysets, or any callable taking a FilterQuery. Executors may
+also provide `count(filter_query)`.
+
+Asynchronous executors (`AsyncInMemoryExecutor`, `AsyncQuerySetExecutor`) return awaitables
+and are used with `await query.aexecute()` or `async for record in query`.
+"""
+
+import asyncio
+import inspect
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+from .evaluator import ASYNC_BATCH_SIZE, acount, aevaluate, count, evaluate
+from .types import And, Co, Eq, FilterQuery, Ge, Gt, In, Le, Lt, Not, Operator, Or, Sort
+
+TERM = "term"
+SORT = "sort"
+LIMIT = "limit"
+
+# not set by any call, None is a valid value (e.g. `limit(None)` removes a limit)
+UNSET = object()
+
+
+class InMemoryExecutor:
+    """
+    Evaluates queries against an iterable of dicts or objects, optionally ordering the checks
+    with `statistics.Statistics`.
+    """
+
+    def __init__(self, records: Iterable, statistics=None):
+        self.records = records
+        self.statistics = statistics
+
+    def __call__(self, filter_query: FilterQuery) -> list:
+        return evaluate(filter_query, self.records, self.statistics)
+
+    def count(self, filter_query: FilterQuery) -> int:
+        return count(filter_query, self.records, self.statistics)
+
+
+class AsyncInMemoryExecutor(InMemoryExecutor):
+    """
+    Evaluates queries against an iterable or async iterable, yielding to the event loop after
+    every `batch_size` records.
+    """
+
+    def __init__(self, records, batch_size: int = ASYNC_BATCH_SIZE):
+        super().__init__(records)
+        self.batch_size = batch_size
+
+    async def __call__(self, filter_query: FilterQuery) -> list:
+        return await aevaluate(filter_query, self.records, self.batch_size)
+
+    async def count(self, filter_query: FilterQuery) -> int:
+        return await acount(filter_query, self.records, self.batch_size)
+
+
+class Query:
+    """
+    Immutable builder for FilterQuery objects.
+
+    Calls are stored as a linked list of nodes pointing to the previous query, so adding a term
+    doesn't copy the terms before it and branching off a shared base query is cheap. The
+    FilterQuery is built once, when it is first needed.
+    """
+
+    def __init__(
+        self,
+        seed: Union[str, Operator, FilterQuery, None] = None,
+        executor: Optional[Callable[[FilterQuery], object]] = None,
+    ):
+        self.executor = executor
+        self._node = None
+        self._filter_query = None
+
+        if isinstance(seed, str):
+            from .parsers.rql import parse
+
+            seed = parse(seed)
+
+        if isinstance(seed, Operator):
+            self._node = (None, TERM, seed)
+        elif isinstance(seed, FilterQuery):
+            self._node = (None, TERM, seed.query)
+            if seed.sort:
+                self._node = (self._node, SORT, list(seed.sort))
+            if seed.limit is not None or seed.offset is not None:
+                self._node = (self._node, LIMIT, (seed.limit, seed.offset))
+
+    def _push(self, kind, value) -> "Query":
+        query = Query(executor=self.executor)
+        query._node = (self._node, kind, value)
+        return query
+
+    def push(self, operator: Operator) -> "Query":
+        """Add an Operator, which is ANDed with the other terms."""
+        return self._push(TERM, operator)
+
+    def eq(self, key, value) -> "Query":
+        return self.push(Eq(key, value))
+
+    def ne(self, key, value) -> "Query":
+        return self.push(Not(Eq(key, value)))
+
+    def lt(self, key, value) -> "Query":
+        return self.push(Lt(key, value))
+
+    def le(self, key, value) -> "Query":
+        return self.push(Le(key, value))
+
+    def gt(self, key, value) -> "Query":
+        return self.push(Gt(key, value))
+
+    def ge(self, key, value) -> "Query":
+        return self.push(Ge(key, value))
+
+    def contains(self, key, value) -> "Query":
+        return self.push(Co(key, value))
+
+    def excludes(self, key, value) -> "Query":
+        return self.push(Not(Co(key, value)))
+
+    def in_(self, key, values) -> "Query":
+        return self.push(In(key, values))
+
+    def out(self, key, values) -> "Query":
+        return self.push(Not(In(key, values)))
+
+    def and_(self, *queries: Union["Query", Operator]) -> "Query":
+        return self.push(And(*map(to_operator, queries)))
+
+    def or_(self, *queries: Union["Query", Operator]) -> "Query":
+        return self.push(Or(*map(to_operator, queries)))
+
+    def not_(self, query: Union["Query", Operator]) -> "Query":
+        return self.push(Not(to_operator(query)))
+
+    def sort(self, *keys: str) -> "Query":
+        """Sort by the keys, prefixed with `-` for descending. Replaces a previous sort."""
+        return self._push(SORT, [Sort(key) for key in keys])
+
+    def limit(self, count: Optional[int], start: Optional[int] = None) -> "Query":
+        return self._push(LIMIT, (count, start))
+
+    @property
+    def filter_query(self) -> FilterQuery:
+        if self._filter_query is None:
+            terms, sort, limits = [], UNSET, UNSET
+
+            # walk the chain once from the last call back to the first
+            node = self._node
+            while node is not None:
+                node, kind, value = node
+                if kind == TERM:
+                    terms.append(value)
+                elif kind == SORT and sort is UNSET:
+                    sort = value
+                elif kind == LIMIT and limits is UNSET:
+                    limits = value
+
+            terms.reverse()
+            query = terms[0] if len(terms) == 1 else And(*terms)
+            limit, offset = (None, None) if limits is UNSET else limits
+            sort = [] if sort is UNSET else list(sort)
+            self._filter_query = FilterQuery(query, sort, limit, offset)
+
+        return self._filter_query.copy()
+
+    def to_operator(self) -> Operator:
+        return self.filter_query.query
+
+    def using(self, executor: Callable[[FilterQuery], object]) -> "Query":
+        """Return the same query with another executor."""
+        query = Query(executor=executor)
+        query._node = self._node
+        return query
+
+    def execute(self):
+        """Pass the FilterQuery to the executor and return its result."""
+        if self.executor is None:
+            raise ValueError("Query has no executor, see Query.using()")
+        return self.executor(self.filter_query)
+
+    def __iter__(self):
+        return iter(self.execute())
+
+    def count(self) -> int:
+        """Number of matching records, ignoring sort, offset and limit."""
+        if not hasattr(self.executor, "count"):
+            raise ValueError(f"{self.executor!r} does not support count")
+        return self.executor.count(self.filter_query)
+
+    async def aexecute(self):
+        """Execute with an asynchronous executor (synchronous ones work as well)."""
+        result = self.execute()
+        return await result if inspect.isawaitable(result) else result
+
+    async def acount(self) -> int:
+        result = self.count()
+        return await result if inspect.isawaitable(result) else result
+
+    async def aexecute_with_count(self) -> Tuple[object, int]:
+        """Run the query and its count concurrently, e.g. for a page and the total."""
+        return tuple(await asyncio.gather(self.aexecute(), self.acount()))
+
+    async def __aiter__(self):
+        for record in await self.aexecute():
+            yield record
+
+    def __str__(self):
+        from .parsers.rql import to_rql
+
+        return to_rql(self.filter_query)
+
+    def __repr__(self):
+        return f"Query({str(self)!r})"
+
+
+def to_operator(query: Union[Query, Operator]) -> Operator:
+    return query.to_operator() if isinstance(query, Query) else query
@@ -0,0 +1,335 @@
+"""
+Canonical serialization of FilterQuery objects, for cache keys and for passing filters between
+services.
+
+`dumps`/`loads` use a compact JSON text form, the tree as nested tagged arrays:
+
+    [["and",["eq","name","John"],["lt","age",30]],["-age"],10,null]
+
+that is `[tree, sort, limit, offset]`. Values keep their types, JSON types as they are and the
+others as single key objects, e.g. `{"dec":"9.99"}` or `{"date":"2020-01-31"}`. Equal queries
+always serialize to the same string.
+
+`dumpb`/`loadb` use an equivalent binary form of tagged values, one tag byte per node and
+value followed by varint lengths and integers (similar to msgpack), without dependencies.
+
+Loading either form only rebuilds the tree, which is much faster than parsing the GitHub
+syntax again, see `benchmarks/serialization.py`.
+"""
+
+import json
+import struct
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from .types import (
+    And,
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    LogicalOperator,
+    Lt,
+    Not,
+    Operator,
+    OperatorError,
+    Or,
+    Sort,
+)
+
+OPERATORS = {cls.operation: cls for cls in (And, Or, Not, Eq, Gt, Ge, Lt, Le, Co, In)}
+
+
+class SerializationError(ValueError):
+    pass
+
+
+# Text form
+
+
+def encode_value(value):
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, tuple):
+        return [encode_value(v) for v in value]
+    if isinstance(value, frozenset):
+        # sets have no order, sort them for a canonical form
+        return {"set": sorted((encode_value(v) for v in value), key=repr)}
+    if isinstance(value, Decimal):
+        return {"dec": str(value)}
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"date": value.isoformat()}
+    if isinstance(value, time):
+        return {"time": value.isoformat()}
+    if isinstance(value, timedelta):
+        return {"td": [value.days, value.seconds, value.microseconds]}
+    raise SerializationError(
+        f"Can't serialize value of type {value.__class__.__name__}"
+    )
+
+
+VALUE_DECODERS = {
+    "set": frozenset,
+    "dec": Decimal,
+    "dt": datetime.fromisoformat,
+    "date": date.fromisoformat,
+    "time": time.fromisoformat,
+    "td": lambda args: timedelta(*args),
+}
+
+
+def decode_object(obj: dict):
+    # called by json.loads for every object, which are only used for tagged values
+    ((tag, value),) = obj.items()
+    return VALUE_DECODERS[tag](value)
+
+
+def encode_operator(operator: Operator) -> list:
+    if isinstance(operator, LogicalOperator):
+        return [operator.operation, *map(encode_operator, operator.args)]
+    return [operator.operation, operator.key, encode_value(operator.value)]
+
+
+def decode_operator(data: list) -> Operator:
+    operator_class = OPERATORS[data[0]]
+    if issubclass(operator_class, LogicalOperator):
+        return operator_class(*map(decode_operator, data[1:]))
+
+    _, key, value = data
+    if isinstance(value, list):
+        value = tuple(value)
+    return operator_class(key, value)
+
+
+def dumps(filter_query: FilterQuery) -> str:
+    """Serialize to the canonical text form."""
+    data = [
+        encode_operator(filter_query.query),
+        [str(s) for s in filter_query.sort],
+        filter_query.limit,
+        filter_query.offset,
+    ]
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def loads(text: str) -> FilterQuery:
+    """Deserialize the text form written by `dumps`."""
+    try:
+        tree, sort, limit, offset = json.loads(text, object_hook=decode_object)
+        return FilterQuery(
+            decode_operator(tree), [Sort(key) for key in sort], limit, offset
+        )
+    except (
+        ValueError,
+        TypeError,
+        KeyError,
+        IndexError,
+        OverflowError,
+        RecursionError,
+        InvalidOperation,
+        OperatorError,
+    ) as e:
+        raise SerializationError(f"Invalid serialized query: {e}") from e
+
+
+# Binary form
+#
+# node:  opcode, then the number of children and the children (and, or), the child (not) or
+#        the key and the value (key-value operators)
+# value: tag, then for `s` (str) and `D` (decimal) a varint length and the UTF-8 bytes, for `i`
+#        a zigzag varint, for `f` 8 bytes (double), for `l`/`S` (tuple/set) a varint count and
+#        the values, for dates the ISO string like `s`
+# query: version, node, varint number of sort keys, the sort keys (as `s` without tag), limit
+#        and offset as values (`N` for None)
+
+VERSION = 1
+
+OPCODES = {cls: i for i, cls in enumerate((And, Or, Not, Eq, Gt, Ge, Lt, Le, Co, In))}
+OPCODE_CLASSES = {i: cls for cls, i in OPCODES.items()}
+
+double = struct.Struct("<d")
+
+
+def write_varint(out: bytearray, number: int):
+    while number > 0x7F:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def write_str(out: bytearray, string: str):
+    data = string.encode()
+    write_varint(out, len(data))
+    out += data
+
+
+def write_value(out: bytearray, value):
+    if value is None:
+        out += b"N"
+    elif value is True:
+        out += b"T"
+    elif value is False:
+        out += b"F"
+    elif isinstance(value, str):
+        out += b"s"
+        write_str(out, value)
+    elif isinstance(value, int):
+        out += b"i"
+        write_varint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out += b"f"
+        out += double.pack(value)
+    elif isinstance(value, (tuple, frozenset)):
+        values = value if isinstance(value, tuple) else sorted(value, key=repr)
+        out += b"l" if isinstance(value, tuple) else b"S"
+        write_varint(out, len(values))
+        for v in values:
+            write_value(out, v)
+    elif isinstance(value, timedelta):
+        out += b"r"
+        for part in (value.days, value.seconds, value.microseconds):
+            write_value(out, part)
+    elif isinstance(value, Decimal):
+        out += b"D"
+        write_str(out, str(value))
+    else:
+        # datetime before date, it is a subclass
+        for value_type, tag in ((datetime, b"M"), (date, b"d"), (time, b"t")):
+            if isinstance(value, value_type):
+                out += tag
+                write_str(out, value.isoformat())
+                return
+        raise SerializationError(
+            f"Can't serialize value of type {value.__class__.__name__}"
+        )
+
+
+def write_operator(out: bytearray, operator: Operator):
+    out.append(OPCODES[operator.__class__])
+    if isinstance(operator, LogicalOperator):
+        if not isinstance(operator, Not):
+            write_varint(out, len(operator.args))
+        for arg in operator.args:
+            write_operator(out, arg)
+    else:
+        write_str(out, operator.key)
+        write_value(out, operator.value)
+
+
+def dumpb(filter_query: FilterQuery) -> bytes:
+    """Serialize to the binary form."""
+    out = bytearray([VERSION])
+    write_operator(out, filter_query.query)
+    write_varint(out, len(filter_query.sort))
+    for s in filter_query.sort:
+        write_str(out, str(s))
+    write_value(out, filter_query.limit)
+    write_value(out, filter_query.offset)
+    return bytes(out)
+
+
+STRING_DECODERS = {
+    b"s"[0]: str,
+    b"D"[0]: Decimal,
+    b"M"[0]: datetime.fromisoformat,
+    b"d"[0]: date.fromisoformat,
+    b"t"[0]: time.fromisoformat,
+}
+
+
+class Reader:
+    __slots__ = ("data", "pos")
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def varint(self) -> int:
+        data, pos = self.data, self.pos
+        number = shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            number |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                self.pos = pos
+                return number
+            shift += 7
+
+    def string(self) -> str:
+        length = self.varint()
+        start = self.pos
+        self.pos = start + length
+        return self.data[start : self.pos].decode()
+
+    def value(self):
+        tag = self.data[self.pos]
+        self.pos += 1
+
+        if tag in STRING_DECODERS:
+            return STRING_DECODERS[tag](self.string())
+        if tag == 0x69:  # i
+            number = self.varint()
+            return number >> 1 if not number & 1 else -((number + 1) >> 1)
+        if tag == 0x6C:  # l
+            return tuple(self.value() for _ in range(self.varint()))
+        if tag == 0x53:  # S
+            return frozenset(self.value() for _ in range(self.varint()))
+        if tag == 0x66:  # f
+            self.pos += 8
+            return double.unpack_from(self.data, self.pos - 8)[0]
+        if tag == 0x4E:  # N
+            return None
+        if tag == 0x54:  # T
+            return True
+        if tag == 0x46:  # F
+            return False
+        if tag == 0x72:  # r
+            return timedelta(self.value(), self.value(), self.value())
+        raise SerializationError(f"Unknown value tag {tag} at byte {self.pos - 1}")
+
+    def operator(self) -> Operator:
+        operator_class = OPCODE_CLASSES[self.data[self.pos]]
+        self.pos += 1
+
+        if operator_class is Not:
+            return Not(self.operator())
+        if issubclass(operator_class, LogicalOperator):
+            return operator_class(*[self.operator() for _ in range(self.varint())])
+        return operator_class(self.string(), self.value())
+
+
+def loadb(data: bytes) -> FilterQuery:
+    """Deserialize the binary form written by `dumpb`."""
+    if not data or data[0] != VERSION:
+        raise SerializationError("Unsupported serialization version")
+
+    reader = Reader(data)
+    reader.pos = 1
+    try:
+        query = reader.operator()
+        sort = [Sort(reader.string()) for _ in range(reader.varint())]
+        limit, offset = reader.value(), reader.value()
+        filter_query = FilterQuery(query, sort, limit, offset)
+    except (
+        IndexError,
+        KeyError,
+        ValueError,
+        TypeError,
+        OverflowError,
+        RecursionError,
+        InvalidOperation,
+        struct.error,
+        OperatorError,
+    ) as e:
+        raise SerializationError(f"Invalid serialized query: {e}") from e
+
+    if reader.pos != len(data):
+        raise SerializationError("Unexpected data after the serialized query")
+
+    return filter_query
@@ -0,0 +1,114 @@
+"""
+Query shapes: the structure of a FilterQuery without its literal values.
+
+`age:<30` and `age:<40` are the same query with a different number. `normalize` splits a
+FilterQuery into a hashable, canonical `Shape` and the ordered list of parameters, so caches of
+compiled queries can be keyed by the shape and reused for every value:
+
+    shape, params = normalize(GithubSyntaxParser("age:<30 name:John").parse())
+    # Shape(tree=('and', ('eq', 'name'), ('lt', 'age')), sort=(), has_limit=False, ...)
+    # params == ['John', '30']
+
+The tree shape is canonical: nested And / Or are flattened and their children are sorted, so
+`a:1 b:2` and `b:2 a:1` share a shape. `bind(shape, params)` builds the FilterQuery back (in
+canonical order). In values are a single parameter (a tuple), limit and offset are parameters
+after the values of the tree.
+"""
+
+from typing import List, NamedTuple, Tuple
+
+from .types import (
+    And,
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    LogicalOperator,
+    Lt,
+    Not,
+    Operator,
+    Or,
+    Sort,
+)
+
+OPERATORS = {cls.operation: cls for cls in (And, Or, Not, Eq, Gt, Ge, Lt, Le, Co, In)}
+
+
+class Shape(NamedTuple):
+    # ("and", child, ...), ("not", child) or (operation, key) for key-value operators
+    tree: tuple
+    # (key, descending) pairs
+    sort: tuple
+    has_limit: bool
+    has_offset: bool
+
+
+def flat_args(operator: Operator, operator_class):
+    """The children of nested And (or Or) nodes, e.g. a, b and c for `and(a, and(b, c))`."""
+    for arg in operator.args:
+        if arg.__class__ is operator_class:
+            yield from flat_args(arg, operator_class)
+        else:
+            yield arg
+
+
+def split(operator: Operator, canonical: bool = True) -> Tuple[tuple, list]:
+    """
+    Return the canonical shape of the tree and its parameters in placeholder order. With
+    `canonical=False` the children of And / Or keep their order (e.g. after `statistics.reorder`).
+    """
+    if isinstance(operator, Not):
+        shape, params = split(operator.args[0], canonical)
+        return (operator.operation, shape), params
+
+    if isinstance(operator, LogicalOperator):
+        children = [
+            split(arg, canonical) for arg in flat_args(operator, operator.__class__)
+        ]
+
+        if canonical:
+            # shapes of different kinds differ in the first element, so they are always comparable
+            children.sort(key=lambda child: child[0])
+
+        params = [param for _, child_params in children for param in child_params]
+        return (operator.operation, *(shape for shape, _ in children)), params
+
+    return (operator.operation, operator.key), [operator.value]
+
+
+def normalize(filter_query: FilterQuery) -> Tuple[Shape, list]:
+    """Split the FilterQuery into its shape and its parameters."""
+    tree, params = split(filter_query.query)
+    has_limit = filter_query.limit is not None
+    has_offset = filter_query.offset is not None
+
+    if has_limit:
+        params.append(filter_query.limit)
+    if has_offset:
+        params.append(filter_query.offset)
+
+    sort = tuple((s.key, s.descending) for s in filter_query.sort)
+    return Shape(tree, sort, has_limit, has_offset), params
+
+
+def build(shape: tuple, params) -> Operator:
+    """Build the Operator tree for a tree shape, taking the values from the `params` iterator."""
+    operator_class = OPERATORS[shape[0]]
+
+    if issubclass(operator_class, LogicalOperator):
+        return operator_class(*(build(child, params) for child in shape[1:]))
+
+    return operator_class(shape[1], next(params))
+
+
+def bind(shape: Shape, params: List) -> FilterQuery:
+    """Inverse of `normalize`, the FilterQuery of the shape with the parameters."""
+    values = iter(params)
+    query = build(shape.tree, values)
+    limit = next(values) if shape.has_limit else None
+    offset = next(values) if shape.has_offset else None
+    sort = [Sort(f"-{key}" if descending else key) for key, descending in shape.sort]
+    return FilterQuery(query, sort, limit, offset)
@@ -0,0 +1,394 @@
+"""
+Field statistics and selectivity-based ordering of And / Or children.
+
+And stops at the first child that rejects a record, Or at the first that accepts it, so the
+order of the children decides how much work is done. `reorder` sorts them by estimated cost
+and selectivity (the fraction of records a predicate accepts): And children by
+`cost / (1 - selectivity)`, cheap predicates rejecting most records first, Or children by
+`cost / selectivity`, cheap predicates accepting most records first. For independent
+predicates this order minimizes the expected cost.
+
+    statistics = Statistics.collect(records)
+    evaluate(filter_query, records, statistics=statistics)
+
+Selectivities are estimated from
+
+- hit rates observed in previous evaluations with the same Statistics (the first
+  `OBSERVE_SAMPLE` records of an in-memory evaluation, every row of a columnar one), kept for
+  the `MAX_OBSERVED_LEAVES` most recently observed leaves,
+- per-field statistics of a sample of the records: the fraction of missing values, the number
+  of distinct values, the most common values and an equi-depth histogram,
+- defaults per operator for fields without statistics.
+
+Observed rates are conditional: a child of And is only evaluated on records its preceding
+siblings accepted.
+"""
+
+import bisect
+import threading
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .evaluator import (
+    INVALID,
+    KEY_SEPARATOR,
+    MISSING,
+    coerce,
+    compile_predicate,
+    compile_shape,
+    make_getter,
+)
+from .shapes import split
+from .types import (
+    And,
+    Co,
+    Eq,
+    FilterQuery,
+    Ge,
+    Gt,
+    In,
+    Le,
+    LogicalOperator,
+    Lt,
+    Not,
+    Operator,
+    Or,
+)
+
+# records (or rows) a sample for the field statistics is taken from
+SAMPLE_SIZE = 10_000
+HISTOGRAM_BUCKETS = 32
+MOST_COMMON_VALUES = 16
+# string values kept to estimate Co
+STRING_SAMPLE_SIZE = 256
+
+# records of an in-memory evaluation whose leaf hit rates are counted
+OBSERVE_SAMPLE = 1000
+# evaluations of a leaf before its observed hit rate replaces the estimate
+MIN_OBSERVATIONS = 100
+# counts are halved above this, so the rates follow changing data
+MAX_OBSERVATIONS = 1_000_000
+# leaves with observed hit rates, the least recently observed are dropped above this
+MAX_OBSERVED_LEAVES = 10_000
+
+DEFAULT_SELECTIVITY = {Eq: 0.1, Gt: 1 / 3, Ge: 1 / 3, Lt: 1 / 3, Le: 1 / 3, Co: 0.25}
+
+# relative cost of checking a record, per leaf operator and per traversed key (`a__b`)
+LEAF_COSTS = {Eq: 1.0, Gt: 1.0, Ge: 1.0, Lt: 1.0, Le: 1.0, In: 1.2, Co: 2.0}
+KEY_HOP_COST = 0.5
+
+
+def sample(records, size: int) -> list:
+    """Every n-th record, at most `size`."""
+    if not isinstance(records, (list, tuple)):
+        records = list(records)
+    step = max(1, -(-len(records) // size))
+    return list(records[::step])
+
+
+class FieldStatistics:
+    """Statistics of the values of one key, computed from a sample."""
+
+    def __init__(self, values: list):
+        self.count = len(values)
+        present = [
+            value for value in values if value is not MISSING and value is not None
+        ]
+        self.present = len(present) / self.count if self.count else 0.0
+
+        hashable = []
+        for value in present:
+            try:
+                hash(value)
+            except TypeError:
+                continue
+            hashable.append(value)
+
+        counts = Counter(hashable)
+        # estimated number of distinct values
+        self.cardinality = len(counts)
+        types = Counter(type(value) for value in present)
+        self.value_type = types.most_common(1)[0][0] if types else None
+
+        self.most_common = {
+            value: n / self.count for value, n in counts.most_common(MOST_COMMON_VALUES)
+        }
+
+        # equi-depth histogram: the bounds of buckets holding the same number of values
+        self.histogram = None
+        orderable = [value for value in present if type(value) is self.value_type]
+        try:
+            orderable.sort()
+        except TypeError:
+            orderable = []
+        if orderable:
+            last = len(orderable) - 1
+            self.histogram = [
+                orderable[last * i // HISTOGRAM_BUCKETS]
+                for i in range(HISTOGRAM_BUCKETS + 1)
+            ]
+            self.histogram_share = len(orderable) / self.count
+
+        strings = [value for value in present if isinstance(value, str)]
+        self.strings = sample(strings, STRING_SAMPLE_SIZE)
+        self.string_share = len(strings) / self.count if self.count else 0.0
+
+    def target(self, literal):
+        return (
+            coerce(literal, self.value_type) if self.value_type is not None else literal
+        )
+
+    def eq(self, literal) -> float:
+        target = self.target(literal)
+        if target is INVALID:
+            return 0.0
+
+        try:
+            if target in self.most_common:
+                return self.most_common[target]
+        except TypeError:
+            return DEFAULT_SELECTIVITY[Eq]
+
+        # the rest is spread evenly over the other distinct values
+        others = self.cardinality - len(self.most_common)
+        if others <= 0:
+            return 0.0
+        return max(0.0, self.present - sum(self.most_common.values())) / others
+
+    def range(self, operator_class, literal) -> float:
+        if self.histogram is None:
+            return DEFAULT_SELECTIVITY[operator_class]
+
+        target = self.target(literal)
+        if target is INVALID:
+            return 0.0
+
+        try:
+            if operator_class in (Lt, Ge):
+                position = bisect.bisect_left(self.histogram, target)
+            else:
+                position = bisect.bisect_right(self.histogram, target)
+        except TypeError:
+            return 0.0
+
+        below = position / len(self.histogram)
+        share = below if operator_class in (Lt, Le) else 1 - below
+        return share * self.histogram_share
+
+    def contains(self, literal) -> float:
+        if not self.strings:
+            return DEFAULT_SELECTIVITY[Co] * self.present
+        needle = str(literal)
+        hits = sum(needle in value for value in self.strings)
+        return hits / len(self.strings) * self.string_share
+
+
+class Statistics:
+    """Per-field statistics and observed hit rates, shared between evaluations."""
+
+    def __init__(
+        self,
+        fields: Optional[Dict[str, FieldStatistics]] = None,
+        max_observed: int = MAX_OBSERVED_LEAVES,
+    ):
+        self.fields = dict(fields or {})
+        # leaf operator -> [hits, evaluations], least recently observed first
+        self.observed: Dict[Operator, List[int]] = OrderedDict()
+        self.max_observed = max_observed
+        self._lock = threading.Lock()
+
+    @classmethod
+    def collect(
+        cls,
+        records,
+        keys: Optional[Iterable[str]] = None,
+        sample_size: int = SAMPLE_SIZE,
+    ):
+        """
+        Statistics of the keys of a sample of the records. `keys` defaults to the keys of the
+        sampled dicts, nested keys (`a__b`) have to be listed.
+        """
+        records = sample(records, sample_size)
+        if keys is None:
+            keys = {
+                key for record in records if isinstance(record, dict) for key in record
+            }
+
+        fields = {}
+        for key in keys:
+            getter = make_getter(key)
+            fields[key] = FieldStatistics([getter(record) for record in records])
+        return cls(fields)
+
+    @classmethod
+    def from_columns(cls, columns, sample_size: int = SAMPLE_SIZE):
+        """Statistics of a mapping of column name to numpy array (or a structured array)."""
+        from .integrations.numpy import as_columns
+
+        fields = {}
+        for name, column in as_columns(columns).items():
+            step = max(1, -(-len(column) // sample_size))
+            # numpy scalars to python values, e.g. datetime64 to date
+            fields[name] = FieldStatistics(column[::step].tolist())
+        return cls(fields)
+
+    def observe(self, operator: Operator, hits: int, evaluations: int):
+        """Record that a leaf accepted `hits` of `evaluations` records."""
+        if not evaluations:
+            return
+
+        with self._lock:
+            counts = self.observed.get(operator)
+            if counts is None:
+                counts = self.observed[operator] = [0, 0]
+                # every distinct literal is a new leaf, client queries would grow this forever
+                if len(self.observed) > self.max_observed:
+                    self.observed.popitem(last=False)
+            else:
+                self.observed.move_to_end(operator)
+            counts[0] += hits
+            counts[1] += evaluations
+            if counts[1] > MAX_OBSERVATIONS:
+                counts[0] //= 2
+                counts[1] //= 2
+
+    def selectivity(self, operator: Operator) -> float:
+        """Estimated fraction of records matching a key-value operator."""
+        counts = self.observed.get(operator)
+        if counts is not None and counts[1] >= MIN_OBSERVATIONS:
+            return counts[0] / counts[1]
+
+        field = self.fields.get(operator.key)
+
+        if isinstance(operator, In):
+            if field is None:
+                return min(1.0, DEFAULT_SELECTIVITY[Eq] * len(operator.value))
+            return min(1.0, sum(field.eq(value) for value in set(operator.value)))
+
+        if field is None:
+            return DEFAULT_SELECTIVITY[operator.__class__]
+        if isinstance(operator, Eq):
+            return field.eq(operator.value)
+        if isinstance(operator, Co):
+            return field.contains(operator.value)
+        return field.range(operator.__class__, operator.value)
+
+
+def leaf_cost(operator: Operator) -> float:
+    hops = operator.key.count(KEY_SEPARATOR)
+    return LEAF_COSTS.get(operator.__class__, 1.0) + hops * KEY_HOP_COST
+
+
+def estimate(
+    operator: Operator, statistics: Statistics
+) -> Tuple[Operator, float, float]:
+    """Reorder the tree and return it with its expected cost per record and selectivity."""
+    if isinstance(operator, Not):
+        child, cost, selectivity = estimate(operator.args[0], statistics)
+        if child is not operator.args[0]:
+            operator = Not(child)
+        return operator, cost, 1 - selectivity
+
+    if isinstance(operator, (And, Or)):
+        is_and = isinstance(operator, And)
+        children = [estimate(arg, statistics) for arg in operator.args]
+
+        def rank(child):
+            _, cost, selectivity = child
+            # the probability that the child decides the result
+            decides = 1 - selectivity if is_and else selectivity
+            return cost / decides if decides > 0 else float("inf")
+
+        children.sort(key=rank)
+
+        # expected cost: a child is only evaluated if the previous ones didn't decide
+        cost, undecided = 0.0, 1.0
+        for _, child_cost, selectivity in children:
+            cost += undecided * child_cost
+            undecided *= selectivity if is_and else 1 - selectivity
+
+        args = tuple(child for child, _, _ in children)
+        if any(a is not b for a, b in zip(args, operator.args)):
+            operator = operator.__class__(*args)
+        return operator, cost, undecided if is_and else 1 - undecided
+
+    if isinstance(operator, LogicalOperator):
+        return operator, 1.0, 0.5
+
+    return operator, leaf_cost(operator), statistics.selectivity(operator)
+
+
+def reorder(operator: Operator, statistics: Statistics) -> Operator:
+    """The tree with the children of every And / Or in the estimated cheapest order."""
+    return estimate(operator, statistics)[0]
+
+
+def reorder_query(filter_query: FilterQuery, statistics: Statistics) -> FilterQuery:
+    """Return a copy of the FilterQuery with a reordered operator tree."""
+    filter_query = filter_query.copy()
+    filter_query.query = reorder(filter_query.query, statistics)
+    return filter_query
+
+
+def leaves(operator: Operator) -> Iterator[Operator]:
+    """The key-value operators in the order of the compiled predicate (depth first)."""
+    if isinstance(operator, LogicalOperator):
+        for arg in operator.args:
+            yield from leaves(arg)
+    else:
+        yield operator
+
+
+def counting_predicate(operator: Operator):
+    """
+    A predicate checking the children in the order of the tree which counts the evaluations
+    and hits of every leaf, and a function `flush(statistics)` recording them.
+    """
+    shape, params = split(operator, canonical=False)
+    counters = []
+
+    def wrap(i, leaf):
+        counter = [0, 0]
+        counters.append(counter)
+
+        def counted(record):
+            counter[1] += 1
+            if leaf(record):
+                counter[0] += 1
+                return True
+            return False
+
+        return counted
+
+    predicate = compile_shape(shape)(params, wrap)
+
+    def flush(statistics: Statistics):
+        for leaf, (hits, evaluations) in zip(leaves(operator), counters):
+            statistics.observe(leaf, hits, evaluations)
+        for counter in counters:
+            counter[:] = [0, 0]
+
+    return predicate, flush
+
+
+def filter_observed(
+    operator: Operator,
+    records: Iterable,
+    statistics: Statistics,
+    sample_size: int = OBSERVE_SAMPLE,
+) -> Iterator:
+    """
+    Yield the records matching the reordered tree, counting the leaf hit rates on the first
+    `sample_size` records.
+    """
+    operator = reorder(operator, statistics)
+    records = iter(records)
+
+    predicate, flush = counting_predicate(operator)
+    try:
+        yield from filter(predicate, islice(records, sample_size))
+    finally:
+        flush(statistics)
+
+    yield from filter(compile_predicate(operator, keep_order=True), records)
@@ -0,0 +1,172 @@
+"""
+Streaming filter pipeline over iterables and JSON Lines files.
+
+Records are read lazily and checked with a compiled predicate. Without sort, iteration stops as
+soon as offset + limit records matched. With sort and limit, only the best offset + limit
+records are kept in a bounded heap, so memory stays O(limit) regardless of the input size.
+
+Command line usage (from the repository root):
+
+    python -m python.filters.streaming 'level:error service:api,worker' app.log.ndjson \
+        --sort=-timestamp --limit 20
+"""
+
+import argparse
+import heapq
+import json
+import os
+import sys
+from itertools import chain, islice
+from typing import IO, Iterable, Iterator, List, Union
+
+from .evaluator import MISSING, compile_predicate, make_getter, order_key
+from .parsers.base import ParserError
+from .parsers.github import GithubSyntaxParser
+from .types import FilterQuery, OperatorError, Sort
+
+
+class Descending:
+    """Wrapper inverting the order of a value, for descending keys in a heap."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def make_sort_key(sort: List[Sort]):
+    """Single key function for multiple sort keys; missing and None values sort last."""
+    getters = [(make_getter(s.key), s.descending) for s in sort]
+
+    def get_key(record):
+        key = []
+        for getter, descending in getters:
+            value = getter(record)
+            if value is MISSING or value is None:
+                key.append((1,))
+            else:
+                # ordered by type first, so values of different types don't raise TypeError
+                value = order_key(value)
+                key.append((0, Descending(value) if descending else value))
+        return key
+
+    return get_key
+
+
+def read_json_lines(
+    source: Union[str, IO], skip_invalid: bool = False
+) -> Iterator[dict]:
+    """Lazily yield the records of a JSON Lines file, path or `-` for stdin."""
+    if isinstance(source, str):
+        if source == "-":
+            yield from read_json_lines(sys.stdin, skip_invalid)
+            return
+
+        with open(source, encoding="utf-8") as f:
+            yield from read_json_lines(f, skip_invalid)
+        return
+
+    name = getattr(source, "name", "<input>")
+    for number, line in enumerate(source, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError:
+            if not skip_invalid:
+                raise ValueError(f"Invalid JSON in {name} on line {number}")
+
+
+def filter_records(filter_query: FilterQuery, records: Iterable) -> Iterator:
+    """Yield the records matching the FilterQuery in order, with sort, offset and limit applied."""
+    matches = filter(compile_predicate(filter_query.query), records)
+    start = filter_query.offset or 0
+    stop = None if filter_query.limit is None else start + filter_query.limit
+
+    if not filter_query.sort:
+        # islice stops pulling records from the source once `stop` is reached
+        yield from islice(matches, start, stop)
+        return
+
+    key = make_sort_key(filter_query.sort)
+
+    if stop is None:
+        # without a limit every match has to be kept to sort them
+        yield from islice(sorted(matches, key=key), start, None)
+        return
+
+    # nsmallest keeps a heap of `stop` items and is stable like sorted()
+    yield from islice(heapq.nsmallest(stop, matches, key=key), start, None)
+
+
+def non_negative_int(string: str) -> int:
+    try:
+        value = int(string)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {string!r}")
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"must not be negative: {value}")
+    return value
+
+
+def main(argv=None):
+    argument_parser = argparse.ArgumentParser(
+        description="Filter JSON Lines records with the GitHub filter syntax."
+    )
+    argument_parser.add_argument("query", help="filter, e.g. 'level:error age:>30'")
+    argument_parser.add_argument(
+        "files", nargs="*", default=["-"], help="JSON Lines files (default: stdin)"
+    )
+    argument_parser.add_argument(
+        "--sort",
+        default="",
+        help="comma separated sort keys, prefix with - for descending",
+    )
+    argument_parser.add_argument("--limit", type=non_negative_int)
+    argument_parser.add_argument("--offset", type=non_negative_int)
+    argument_parser.add_argument(
+        "--skip-invalid",
+        action="store_true",
+        help="ignore lines that are not valid JSON",
+    )
+    args = argument_parser.parse_args(argv)
+
+    try:
+        filter_query = GithubSyntaxParser(args.query, backend="pratt").parse()
+        filter_query.sort = [Sort(key) for key in args.sort.split(",") if key]
+    except (ParserError, OperatorError) as e:
+        print(f"{argument_parser.prog}: error: {e}", file=sys.stderr)
+        return 2
+    filter_query.limit = args.limit
+    filter_query.offset = args.offset
+
+    records = chain.from_iterable(
+        read_json_lines(path, skip_invalid=args.skip_invalid) for path in args.files
+    )
+
+    try:
+        for record in filter_records(filter_query, records):
+            sys.stdout.write(json.dumps(record) + "\n")
+    except BrokenPipeError:
+        # e.g. piped into `head`. Python flushes stdout on exit, which would fail again, so the
+        # rest goes to devnull (see the SIGPIPE note of the signal module docs)
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        # missing files, invalid JSON (without --skip-invalid)
+        print(f"{argument_parser.prog}: error: {e}", file=sys.stderr)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
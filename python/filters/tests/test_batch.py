@@ -0,0 +1,52 @@
+import pytest
+
+from ..parsers.batch import parse_batch
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+QUERIES = [
+    "is:open author:nico",
+    "is:open label:bug",
+    "is:open author:nico",
+    "is:(open",
+    "NOT is:open",
+]
+
+
+@pytest.fixture(params=[None, 2])
+def workers(request):
+    return request.param
+
+
+def test_parse_batch(workers):
+    results = parse_batch(QUERIES, workers=workers, chunk_size=2)
+
+    assert [result.query for result in results] == QUERIES
+    for result in results:
+        if result.error is None:
+            assert (
+                result.filter_query.query
+                == GithubSyntaxParser(result.query).parse().query
+            )
+
+    assert results[3].filter_query is None
+    assert results[3].error.position is not None
+
+
+def test_parse_batch_shares_trees(workers):
+    results = parse_batch(QUERIES, workers=workers, chunk_size=2)
+
+    assert results[0].filter_query.query is results[2].filter_query.query
+    assert results[0].filter_query is not results[2].filter_query
+
+    # `is:open` is a single object in every tree
+    is_open = results[0].filter_query.query.args[0]
+    assert results[1].filter_query.query.args[0] is is_open
+    assert results[4].filter_query.query.args[0] is is_open
+
+
+def test_parse_batch_with_interner():
+    interner = Interner()
+    leaf = interner(Eq, "is", "open")
+    (result,) = parse_batch(["is:open"], interner=interner)
+    assert result.filter_query.query is leaf
@@ -0,0 +1,105 @@
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from ..coercion import CONVERTERS, Coercer, coerce_query
+from ..evaluator import evaluate
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+SCHEMA = {
+    "age": int,
+    "price": Decimal,
+    "born": date,
+    "created": datetime,
+    "active": bool,
+}
+
+
+def parse(query):
+    return GithubSyntaxParser(query).parse()
+
+
+def test_coerce_values():
+    filter_query = coerce_query(
+        parse('age:<30 price:>="9.99" born:"1990-01-31" active:true name:John'), SCHEMA
+    )
+    assert filter_query.query == And(
+        Lt("age", 30),
+        Ge("price", Decimal("9.99")),
+        Eq("born", date(1990, 1, 31)),
+        Eq("active", True),
+        Eq("name", "John"),
+    )
+
+
+def test_coerce_nested_and_in():
+    filter_query = coerce_query(
+        parse('NOT (age:1,"2.0" OR created:>"2020-01-01T10:00")'), SCHEMA
+    )
+    assert filter_query.query == Not(
+        Or(Or(Eq("age", 1), Eq("age", 2)), Gt("created", datetime(2020, 1, 1, 10)))
+    )
+    assert Coercer(SCHEMA).coerce(In("age", ["1", 2])) == In("age", (1, 2))
+
+
+def test_unchanged_subtrees_are_reused():
+    filter_query = parse("(name:John OR name:Jack) age:30")
+    coerced = coerce_query(filter_query, SCHEMA)
+    assert coerced.query.args[0] is filter_query.query.args[0]
+    assert filter_query.query.args[1] == Eq("age", "30")
+
+
+def test_contains_is_not_coerced():
+    assert coerce_query(parse("age:~3"), SCHEMA).query == Co("age", "3")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "age:abc",
+        'age:"1.5"',
+        'born:"yesterday"',
+        "active:maybe",
+        # exponents are rejected instead of being expanded
+        'age:"1e999999999"',
+        "age:Infinity",
+        'age:"-1E+5"',
+        "price:NaN",
+        "price:sNaN",
+        'price:"-Infinity"',
+    ],
+)
+def test_invalid_values(query):
+    with pytest.raises(OperatorError):
+        coerce_query(parse(query), SCHEMA)
+
+
+def test_strict():
+    with pytest.raises(OperatorError):
+        Coercer(SCHEMA, strict=True)(parse("name:John"))
+
+
+def test_custom_converter():
+    coercer = Coercer({"tags": str.lower})
+    assert coercer(parse("tags:Python")).query == Eq("tags", "python")
+
+
+def test_date_literals_are_cached():
+    CONVERTERS[date].cache_clear()
+    coercer = Coercer(SCHEMA)
+    coercer(parse('born:"2000-01-01"'))
+    coercer(parse('born:"2000-01-01"'))
+    assert CONVERTERS[date].cache_info().hits == 1
+
+
+def test_evaluate_coerced():
+    records = [{"age": 9}, {"age": 30}]
+    assert evaluate(coerce_query(parse("age:<10"), SCHEMA), records) == [{"age": 9}]
+
+
+def test_converter_overflow_is_invalid_value():
+    coercer = Coercer({"age": lambda value: int(float(value))})
+    with pytest.raises(OperatorError):
+        coercer.coerce(Eq("age", "1e999"))
@@ -0,0 +1,614 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+django = pytest.importorskip("django")
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        DATABASES={
+            "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": ":memory:"}
+        },
+        # installed so reverse relations (e.g. `Author.books`) are registered
+        INSTALLED_APPS=["filters.tests"],
+    )
+    django.setup()
+
+from django.db import connection, models, transaction
+from django.test.utils import CaptureQueriesContext
+
+from ..integrations.django import (
+    FieldRegistry,
+    FilterError,
+    FilterField,
+    AsyncQuerySetExecutor,
+    FilterViewSetMixin,
+    QuerySetExecutor,
+    compile_q,
+    encode_cursor,
+    filter_queryset,
+    get_path_value,
+    paginate_keyset,
+    plan_relations,
+    query_to_q,
+)
+from ..parsers.github import GithubSyntaxParser
+from ..query import Query
+from ..types import *
+
+
+class Person(models.Model):
+    name = models.CharField(max_length=100, db_index=True)
+    age = models.IntegerField()
+    city = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = "tests"
+        indexes = [models.Index(fields=["city", "age"])]
+
+
+class Team(models.Model):
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = "tests"
+
+
+class Author(models.Model):
+    name = models.CharField(max_length=100)
+    team = models.ForeignKey(Team, on_delete=models.CASCADE)
+
+    class Meta:
+        app_label = "tests"
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        app_label = "tests"
+
+
+class Book(models.Model):
+    title = models.CharField(max_length=100)
+    year = models.IntegerField()
+    author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name="books")
+    tags = models.ManyToManyField(Tag, related_name="books")
+
+    class Meta:
+        app_label = "tests"
+
+
+class Event(models.Model):
+    created = models.DateTimeField()
+    score = models.IntegerField(null=True)
+
+    class Meta:
+        app_label = "tests"
+
+
+RELATED_MODELS = [Team, Author, Tag, Book]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def people():
+    with connection.schema_editor() as editor:
+        editor.create_model(Person)
+        editor.create_model(Event)
+        for model in RELATED_MODELS:
+            editor.create_model(model)
+
+    Person.objects.bulk_create(
+        [
+            Person(name="John", age=30, city="Berlin"),
+            Person(name="Jack", age=25, city="Hamburg"),
+            Person(name="Jill", age=41, city="Berlin"),
+            Person(name="Jim", age=19, city="Munich"),
+        ]
+    )
+
+    red, blue = Team.objects.create(name="red"), Team.objects.create(name="blue")
+    ann = Author.objects.create(name="Ann", team=red)
+    bob = Author.objects.create(name="Bob", team=blue)
+    python, django = Tag.objects.create(name="python"), Tag.objects.create(
+        name="django"
+    )
+
+    Book.objects.create(title="One", year=2001, author=ann).tags.set([python, django])
+    Book.objects.create(title="Two", year=2010, author=ann).tags.set([python])
+    Book.objects.create(title="Three", year=1999, author=bob).tags.set([django])
+
+    yield
+    with connection.schema_editor() as editor:
+        for model in reversed(RELATED_MODELS):
+            editor.delete_model(model)
+        editor.delete_model(Event)
+        editor.delete_model(Person)
+
+
+def names(q):
+    return list(Person.objects.filter(q).order_by("id").values_list("name", flat=True))
+
+
+QUERIES = [
+    "name:John",
+    "age:>=25 city:Berlin",
+    "city:Berlin OR NOT age:<20",
+    "name:John,Jim -city:Munich",
+    "name:~Ji",
+    "(age:<30 OR age:>40) AND -name:Jim",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_compile_q_matches_query_to_q(query):
+    tree = GithubSyntaxParser(query).parse().query
+    assert names(compile_q(tree)) == names(query_to_q(tree))
+
+
+def test_compile_q_in():
+    assert names(compile_q(In("name", ["Jack", "Jim"]))) == ["Jack", "Jim"]
+    assert names(query_to_q(In("name", ["Jack", "Jim"]))) == ["Jack", "Jim"]
+
+
+def test_compile_q_empty_operators():
+    assert len(names(compile_q(And()))) == 4
+    assert names(compile_q(Or())) == []
+
+
+def test_compile_q_builds_connectors_in_one_step():
+    q = compile_q(And(*[Eq(f"key{i}", str(i)) for i in range(10)]))
+    assert q.connector == "AND"
+    assert len(q.children) == 10
+
+
+def test_compile_q_is_cached_per_structure():
+    first = compile_q(GithubSyntaxParser("name:John age:>1").parse().query)
+    second = compile_q(And(Eq("name", "John"), Gt("age", "1")))
+    assert first is second
+
+
+def test_compile_q_cache_keeps_value_types():
+    assert compile_q(Eq("age", 1)) is not compile_q(Eq("age", True))
+    assert compile_q(Eq("age", True)).children == [("age", True)]
+
+
+def test_filter_queryset():
+    filter_query = GithubSyntaxParser("age:>20").parse()
+    filter_query.sort = [Sort("-age")]
+    filter_query.limit = 2
+    filter_query.offset = 1
+
+    qs = filter_queryset(Person.objects.all(), filter_query)
+    assert [p.name for p in qs] == ["John", "Jack"]
+
+
+def test_filter_queryset_optimizes_the_tree():
+    filter_query = GithubSyntaxParser(
+        "age:>10 age:>20 (name:John OR name:Jack)"
+    ).parse()
+    qs = filter_queryset(Person.objects.order_by("name"), filter_query)
+    assert [p.name for p in qs] == ["Jack", "John"]
+    where = str(qs.query).split("WHERE")[1]
+    assert where.count(" > ") == 1
+    assert " IN " in where
+
+
+@pytest.mark.parametrize(
+    "sort", [[Sort("city")], [Sort("-city"), Sort("-age")], [Sort("age")], []]
+)
+def test_keyset_pagination_matches_offset_pagination(sort):
+    expected = list(
+        filter_queryset(
+            Person.objects.all(), FilterQuery(And(), sort=sort + [Sort("id")])
+        )
+    )
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = paginate_keyset(
+            Person.objects.all(), sort, 1 if sort else 3, cursor
+        )
+        pages.extend(page)
+        if cursor is None:
+            break
+
+    assert pages == expected
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not-a-cursor", encode_cursor([{"x": 1}, 1]), encode_cursor(["abc", 1])]
+)
+def test_keyset_invalid_cursor(cursor):
+    with pytest.raises(FilterError):
+        paginate_keyset(Person.objects.all(), [Sort("age")], 2, cursor)
+
+
+def paginate_all(qs, sort, limit):
+    pages, cursor = [], None
+    while True:
+        page, cursor = paginate_keyset(qs, sort, limit, cursor)
+        pages.extend(page)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("sort", [[Sort("created")], [Sort("-created")]])
+def test_keyset_microsecond_datetimes(sort):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with transaction.atomic():
+        events = Event.objects.bulk_create(
+            [Event(created=start + timedelta(microseconds=i)) for i in range(5)]
+        )
+        pages = paginate_all(Event.objects.all(), sort, 1)
+        transaction.set_rollback(True)
+
+    ids = [event.pk for event in events]
+    assert [event.pk for event in pages] == (ids[::-1] if sort[0].descending else ids)
+
+
+@pytest.mark.parametrize("sort", [[Sort("score")], [Sort("-score")]])
+def test_keyset_nullable_sort_field(sort):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with transaction.atomic():
+        Event.objects.bulk_create(
+            [Event(created=start, score=score) for score in [2, None, 1, None, 3]]
+        )
+        for limit in [1, 2]:
+            pages = paginate_all(Event.objects.all(), sort, limit)
+            scores = [event.score for event in pages]
+            # nulls last in both directions
+            assert scores == ([3, 2, 1] if sort[0].descending else [1, 2, 3]) + [
+                None,
+                None,
+            ]
+            assert len({event.pk for event in pages}) == 5
+        transaction.set_rollback(True)
+
+
+def test_get_path_value_null_relation():
+    from types import SimpleNamespace
+
+    assert get_path_value(SimpleNamespace(author=None), "author__team__name") is None
+
+
+def test_query_set_executor():
+    query = (
+        Query(executor=QuerySetExecutor(Person.objects.all()))
+        .ge("age", 25)
+        .sort("-age")
+    )
+    assert [p.name for p in query] == ["Jill", "John", "Jack"]
+    assert [p.name for p in query.limit(1, 1)] == ["John"]
+
+
+def test_async_query_set_executor():
+    from asgiref.sync import async_to_sync
+
+    query = Query(executor=AsyncQuerySetExecutor(Person.objects.all())).ge("age", 25)
+
+    async def run():
+        page, total = await query.sort("-age").limit(2).aexecute_with_count()
+        return [p.name for p in page], total
+
+    # async_to_sync runs the ORM calls on this thread, which owns the in-memory database
+    assert async_to_sync(run)() == (["Jill", "John"], 3)
+
+
+def plan(model, query, sort=()):
+    filter_query = GithubSyntaxParser(query).parse()
+    filter_query.sort = [Sort(key) for key in sort]
+    return plan_relations(model, filter_query)
+
+
+def test_plan_relations_select_related():
+    result = plan(Book, "author__team__name:red author__name:Ann year:>2000")
+    assert result.select_related == ["author__team"]
+    assert result.prefetch_related == []
+    assert not result.filter_to_many
+
+
+def test_plan_relations_prefetch_related():
+    result = plan(Author, "books__title:One team__name:red", sort=["-books__year"])
+    assert result.select_related == ["team"]
+    assert result.prefetch_related == ["books"]
+    assert result.filter_to_many
+    assert result.to_many_sort_keys == ["books__year"]
+
+
+def test_plan_relations_prefetch_with_joins():
+    (prefetch,) = plan(Tag, "books__author__team__name:red").prefetch_related
+    assert prefetch.prefetch_through == "books"
+    assert prefetch.queryset.query.select_related == {"author": {"team": {}}}
+
+
+def filtered(model, query, sort=(), **kwargs):
+    filter_query = GithubSyntaxParser(query).parse()
+    filter_query.sort = [Sort(key) for key in sort]
+    return filter_queryset(model.objects.all(), filter_query, **kwargs)
+
+
+def test_filter_to_many_has_no_duplicates():
+    qs = filtered(Author, "books__tags__name:python,django", sort=["name"])
+    assert [a.name for a in qs] == ["Ann", "Bob"]
+    assert "EXISTS" in str(qs.query)
+
+
+def test_filter_to_many_distinct():
+    filter_query = GithubSyntaxParser("books__tags__name:python,django").parse()
+    qs = filter_queryset(Author.objects.distinct(), filter_query)
+    assert sorted(a.name for a in qs) == ["Ann", "Bob"]
+    assert "EXISTS" not in str(qs.query)
+
+
+def test_sort_by_to_many():
+    # smallest related value ascending, largest descending: Ann 2001-2010, Bob 1999
+    query = "team__name:red,blue"
+    assert [a.name for a in filtered(Author, query, sort=["books__year"])] == [
+        "Bob",
+        "Ann",
+    ]
+    assert [a.name for a in filtered(Author, query, sort=["-books__year"])] == [
+        "Ann",
+        "Bob",
+    ]
+
+
+def test_related_objects_are_loaded():
+    qs = filtered(Book, "author__team__name:red", sort=["year"])
+    with CaptureQueriesContext(connection) as queries:
+        assert [(b.title, b.author.team.name) for b in qs] == [
+            ("One", "red"),
+            ("Two", "red"),
+        ]
+    assert len(queries) == 1
+
+
+def test_keyset_rejects_to_many_sort():
+    with pytest.raises(FilterError):
+        paginate_keyset(Author.objects.all(), [Sort("books__year")], limit=1)
+
+
+class Request:
+    def __init__(self, **params):
+        self.query_params = params
+
+
+class BaseView:
+    def get_queryset(self):
+        return Person.objects.order_by("id")
+
+
+class PersonView(FilterViewSetMixin, BaseView):
+    fields = ["age", ("town", "city"), "name"]
+    order_by_fields = ["age", "name"]
+    lookup_exps = {"name": "iexact"}
+
+    def handle_filter_error(self, error):
+        raise error
+
+
+class UnrestrictedPersonView(PersonView):
+    unindexed_filters = "allow"
+
+
+def view(view_class=PersonView, **params):
+    view = view_class()
+    view.request = Request(**params)
+    return view
+
+
+def test_mixin_filters_and_sorts():
+    qs = view(query="town:Berlin OR name:jim", sort="-age").get_queryset()
+    assert [p.name for p in qs] == ["Jill", "John", "Jim"]
+
+
+def test_mixin_without_query():
+    assert len(view().get_queryset()) == 4
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"query": "city:Berlin"},
+        {"query": "age:"},
+        {"query": "age:1", "sort": "city"},
+        {"query": "age:1", "limit": "x"},
+        {"query": "age:1"},
+        {"query": "age:1 OR town:Berlin"},
+        # the field rejects the value
+        {"query": "name:x age:abc"},
+    ],
+)
+def test_mixin_rejects_invalid_input(params):
+    with pytest.raises(FilterError):
+        view(**params).get_queryset()
+
+
+def test_mixin_keyset_page():
+    first = view(UnrestrictedPersonView, query="age:>18", sort="age", limit="3")
+    page, cursor = first.get_keyset_page(first.get_queryset())
+    assert [p.name for p in page] == ["Jim", "Jack", "John"]
+
+    second = view(
+        UnrestrictedPersonView, query="age:>18", sort="age", limit="3", cursor=cursor
+    )
+    page, cursor = second.get_keyset_page(second.get_queryset())
+    assert [p.name for p in page] == ["Jill"]
+    assert cursor is None
+
+
+def test_mixin_lookup_field_with_several_values():
+    # an Or of iexact lookups, which can't be folded into one `__in` lookup
+    qs = view(UnrestrictedPersonView, query="name:john,JACK").get_queryset()
+    assert [p.name for p in qs] == ["John", "Jack"]
+    qs = view(
+        UnrestrictedPersonView, query="name:john OR name:JACK OR age:>40"
+    ).get_queryset()
+    assert [p.name for p in qs] == ["John", "Jack", "Jill"]
+
+
+def test_mixin_allows_unindexed_filter_anded_with_indexed_one():
+    qs = view(query="town:Berlin age:>35").get_queryset()
+    assert [p.name for p in qs] == ["Jill"]
+
+
+def registry(unindexed):
+    return FieldRegistry.from_model(
+        Person,
+        ["name", ("town", "city"), "age", FilterField("years", "age", indexed=True)],
+        ["age"],
+        lookup_exps={"name": "iexact"},
+        unindexed=unindexed,
+    )
+
+
+def test_registry_reads_indexes_from_model():
+    fields = registry("reject").fields
+    assert fields["name"].indexed
+    assert fields["town"].indexed
+    assert not fields["age"].indexed
+    assert fields["years"].indexed
+    assert fields["age"].sortable and not fields["name"].sortable
+
+
+def test_registry_resolves_paths():
+    resolved = registry("allow").resolve(
+        And(Eq("name", "x"), Gt("town", "y"), Not(Eq("years", "1")))
+    )
+    assert resolved == And(
+        Eq("name__iexact", "x"), Gt("city", "y"), Not(Eq("age", "1"))
+    )
+
+
+@pytest.mark.parametrize(
+    "policy, query, allowed",
+    [
+        ("reject", "name:x", True),
+        ("reject", "name:x age:1", False),
+        ("reject", "name:~x", False),
+        ("require_indexed", "name:x age:1", True),
+        ("require_indexed", "age:1", False),
+        ("require_indexed", "name:x OR age:1", False),
+        ("require_indexed", "(name:x OR town:y) (age:1 OR age:2)", True),
+        ("require_indexed", "-name:x age:1", False),
+        ("require_indexed", "-name:x", False),
+        ("require_indexed", "name:x -town:y", True),
+        ("require_indexed", "NOT (name:x age:1)", False),
+        ("reject", "-name:x", False),
+        ("reject", "NOT (name:x OR town:y)", False),
+        ("allow", "-name:~x", True),
+        ("require_indexed", "name:x (age:1 OR name:~y)", True),
+        ("allow", "age:1 OR name:~x", True),
+    ],
+)
+def test_registry_policies(policy, query, allowed):
+    tree = GithubSyntaxParser(query).parse().query
+    if allowed:
+        registry(policy).resolve(tree)
+    else:
+        with pytest.raises(FilterError):
+            registry(policy).resolve(tree)
+
+
+def test_registry_unknown_field():
+    with pytest.raises(FilterError):
+        registry("allow").resolve(Eq("unknown", "x"))
+
+
+@pytest.fixture
+def cache():
+    from ..integrations.django_cache import FilterCache
+
+    cache = FilterCache()
+    # writes of the test are rolled back
+    with transaction.atomic():
+        yield cache
+        transaction.set_rollback(True)
+    cache.disconnect()
+
+
+def cached_names(cache, model, query, sort=("id",)):
+    filter_query = GithubSyntaxParser(query).parse()
+    filter_query.sort = [Sort(key) for key in sort]
+    return [obj.name for obj in cache.get_objects(model.objects.all(), filter_query)]
+
+
+def test_cache_hit_fetches_objects_by_pk(cache):
+    assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill"]
+    with CaptureQueriesContext(connection) as queries:
+        assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill"]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert "IN" in queries[0]["sql"]
+
+
+def test_cache_keeps_entries_when_unreferenced_fields_change(cache):
+    cached_names(cache, Person, "city:Berlin")
+    john = Person.objects.get(name="John")
+    john.age = 31
+    john.save()
+    assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill"]
+    assert cache.hits == 1
+
+    john.city = "Hamburg"
+    john.save()
+    assert cached_names(cache, Person, "city:Berlin") == ["Jill"]
+    assert cache.misses == 2
+
+
+def test_cache_update_fields_and_rows(cache):
+    cached_names(cache, Person, "city:Berlin")
+    Person.objects.filter(name="Jim").update(city="Berlin")
+    assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill"]
+
+    jim = Person.objects.get(name="Jim")
+    jim.save(update_fields=["city"])
+    assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill", "Jim"]
+
+    Person.objects.create(name="Joe", age=50, city="Berlin")
+    assert cached_names(cache, Person, "city:Berlin") == ["John", "Jill", "Jim", "Joe"]
+    Person.objects.get(name="John").delete()
+    assert cached_names(cache, Person, "city:Berlin") == ["Jill", "Jim", "Joe"]
+    assert cache.hits == 1
+
+
+def test_cache_invalidates_through_relations(cache):
+    query = "books__tags__name:django"
+    assert cached_names(cache, Author, query, sort=["name"]) == ["Ann", "Bob"]
+
+    Tag.objects.get(name="django").books.remove(Book.objects.get(title="One"))
+    assert cached_names(cache, Author, query, sort=["name"]) == ["Bob"]
+
+    Team.objects.filter(name="blue").update(name="green")
+    assert cached_names(cache, Author, query, sort=["name"]) == ["Bob"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_pages_with_redis_backend():
+    from ..integrations.django_cache import FilterCache, LocalRedis, RedisBackend
+
+    cache = FilterCache(RedisBackend(LocalRedis()))
+    filter_query = GithubSyntaxParser("age:>20").parse()
+    filter_query.sort = [Sort("age")]
+
+    def serialize(people):
+        return [(p.name, p.age) for p in people]
+
+    try:
+        with transaction.atomic():
+            for _ in range(2):
+                page = cache.get_page(Person.objects.all(), filter_query, serialize)
+                assert page == [("Jack", 25), ("John", 30), ("Jill", 41)]
+
+            # pages contain any field, every write invalidates them
+            jack = Person.objects.get(name="Jack")
+            jack.name = "Jacky"
+            jack.save()
+            page = cache.get_page(Person.objects.all(), filter_query, serialize)
+            assert page[0] == ("Jacky", 25)
+            assert (cache.hits, cache.misses) == (1, 2)
+            transaction.set_rollback(True)
+    finally:
+        cache.disconnect()
@@ -0,0 +1,163 @@
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from ..evaluator import compile_predicate, evaluate
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+PEOPLE = [
+    {"name": "John", "age": 30, "city": "Berlin", "joined": date(2020, 1, 1)},
+    {"name": "Jack", "age": 25, "city": "Hamburg", "joined": date(2021, 6, 1)},
+    {"name": "Jill", "age": 41, "city": "Berlin", "joined": date(2019, 3, 1)},
+    {"name": "Jim", "age": None, "city": "Munich", "joined": date(2022, 1, 1)},
+]
+
+
+def names(records):
+    return [record["name"] for record in records]
+
+
+def matching(query):
+    return names(evaluate(FilterQuery(query), PEOPLE))
+
+
+def test_eq():
+    assert matching(Eq("city", "Berlin")) == ["John", "Jill"]
+
+
+def test_comparisons_coerce_string_literals():
+    assert matching(Lt("age", "30")) == ["Jack"]
+    assert matching(Le("age", "30")) == ["John", "Jack"]
+    assert matching(Gt("age", "30")) == ["Jill"]
+    assert matching(Ge("joined", "2021-01-01")) == ["Jack", "Jim"]
+
+
+def test_fractional_literals_on_int_values():
+    # compared as numbers, like the NumPy backend
+    assert matching(Lt("age", "30.5")) == ["John", "Jack"]
+    assert matching(Gt("age", "40.9")) == ["Jill"]
+    assert matching(Eq("age", "30.0")) == ["John"]
+    assert matching(Lt("age", "1e999")) == ["John", "Jack", "Jill"]
+    assert matching(Lt("age", "nan")) == []
+
+
+def test_nan_literals_on_decimal_values():
+    records = [{"price": Decimal("1.5")}]
+    for literal in ["nan", "sNaN"]:
+        for operator in [
+            Lt("price", literal),
+            Eq("price", literal),
+            In("price", [literal]),
+        ]:
+            assert evaluate(FilterQuery(operator), records) == []
+    assert evaluate(FilterQuery(Lt("price", "Infinity")), records) == records
+
+
+def test_co():
+    assert matching(Co("name", "J")) == ["John", "Jack", "Jill", "Jim"]
+    assert matching(Co("city", "burg")) == ["Jack"]
+
+
+def test_in():
+    assert matching(In("age", ["25", "41"])) == ["Jack", "Jill"]
+
+
+def test_in_unhashable_values():
+    records = [{"tags": ["a"]}, {"tags": {"a": 1}}, {"tags": "a"}]
+    assert evaluate(FilterQuery(In("tags", ["a", "b"])), records) == [{"tags": "a"}]
+
+
+def test_logical():
+    assert matching(And(Eq("city", "Berlin"), Not(Eq("name", "John")))) == ["Jill"]
+    assert matching(Or(Eq("name", "Jim"), Gt("age", 40))) == ["Jill", "Jim"]
+    assert matching(And()) == ["John", "Jack", "Jill", "Jim"]
+    assert matching(Or()) == []
+
+
+def test_missing_values_never_match():
+    assert matching(Eq("unknown", "x")) == []
+    assert matching(Not(Eq("unknown", "x"))) == names(PEOPLE)
+
+
+def test_objects_and_nested_keys():
+    records = [
+        SimpleNamespace(name="a", author=SimpleNamespace(team={"name": "core"})),
+        SimpleNamespace(name="b", author=None),
+    ]
+    result = evaluate(FilterQuery(Eq("author__team__name", "core")), records)
+    assert [record.name for record in result] == ["a"]
+
+
+def test_sort_limit_offset():
+    filter_query = FilterQuery(
+        Co("name", "J"), sort=[Sort("city"), Sort("-age")], limit=2, offset=1
+    )
+    assert names(evaluate(filter_query, PEOPLE)) == ["John", "Jack"]
+
+
+def test_sort_places_missing_last():
+    assert names(evaluate(FilterQuery(And(), sort=[Sort("age")]), PEOPLE))[-1] == "Jim"
+    assert names(evaluate(FilterQuery(And(), sort=[Sort("-age")]), PEOPLE))[-1] == "Jim"
+
+
+def test_sort_mixed_types():
+    values = [3, "b", 1.5, None, [2], "a", date(2020, 1, 1), {"x": 1}, True, [1]]
+    records = [{"v": value} for value in values]
+    ascending = [
+        r["v"] for r in evaluate(FilterQuery(And(), sort=[Sort("v")]), records)
+    ]
+    descending = [
+        r["v"] for r in evaluate(FilterQuery(And(), sort=[Sort("-v")]), records)
+    ]
+
+    # grouped by type, ordered within the group, None last
+    assert ascending[-1] is None and descending[-1] is None
+    assert ascending.index(True) < ascending.index(1.5) < ascending.index(3)
+    assert ascending.index("a") + 1 == ascending.index("b")
+    assert ascending.index([1]) + 1 == ascending.index([2])
+    assert descending[:-1] == ascending[-2::-1]
+
+
+def test_limit_without_sort():
+    assert names(evaluate(FilterQuery(And(), limit=1, offset=2), PEOPLE)) == ["Jill"]
+
+
+def test_compiled_predicate_is_flat_and_cached():
+    query = GithubSyntaxParser("city:Berlin,Munich -name:Jim age:>=30").parse().query
+    predicate = compile_predicate(query)
+
+    assert predicate is compile_predicate(
+        GithubSyntaxParser("city:Berlin,Munich -name:Jim age:>=30").parse().query
+    )
+    assert predicate.source.count("p") >= 4
+    assert [record["name"] for record in PEOPLE if predicate(record)] == [
+        "John",
+        "Jill",
+    ]
+
+
+def test_deep_trees():
+    nots = Eq("name", "John")
+    for _ in range(300):
+        nots = Not(nots)
+    assert matching(nots) == ["John"]
+
+    nested = Eq("name", "Jim")
+    for i in range(150):
+        if i % 2:
+            nested = Or(Eq("age", str(i + 1000)), nested)
+        else:
+            nested = And(Not(Eq("age", "0")), nested)
+    assert matching(nested) == ["Jim"]
+    assert compile_predicate(nested, keep_order=True)(PEOPLE[3])
+
+
+def test_deep_parsed_query():
+    query = "NOT " * 300 + "name:Jim"
+    assert matching(GithubSyntaxParser(query, backend="pratt").parse().query) == ["Jim"]
+
+    query = "city:Berlin"
+    for _ in range(60):
+        query = f"name:Jim OR (age:1 ({query}))"
+    assert matching(GithubSyntaxParser(query, backend="pratt").parse().query) == ["Jim"]
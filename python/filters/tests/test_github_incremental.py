@@ -0,0 +1,79 @@
+import random
+
+from ..parsers.base import ParserError
+from ..parsers.github_incremental import IncrementalGithubSyntaxParser, retokenize
+from ..parsers.github_pratt import PrattGithubSyntaxParser, tokenize
+from ..types import *
+
+
+def parse(query):
+    try:
+        return PrattGithubSyntaxParser(query).parse_expression(), None
+    except ParserError as e:
+        return None, e.position
+
+
+def test_typing_a_query():
+    parser = IncrementalGithubSyntaxParser()
+    final = "(name:John OR name:Jack) AND NOT age:<30"
+
+    for end in range(1, len(final) + 1):
+        result = parser.update(final[:end])
+        expected, position = parse(final[:end])
+        assert (result.filter_query and result.filter_query.query) == expected
+        assert [e.position for e in result.errors] == (
+            [] if position is None else [position]
+        )
+
+    assert result.filter_query.query == And(
+        Or(Eq("name", "John"), Eq("name", "Jack")), Not(Lt("age", "30"))
+    )
+
+
+def test_returns_errors():
+    result = IncrementalGithubSyntaxParser().update('name:John "age')
+    assert result.filter_query is None
+    assert result.errors[0].position == 10
+
+
+def test_unchanged_groups_are_reused():
+    parser = IncrementalGithubSyntaxParser()
+    group = parser.update("(a:1 OR b:2) c:3").filter_query.query.args[0]
+    query = parser.update("(a:1 OR b:2) c:345").filter_query.query
+
+    assert query == And(Or(Eq("a", "1"), Eq("b", "2")), Eq("c", "345"))
+    assert query.args[0] is group
+
+
+def test_retokenize_matches_tokenize():
+    old = "(a:1 OR b:2) NOT c:3"
+    for new in [
+        "(a:1 OR b:2) NOTc:3",
+        "(a:1 OR b:2)NOT c:3",
+        "x (a:1 OR b:2) NOT c:3",
+        "",
+    ]:
+        assert retokenize(old, tokenize(old), new) == tokenize(new)
+
+
+def test_random_edits():
+    rng = random.Random(0)
+    pieces = [*"ab:1 ()-,<>", "NOT ", "OR ", "x:1 ", '"a b"']
+    parser = IncrementalGithubSyntaxParser()
+    query = ""
+
+    for _ in range(500):
+        start = rng.randint(0, len(query))
+        end = min(len(query), start + rng.randint(0, 3))
+        query = (
+            query[:start]
+            + "".join(rng.choices(pieces, k=rng.randint(0, 2)))
+            + query[end:]
+        )
+
+        result = parser.update(query)
+        expected, position = parse(query)
+        assert (result.filter_query and result.filter_query.query) == expected
+        assert [e.position for e in result.errors] == (
+            [] if position is None else [position]
+        )
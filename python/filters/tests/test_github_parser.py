@@ -1,12 +1,20 @@
+import pytest
+
+from ..parsers.base import ParserError
 from ..parsers.github import GithubSyntaxParser
 from ..types import *
 
 
+@pytest.fixture(params=["pyparsing", "pratt"])
+def backend(request):
+    return request.param
+
+
 # Operators
 
 
-def test_sth():
-    parser = GithubSyntaxParser("name:John,Jack age:<30 -age:28")
+def test_sth(backend):
+    parser = GithubSyntaxParser("name:John,Jack age:<30 -age:28", backend=backend)
     assert parser.parse().query == And(
         Or(
             Eq("name", "John"),
@@ -17,67 +25,67 @@ def test_sth():
     )
 
 
-def test_eq():
-    parser = GithubSyntaxParser("name:John")
+def test_eq(backend):
+    parser = GithubSyntaxParser("name:John", backend=backend)
     assert parser.parse().query == Eq("name", "John")
 
 
-def test_ge():
-    parser = GithubSyntaxParser("age:>=30")
+def test_ge(backend):
+    parser = GithubSyntaxParser("age:>=30", backend=backend)
     assert parser.parse().query == Ge("age", "30")
 
 
-def test_gt():
-    parser = GithubSyntaxParser("age:>30")
+def test_gt(backend):
+    parser = GithubSyntaxParser("age:>30", backend=backend)
     assert parser.parse().query == Gt("age", "30")
 
 
-def test_le():
-    parser = GithubSyntaxParser("age:<=30")
+def test_le(backend):
+    parser = GithubSyntaxParser("age:<=30", backend=backend)
     assert parser.parse().query == Le("age", "30")
 
 
-def test_lt():
-    parser = GithubSyntaxParser("age:<30")
+def test_lt(backend):
+    parser = GithubSyntaxParser("age:<30", backend=backend)
     assert parser.parse().query == Lt("age", "30")
 
 
-def test_co():
-    parser = GithubSyntaxParser("name:~John")
+def test_co(backend):
+    parser = GithubSyntaxParser("name:~John", backend=backend)
     assert parser.parse().query == Co("name", "John")
 
 
-# def test_in():
-#     parser = GithubSyntaxParser("name:@John")
+# def test_in(backend):
+#     parser = GithubSyntaxParser("name:@John", backend=backend)
 #     assert parser.parse() == {"name": ["John", "Jack"]}
 
 
 # Logical operators
 
 
-def test_and():
-    parser = GithubSyntaxParser("name:John age:30")
+def test_and(backend):
+    parser = GithubSyntaxParser("name:John age:30", backend=backend)
     assert parser.parse().query == And(
         Eq("name", "John"),
         Eq("age", "30"),
     )
 
 
-def test_or():
-    parser = GithubSyntaxParser("name:John,Jack")
+def test_or(backend):
+    parser = GithubSyntaxParser("name:John,Jack", backend=backend)
     assert parser.parse().query == Or(
         Eq("name", "John"),
         Eq("name", "Jack"),
     )
 
 
-def test_not():
-    parser = GithubSyntaxParser("-name:John")
+def test_not(backend):
+    parser = GithubSyntaxParser("-name:John", backend=backend)
     assert parser.parse().query == Not(Eq("name", "John"))
 
 
-def test_not_with_or():
-    parser = GithubSyntaxParser("-name:John,Jack")
+def test_not_with_or(backend):
+    parser = GithubSyntaxParser("-name:John,Jack", backend=backend)
     assert parser.parse().query == Not(
         Or(
             Eq("name", "John"),
@@ -86,8 +94,8 @@ def test_not_with_or():
     )
 
 
-def test_not_with_and():
-    parser = GithubSyntaxParser("-name:John age:30")
+def test_not_with_and(backend):
+    parser = GithubSyntaxParser("-name:John age:30", backend=backend)
     assert parser.parse().query == And(
         Not(Eq("name", "John")),
         Eq("age", "30"),
@@ -97,24 +105,24 @@ def test_not_with_and():
 # Special values and complex queries
 
 
-def test_multiple_fields():
-    parser = GithubSyntaxParser("name:John age:30")
+def test_multiple_fields(backend):
+    parser = GithubSyntaxParser("name:John age:30", backend=backend)
     assert parser.parse().query == And(
         Eq("name", "John"),
         Eq("age", "30"),
     )
 
 
-def test_multiple_values():
-    parser = GithubSyntaxParser("name:John,Jack")
+def test_multiple_values(backend):
+    parser = GithubSyntaxParser("name:John,Jack", backend=backend)
     assert parser.parse().query == Or(
         Eq("name", "John"),
         Eq("name", "Jack"),
     )
 
 
-def test_multiple_fields_and_values():
-    parser = GithubSyntaxParser("name:John,Jack age:30,40")
+def test_multiple_fields_and_values(backend):
+    parser = GithubSyntaxParser("name:John,Jack age:30,40", backend=backend)
     assert parser.parse().query == And(
         Or(
             Eq("name", "John"),
@@ -127,16 +135,16 @@ def test_multiple_fields_and_values():
     )
 
 
-def test_values_with_spaces():
-    parser = GithubSyntaxParser('name:"John Jack"')
+def test_values_with_spaces(backend):
+    parser = GithubSyntaxParser('name:"John Jack"', backend=backend)
     assert parser.parse().query == Eq("name", "John Jack")
 
 
 # grouping
 
 
-def test_grouping():
-    parser = GithubSyntaxParser("(name:John,Jack age:30,40)")
+def test_grouping(backend):
+    parser = GithubSyntaxParser("(name:John,Jack age:30,40)", backend=backend)
     assert parser.parse().query == And(
         Or(
             Eq("name", "John"),
@@ -149,8 +157,8 @@ def test_grouping():
     )
 
 
-def test_grouping_with_and():
-    parser = GithubSyntaxParser("(name:John,Jack AND age:30,40)")
+def test_grouping_with_and(backend):
+    parser = GithubSyntaxParser("(name:John,Jack AND age:30,40)", backend=backend)
     assert parser.parse().query == And(
         Or(
             Eq("name", "John"),
@@ -163,9 +171,10 @@ def test_grouping_with_and():
     )
 
 
-def test_github():
+def test_github(backend):
     parser = GithubSyntaxParser(
-        '(language:ruby OR language:python AND name:nico) AND NOT path:"/tests/" AND age:>=30'
+        '(language:ruby OR language:python AND name:nico) AND NOT path:"/tests/" AND age:>=30',
+        backend=backend,
     )
     assert parser.parse().query == And(
         Or(
@@ -178,3 +187,48 @@ def test_github():
         Not(Eq("path", "/tests/")),
         Ge("age", "30"),
     )
+
+
+def test_nested_groups(backend):
+    parser = GithubSyntaxParser(
+        "(a:1 (b:2 OR c:3)) OR NOT (d:4,5 AND -e:6)", backend=backend
+    )
+    assert parser.parse().query == Or(
+        And(
+            Eq("a", "1"),
+            Or(Eq("b", "2"), Eq("c", "3")),
+        ),
+        Not(
+            And(
+                Or(Eq("d", "4"), Eq("d", "5")),
+                Not(Eq("e", "6")),
+            )
+        ),
+    )
+
+
+def test_long_query(backend):
+    query = " ".join(f"key{i}:value{i}" for i in range(60))
+    parser = GithubSyntaxParser(query, backend=backend)
+    assert parser.parse().query == And(*[Eq(f"key{i}", f"value{i}") for i in range(60)])
+
+
+@pytest.mark.parametrize(
+    "query", ["", "name:", "name:John,", "(name:John", "name:John)", "name:John AND"]
+)
+def test_invalid(backend, query):
+    with pytest.raises(ParserError):
+        GithubSyntaxParser(query, backend=backend).parse()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        GithubSyntaxParser("name:John", backend="unknown")
+
+
+def test_packrat_is_opt_in():
+    from pyparsing import ParserElement
+
+    # process wide, only turned on by `enable_packrat`
+    GithubSyntaxParser("a:1 (b:2 OR NOT c:3)").parse_expression()
+    assert not ParserElement._packratEnabled
@@ -0,0 +1,127 @@
+import random
+from datetime import date
+
+import pytest
+
+from ..evaluator import evaluate
+from ..index import IndexedCollection
+from ..parsers.github import GithubSyntaxParser
+from ..query import Query
+from ..types import *
+
+PEOPLE = [
+    {"name": "John", "age": 30, "city": "Berlin", "joined": date(2020, 1, 1)},
+    {"name": "Jack", "age": 25, "city": "Hamburg", "joined": date(2021, 6, 1)},
+    {"name": "Jill", "age": 41, "city": "Berlin", "joined": date(2019, 3, 1)},
+    {"name": "Jim", "age": None, "city": "Munich", "joined": date(2022, 1, 1)},
+    {"name": "Jo", "city": "Hamburg", "tags": ["a", "b"]},
+    {"name": "Ann", "age": 30.0, "city": "Ber", "tags": ("a",)},
+    {"name": "Bo", "age": float("nan"), "city": ["Berlin"], "joined": "2020-01-01"},
+]
+
+QUERIES = [
+    "city:Berlin",
+    "age:30",
+    "age:>25 age:<=41",
+    "age:<30 OR age:>=41",
+    "name:John,Jill,Ann",
+    "name:~J",
+    "name:~oh",
+    "city:~erli",
+    "city:~burg -name:Jo",
+    "tags:~a",
+    'joined:>"2020-01-01"',
+    'joined:"2020-01-01"',
+    "-age:30",
+    "NOT (city:Berlin OR age:<30)",
+    "(city:Berlin OR city:Hamburg) AND NOT age:>29",
+    "unknown:x OR NOT unknown:y",
+    "age:abc",
+    "age:nan",
+    "age:<nan",
+    "age:>=nan OR name:Jo",
+    "-age:>nan",
+    "age:nan,30",
+]
+
+
+def names(records):
+    return [record["name"] for record in records]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_matches_evaluator(query):
+    filter_query = GithubSyntaxParser(query).parse()
+    collection = IndexedCollection(PEOPLE)
+    assert names(collection.evaluate(filter_query)) == names(
+        evaluate(filter_query, PEOPLE)
+    )
+
+
+def test_empty_operators():
+    collection = IndexedCollection(PEOPLE)
+    assert len(collection.evaluate(FilterQuery(And()))) == len(PEOPLE)
+    assert collection.evaluate(FilterQuery(Or())) == []
+
+
+def test_sort_and_pagination():
+    filter_query = FilterQuery(Eq("city", "Berlin"), [Sort("-age")], limit=1, offset=1)
+    assert names(IndexedCollection(PEOPLE).evaluate(filter_query)) == ["John"]
+
+
+def test_add_and_remove_update_indexes():
+    collection = IndexedCollection(keys=["city", "age", "name"])
+    ids = collection.extend(PEOPLE)
+    query = GithubSyntaxParser("city:Berlin age:>20 name:~oh").parse()
+    assert names(collection.evaluate(query)) == ["John"]
+
+    collection.remove(ids[0])
+    assert collection.evaluate(query) == []
+    assert "John" not in collection.indexes["name"].values[str]
+
+    collection.add({"name": "Johanna", "age": 22, "city": "Berlin"})
+    assert names(collection.evaluate(query)) == ["Johanna"]
+    assert collection.count(FilterQuery(Eq("city", "Berlin"))) == 2
+
+
+def test_random_records_and_changes_match_evaluator():
+    rng = random.Random(7)
+    words = ["alpha", "beta", "gamma", "alphabet", "bet", "am"]
+
+    def record(i):
+        return {
+            "i": i,
+            "a": rng.choice([None, 1, 2, 3, 2.5, "2"]),
+            "b": rng.choice(words),
+            "c": {"d": rng.randint(0, 5)} if rng.random() < 0.8 else None,
+        }
+
+    records = [record(i) for i in range(300)]
+    collection = IndexedCollection()
+    ids = dict(zip(range(300), collection.extend(records)))
+
+    queries = [
+        "a:2 OR b:~alph",
+        "a:>=2 -b:bet",
+        "c__d:<3 (b:~et OR a:1,3)",
+        'NOT (a:<"2.5" OR c__d:>4)',
+        "b:~a -b:~ph",
+    ]
+    for _ in range(3):
+        for query in queries:
+            filter_query = GithubSyntaxParser(query).parse()
+            expected = [r["i"] for r in evaluate(filter_query, records)]
+            assert [r["i"] for r in collection.evaluate(filter_query)] == expected
+
+        for i in rng.sample(sorted(ids), 50):
+            collection.remove(ids.pop(i))
+            records.remove(next(r for r in records if r["i"] == i))
+        for i in range(len(records) + 100, len(records) + 150):
+            records.append(record(i))
+            ids[i] = collection.add(records[-1])
+
+
+def test_query_executor():
+    query = Query(executor=IndexedCollection(PEOPLE)).eq("city", "Berlin").sort("name")
+    assert names(query.execute()) == ["Jill", "John"]
+    assert query.count() == 2
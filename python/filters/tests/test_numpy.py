@@ -0,0 +1,148 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from ..integrations import numpy as columnar
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+COLUMNS = {
+    "name": np.array(["John", "Jack", "Jill", "Jim", "Joe"]),
+    "age": np.array([30, 25, 41, 19, 30]),
+    "city": np.array(["Berlin", "Hamburg", "Berlin", "Munich", "Hamburg"]),
+    "joined": np.array(
+        ["2020-01-01", "2021-06-01", "2019-03-01", "2022-01-01", "2020-05-01"],
+        dtype="datetime64[D]",
+    ),
+}
+
+
+def names(filter_query):
+    return list(columnar.evaluate(filter_query, COLUMNS)["name"])
+
+
+def parse(query, **kwargs):
+    filter_query = GithubSyntaxParser(query).parse()
+    for name, value in kwargs.items():
+        setattr(filter_query, name, value)
+    return filter_query
+
+
+def test_comparisons():
+    assert names(parse("age:<30")) == ["Jack", "Jim"]
+    assert names(parse("age:>=30")) == ["John", "Jill", "Joe"]
+    assert names(FilterQuery(Gt("joined", "2020-12-31"))) == ["Jack", "Jim"]
+
+
+def test_co_and_in():
+    assert names(parse("city:~burg")) == ["Jack", "Joe"]
+    assert names(FilterQuery(In("age", ["19", "41"]))) == ["Jill", "Jim"]
+
+
+def test_logical():
+    assert names(parse("city:Berlin,Munich -name:Jim")) == ["John", "Jill"]
+    assert names(parse("age:30 OR NOT city:Hamburg")) == ["John", "Jill", "Jim", "Joe"]
+    assert names(FilterQuery(And())) == list(COLUMNS["name"])
+    assert names(FilterQuery(Or())) == []
+
+
+def test_matches_in_memory_evaluator():
+    from ..evaluator import evaluate
+
+    records = [
+        {key: column[i].item() for key, column in COLUMNS.items() if key != "joined"}
+        for i in range(5)
+    ]
+    for query in [
+        "age:>20 (city:Berlin OR name:Jim,Joe)",
+        "NOT (age:<=30 city:Hamburg) OR name:Jack",
+        "city:Berlin age:>50",
+    ]:
+        expected = [record["name"] for record in evaluate(parse(query), records)]
+        assert names(parse(query)) == expected
+
+
+def test_short_circuit_skips_decided_rows(monkeypatch):
+    evaluated = []
+    leaf_mask = columnar.leaf_mask
+
+    def counting_leaf_mask(operator, columns, rows):
+        mask = leaf_mask(operator, columns, rows)
+        evaluated.append((operator.key, len(mask)))
+        return mask
+
+    monkeypatch.setattr(columnar, "leaf_mask", counting_leaf_mask)
+    columns = {"a": np.arange(10), "b": np.arange(10)}
+    query = FilterQuery(And(Gt("a", 5), Gt("b", 0), Gt("b", 8)))
+    assert list(columnar.evaluate_indices(query, columns)) == [9]
+    # the children after Gt("a", 5) only see the 4 rows it accepted
+    assert evaluated == [("a", 10), ("b", 4), ("b", 4)]
+
+    evaluated.clear()
+    query = FilterQuery(And(Gt("a", 20), Gt("b", 0)))
+    assert len(columnar.evaluate_indices(query, columns)) == 0
+    assert evaluated == [("a", 10)]
+
+
+@pytest.mark.parametrize(
+    "operator",
+    [Gt("b", "not a number"), Eq("b", "x"), In("b", ["x", "y"]), Eq("c", "not a date")],
+)
+def test_incompatible_literal_matches_nothing(operator):
+    # same result as the evaluator, whether or not other children decided rows before
+    columns = {
+        "a": np.array([1, 2, 3]),
+        "b": np.array([4, 5, 6]),
+        "c": np.array(
+            ["2020-01-01", "2021-01-01", "2022-01-01"], dtype="datetime64[D]"
+        ),
+    }
+    for first in [Gt("a", 0), Gt("a", 2)]:
+        query = FilterQuery(And(first, operator))
+        assert len(columnar.evaluate_indices(query, columns)) == 0
+        query = FilterQuery(Or(first, Not(operator)))
+        assert len(columnar.evaluate_indices(query, columns)) == 3
+    assert list(
+        columnar.evaluate_indices(FilterQuery(In("b", ["x", "5"])), columns)
+    ) == [1]
+
+
+def test_subset_evaluation():
+    columns = {"a": np.arange(100), "b": np.arange(100) % 7}
+    query = FilterQuery(And(Lt("a", 10), Eq("b", 3), Not(Eq("a", 3))))
+    assert list(columnar.evaluate_indices(query, columns)) == []
+    query = FilterQuery(Or(Lt("a", 90), Eq("b", 3)))
+    assert list(columnar.evaluate_indices(query, columns)) == list(range(90)) + [94]
+
+
+def test_sort_limit_offset():
+    query = parse("age:>18", sort=[Sort("city"), Sort("-age")], limit=3, offset=1)
+    assert names(query) == ["John", "Joe", "Jack"]
+
+
+def test_sort_descending_strings():
+    assert names(parse("age:>18", sort=[Sort("-name")])) == [
+        "John",
+        "Joe",
+        "Jim",
+        "Jill",
+        "Jack",
+    ]
+
+
+def test_structured_array():
+    data = np.array(
+        [("a", 1), ("b", 2), ("c", 3)], dtype=[("name", "U1"), ("value", "i8")]
+    )
+    result = columnar.evaluate(
+        FilterQuery(Ge("value", "2"), sort=[Sort("-value")]), data
+    )
+    assert list(result["name"]) == ["c", "b"]
+
+
+def test_unknown_column():
+    with pytest.raises(OperatorError):
+        columnar.evaluate(parse("unknown:1"), COLUMNS)
+    # also if no row is left to evaluate it on
+    with pytest.raises(OperatorError):
+        columnar.evaluate(parse("age:>1000 unknown:1"), COLUMNS)
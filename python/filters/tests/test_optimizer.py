@@ -0,0 +1,120 @@
+from datetime import date
+
+import pytest
+
+from ..optimizer import optimize, optimize_query
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+
+def test_flatten():
+    assert optimize(And(And(Eq("a", 1), Eq("b", 2)), And(Eq("c", 3)))) == And(
+        Eq("a", 1), Eq("b", 2), Eq("c", 3)
+    )
+
+
+def test_flatten_keeps_other_operators():
+    query = And(Or(Eq("a", 1), Eq("b", 2)), Eq("c", 3))
+    assert optimize(query) == query
+
+
+def test_deduplicate():
+    assert optimize(And(Eq("a", 1), Gt("b", 2), Eq("a", 1))) == And(
+        Eq("a", 1), Gt("b", 2)
+    )
+
+
+def test_single_child_is_unwrapped():
+    assert optimize(And(Eq("a", 1), Eq("a", 1))) == Eq("a", 1)
+
+
+def test_double_negation():
+    assert optimize(Not(Not(Eq("a", 1)))) == Eq("a", 1)
+    assert optimize(Not(Not(Not(Eq("a", 1))))) == Not(Eq("a", 1))
+
+
+def test_fold_in():
+    assert optimize(Or(Eq("name", "John"), Eq("age", "3"), Eq("name", "Jack"))) == Or(
+        In("name", ("John", "Jack")), Eq("age", "3")
+    )
+
+
+def test_fold_in_merges_existing_in():
+    assert optimize(Or(In("a", [1, 2]), Eq("a", 2), Eq("a", 3))) == In("a", (1, 2, 3))
+
+
+def test_fold_in_keeps_values_of_different_types():
+    assert optimize(Or(Eq("a", 1), Eq("a", True), Eq("a", 1))) == In("a", (1, True))
+
+
+def test_fold_in_not_applied_to_and():
+    query = And(Eq("a", 1), Eq("a", 2))
+    assert optimize(query) == query
+
+
+def test_merge_ranges():
+    assert optimize(And(Gt("a", 1), Gt("a", 5), Lt("a", 10), Le("a", 8))) == And(
+        Gt("a", 5), Le("a", 8)
+    )
+
+
+def test_merge_ranges_prefers_strict_bound():
+    assert optimize(And(Ge("a", 5), Gt("a", 5))) == Gt("a", 5)
+
+
+def test_merge_ranges_to_eq():
+    assert optimize(And(Ge("d", date(2024, 1, 1)), Le("d", date(2024, 1, 1)))) == Eq(
+        "d", date(2024, 1, 1)
+    )
+
+
+def test_merge_ranges_skips_strings():
+    query = And(Gt("age", "100"), Gt("age", "30"))
+    assert optimize(query) == query
+
+
+def test_merge_ranges_of_parsed_strings():
+    # ordered the same as text and as numbers (or dates)
+    assert optimize(And(Gt("age", "20"), Ge("age", "30"), Lt("age", "50"))) == And(
+        Ge("age", "30"), Lt("age", "50")
+    )
+    assert optimize(And(Gt("d", "2020-01-01"), Gt("d", "2021-06-01"))) == Gt(
+        "d", "2021-06-01"
+    )
+    assert optimize(And(Ge("age", "30"), Le("age", "30"))) == Eq("age", "30")
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        And(Gt("age", "5"), Gt("age", "5.0")),
+        And(Gt("name", "abc"), Gt("name", "abd")),
+        And(Gt("age", "30"), Gt("age", "2020-01-01")),
+        And(Gt("age", "nan"), Gt("age", "1")),
+    ],
+)
+def test_merge_ranges_skips_ambiguous_strings(query):
+    assert optimize(query) == query
+
+
+def test_merge_ranges_skips_mixed_types():
+    query = And(Gt("a", 1), Gt("a", date(2024, 1, 1)))
+    assert optimize(query) == query
+
+
+def test_parsed_query():
+    filter_query = GithubSyntaxParser(
+        "(name:John,Jack age:>30) AND (name:John,Jack OR name:Jim) AND NOT NOT x:1"
+    ).parse()
+
+    assert optimize_query(filter_query).query == And(
+        In("name", ("John", "Jack")),
+        Gt("age", "30"),
+        In("name", ("John", "Jack", "Jim")),
+        Eq("x", "1"),
+    )
+
+
+def test_parsed_ranges_are_merged():
+    filter_query = GithubSyntaxParser("age:>20 age:>30 age:<=50 age:<60").parse()
+    assert optimize_query(filter_query).query == And(Gt("age", "30"), Le("age", "50"))
@@ -0,0 +1,97 @@
+from threading import Thread
+
+from ..parsers.cache import CacheInfo, ParseCache
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+
+class CachedParser(GithubSyntaxParser):
+    cache = ParseCache(maxsize=2)
+
+
+def setup_function():
+    CachedParser.cache.clear()
+    CachedParser.cache.resize(2)
+
+
+def test_repeat_query_is_served_from_cache():
+    first = CachedParser("name:John age:<30").parse()
+    second = CachedParser("name:John age:<30").parse()
+
+    assert first.query == second.query
+    assert second.query is first.query
+    assert CachedParser.cache.info() == CacheInfo(
+        hits=1, misses=1, evictions=0, maxsize=2, currsize=1
+    )
+
+
+def test_cached_result_is_copy_on_write():
+    first = CachedParser("name:John").parse()
+    first.sort.append(Sort("-age"))
+    first.limit = 10
+
+    second = CachedParser("name:John").parse()
+
+    assert second.sort == []
+    assert second.limit is None
+
+
+def test_cached_tree_is_immutable():
+    filter_query = CachedParser("name:John,Jack").parse()
+
+    assert isinstance(filter_query.query.args, tuple)
+
+
+def test_eviction():
+    CachedParser("a:1").parse()
+    CachedParser("b:2").parse()
+    CachedParser("a:1").parse()
+    CachedParser("c:3").parse()  # evicts b:2, the least recently used entry
+
+    CachedParser("a:1").parse()
+    CachedParser("b:2").parse()
+
+    info = CachedParser.cache.info()
+    assert info.hits == 2
+    assert info.misses == 4
+    assert info.evictions == 2
+    assert info.currsize == 2
+
+
+def test_resize():
+    for query in ["a:1", "b:2"]:
+        CachedParser(query).parse()
+
+    CachedParser.cache.resize(1)
+
+    assert len(CachedParser.cache) == 1
+    assert CachedParser.cache.info().evictions == 1
+
+
+def test_disabled_cache():
+    CachedParser.cache.resize(0)
+
+    CachedParser("a:1").parse()
+    CachedParser("a:1").parse()
+
+    assert CachedParser.cache.info().hits == 0
+    assert len(CachedParser.cache) == 0
+
+
+def test_thread_safety():
+    CachedParser.cache.resize(8)
+    queries = [f"key{i % 16}:value" for i in range(400)]
+
+    def worker(chunk):
+        for query in chunk:
+            CachedParser(query).parse()
+
+    threads = [Thread(target=worker, args=(queries[i::4],)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    info = CachedParser.cache.info()
+    assert info.hits + info.misses == len(queries)
+    assert info.currsize <= 8
@@ -0,0 +1,198 @@
+import asyncio
+
+import pytest
+
+from ..query import AsyncInMemoryExecutor, InMemoryExecutor, Query
+from ..types import *
+
+RECORDS = [
+    {"name": "John", "age": 30},
+    {"name": "Jack", "age": 25},
+    {"name": "Jill", "age": 41},
+    {"name": "Jim", "age": 19},
+]
+
+
+def test_builds_operators():
+    query = Query().eq("name", "John").le("age", 40).not_(Query().in_("age", [1, 2]))
+    assert query.to_operator() == And(
+        Eq("name", "John"), Le("age", 40), Not(In("age", (1, 2)))
+    )
+
+
+def test_single_and_empty_query():
+    assert Query().gt("age", 3).to_operator() == Gt("age", 3)
+    assert Query().to_operator() == And()
+
+
+def test_or():
+    query = Query().or_(Query().eq("a", 1), Eq("a", 2))
+    assert query.to_operator() == Or(Eq("a", 1), Eq("a", 2))
+
+
+def test_queries_are_immutable():
+    base = Query().gt("age", 20)
+    young, old = base.lt("age", 30), base.ge("age", 30)
+
+    assert base.to_operator() == Gt("age", 20)
+    assert young.to_operator() == And(Gt("age", 20), Lt("age", 30))
+    assert old.to_operator() == And(Gt("age", 20), Ge("age", 30))
+
+
+def test_sort_and_limit():
+    filter_query = (
+        Query().sort("age").eq("a", 1).sort("-name").limit(5, 10).filter_query
+    )
+    assert [str(s) for s in filter_query.sort] == ["-name"]
+    assert (filter_query.limit, filter_query.offset) == (5, 10)
+
+
+def test_limit_and_sort_can_be_removed():
+    filter_query = Query().sort("age").limit(10).limit(None).sort().filter_query
+    assert (filter_query.limit, filter_query.offset, filter_query.sort) == (
+        None,
+        None,
+        [],
+    )
+
+
+def test_long_chain():
+    query = Query()
+    for i in range(10000):
+        query = query.eq(f"k{i}", i)
+    assert len(query.to_operator().args) == 10000
+
+
+def test_execution_is_lazy():
+    calls = []
+
+    def executor(filter_query):
+        calls.append(filter_query)
+        return []
+
+    query = Query(executor=executor).eq("a", 1)
+    assert calls == []
+    assert list(query) == []
+    assert calls[0].query == Eq("a", 1)
+
+
+def test_in_memory_executor():
+    query = (
+        Query(executor=InMemoryExecutor(RECORDS)).gt("age", 20).sort("-age").limit(2)
+    )
+    assert [r["name"] for r in query] == ["Jill", "John"]
+    assert [r["name"] for r in query.using(InMemoryExecutor(RECORDS[:2]))] == [
+        "John",
+        "Jack",
+    ]
+
+
+def test_without_executor():
+    with pytest.raises(ValueError):
+        Query().eq("a", 1).execute()
+
+
+def test_rql_roundtrip():
+    query = Query().eq("name", "John Doe").eq("code", "123").in_("age", [1, 2])
+    query = query.sort("-age").limit(10, 20)
+
+    assert str(query) == (
+        "and(eq(name,John%20Doe),eq(code,string:123),in(age,(1,2)))&sort(-age)&limit(10,20)"
+    )
+
+    parsed = Query(str(query)).filter_query
+    assert parsed.query == query.to_operator()
+    assert [str(s) for s in parsed.sort] == ["-age"]
+    assert (parsed.limit, parsed.offset) == (10, 20)
+
+
+def test_count():
+    query = Query(executor=InMemoryExecutor(RECORDS)).gt("age", 20).limit(1)
+    assert query.count() == 3
+
+
+def test_async_in_memory_executor():
+    query = Query(executor=AsyncInMemoryExecutor(RECORDS, batch_size=1)).gt("age", 20)
+
+    async def run():
+        page, total = await query.sort("-age").limit(2).aexecute_with_count()
+        names = [r["name"] async for r in query.limit(1)]
+        return [r["name"] for r in page], total, names
+
+    assert asyncio.run(run()) == (["Jill", "John"], 3, ["John"])
+
+
+def test_async_executor_yields_to_the_event_loop():
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(len(ticks))
+            await asyncio.sleep(0)
+
+    async def run():
+        task = asyncio.create_task(ticker())
+        query = Query(executor=AsyncInMemoryExecutor(RECORDS * 100, batch_size=10))
+        result = await query.gt("age", 20).aexecute()
+        task.cancel()
+        return result
+
+    assert len(asyncio.run(run())) == 300
+    assert len(ticks) > 10
+
+
+def test_async_iterable_records():
+    async def records():
+        for record in RECORDS:
+            yield record
+
+    query = Query(executor=AsyncInMemoryExecutor(records())).lt("age", 26)
+    assert [r["name"] for r in asyncio.run(query.aexecute())] == ["Jack", "Jim"]
+
+
+def test_rql_roundtrip_types():
+    from datetime import date, datetime, time, timedelta, timezone
+    from decimal import Decimal
+    import math
+
+    values = [
+        Decimal("1.10"),
+        Decimal("-2E+3"),
+        date(2020, 1, 31),
+        datetime(2020, 1, 31, 10, 30, 5, 123),
+        datetime(2020, 1, 31, 10, 30, tzinfo=timezone.utc),
+        time(10, 30, 5),
+        timedelta(days=-1, seconds=5, microseconds=7),
+        1.5,
+        "1.5",
+        True,
+    ]
+    for value in values:
+        operator = Query().eq("a", value).to_operator()
+        parsed = Query(str(Query(operator))).to_operator()
+        assert (type(parsed.value), parsed.value) == (type(value), value)
+
+    operator = In("a", (Decimal("1.0"), date(2021, 1, 1)))
+    assert Query(str(Query(operator))).to_operator().value == operator.value
+
+    for operator in [
+        *(
+            Eq(key, "v")
+            for key in ["true", "1", "a:b", "a/b", "null", "", "$1", "'x'", "a b"]
+        ),
+        Eq("a", ""),
+        In("a", ("",)),
+        In("a", ("", "x")),
+        In("true", ("1", 1)),
+    ]:
+        assert Query(str(Query(operator))).to_operator() == operator
+
+    parsed = Query(str(Query().eq("a", math.nan))).to_operator()
+    assert math.isnan(parsed.value)
+
+    # non-finite Decimals are written as floats, `decimal:` only reads finite values
+    assert (
+        Query(str(Query().eq("a", Decimal("-Infinity")))).to_operator().value
+        == -math.inf
+    )
+    assert math.isnan(Query(str(Query().eq("a", Decimal("sNaN")))).to_operator().value)
@@ -0,0 +1,81 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from ..parser import parse
+from ..parsers.base import ParserError
+from ..types import *
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("eq(a,1)&lt(b,2)", And(Eq("a", 1), Lt("b", 2))),
+        ("a=ge=3", Ge("a", 3)),
+        ("a=1,b=abc", And(Eq("a", 1), Eq("b", "abc"))),
+        ("a<=3|a>5", Or(Le("a", 3), Gt("a", 5))),
+        ("(a=1|a=2)&b!=3", And(Or(Eq("a", 1), Eq("a", 2)), Not(Eq("b", 3)))),
+        ("and(or(a=1,a=2),not(b=3))", And(Or(Eq("a", 1), Eq("a", 2)), Not(Eq("b", 3)))),
+        ("in(a,(1,2))", In("a", (1, 2))),
+        ("a=in=(x,y)", In("a", ("x", "y"))),
+        ("a=out=1/2", Not(In("a", (1, 2)))),
+        ("contains(tags,python)", Co("tags", "python")),
+        ("author/name=nico", Eq("author__name", "nico")),
+        ("a%3C=3", Le("a", 3)),
+        ("a=string:007", Eq("a", "007")),
+        ("a=true", Eq("a", True)),
+        ("a=%27x%20y%27", Eq("a", "x y")),
+        (
+            "a=date:2020-01-01T00:00:00Z",
+            Eq("a", datetime(2020, 1, 1, tzinfo=timezone.utc)),
+        ),
+        ("", And()),
+    ],
+)
+def test_parse(query, expected):
+    assert parse(query).query == expected
+
+
+def test_sort_and_limit():
+    filter_query = parse("a=1&sort(-a,+b)&limit(10,20)")
+
+    assert filter_query.query == Eq("a", 1)
+    assert [str(s) for s in filter_query.sort] == ["-a", "b"]
+    assert (filter_query.limit, filter_query.offset) == (10, 20)
+
+
+def test_parameters():
+    assert parse("eq(a,$1)&lt(b,$2)", ["x", 3]).query == And(Eq("a", "x"), Lt("b", 3))
+
+
+@pytest.mark.parametrize(
+    "query, position",
+    [
+        ("?a=1", 0),
+        ("a=1&b=2|c=3", 7),
+        ("eq(a,1", 6),
+        ("a=1)", 3),
+        ("a=1&#", 4),
+        ("foo(a,1)", 0),
+        ("a=x:1", 2),
+        ("eq(a,$1)", 5),
+        ("eq(a,(1,2))", 0),
+        ("a=1&limit(x)", 4),
+        ("and(sort(a))", 4),
+        ("eq=ge=epoch:1e999", 6),
+        ("a=epoch:1e300", 2),
+        ("a=timedelta:99999999999999999999999", 2),
+        ("a=decimal:x", 2),
+        ("a=decimal:sNaN", 2),
+        ("a=decimal:Infinity", 2),
+    ],
+)
+def test_invalid(query, position):
+    with pytest.raises(ParserError) as e:
+        parse(query)
+    assert e.value.position == position
+
+
+def test_long_query():
+    query = "&".join(f"a{i}=ge={i}" for i in range(5000))
+    assert len(parse(query).query.args) == 5000
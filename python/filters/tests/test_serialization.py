@@ -0,0 +1,133 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+
+from ..parsers.github import GithubSyntaxParser
+from ..serialization import SerializationError, dumpb, dumps, loadb, loads
+from ..types import *
+
+
+def build():
+    return FilterQuery(
+        And(
+            Or(Eq("name", "John"), Eq("name", 'Jöhn "J"')),
+            Not(Lt("age", 30)),
+            Ge("price", Decimal("9.99")),
+            Gt("ratio", 0.5),
+            Le("born", date(1990, 1, 31)),
+            Lt("created", datetime(2020, 1, 1, 10, tzinfo=timezone.utc)),
+            Eq("opens", time(9, 30)),
+            Eq("duration", timedelta(days=-1, seconds=5)),
+            Eq("active", True),
+            Eq("count", -(2**70)),
+            In("tag", ["a", 1, Decimal("2")]),
+            In("group", {"x", "y"}),
+            Co("title", ""),
+        ),
+        sort=[Sort("-age"), Sort("name")],
+        limit=10,
+        offset=20,
+    )
+
+
+def assert_same(a, b):
+    assert a.query == b.query
+    assert [str(s) for s in a.sort] == [str(s) for s in b.sort]
+    assert (a.limit, a.offset) == (b.limit, b.offset)
+    # types are kept, e.g. 30 is not 30.0 and True is not 1
+    assert repr(a.query.args) == repr(b.query.args)
+
+
+@pytest.mark.parametrize("dump, load", [(dumps, loads), (dumpb, loadb)])
+def test_roundtrip(dump, load):
+    assert_same(load(dump(build())), build())
+
+
+@pytest.mark.parametrize("dump, load", [(dumps, loads), (dumpb, loadb)])
+def test_roundtrip_parsed(dump, load):
+    filter_query = GithubSyntaxParser('(a:1 OR b:~x) -c:>=2 d:"x y"').parse()
+    assert_same(load(dump(filter_query)), filter_query)
+
+
+def test_text_form():
+    filter_query = FilterQuery(
+        And(Eq("name", "John"), Lt("age", 30)), [Sort("-age")], 10
+    )
+    assert (
+        dumps(filter_query)
+        == '[["and",["eq","name","John"],["lt","age",30]],["-age"],10,null]'
+    )
+
+
+@pytest.mark.parametrize("dump", [dumps, dumpb])
+def test_canonical(dump):
+    assert dump(build()) == dump(build())
+    assert dump(FilterQuery(In("a", {"x", "y", "z"}))) == dump(
+        FilterQuery(In("a", {"z", "y", "x"}))
+    )
+    assert dump(FilterQuery(Eq("a", 1))) != dump(FilterQuery(Eq("a", "1")))
+    assert dump(FilterQuery(Eq("a", 1))) != dump(FilterQuery(Eq("a", True)))
+
+
+def test_binary_is_compact():
+    assert len(dumpb(build())) < len(dumps(build()).encode())
+
+
+@pytest.mark.parametrize(
+    "load, data",
+    [
+        (loads, "[]"),
+        (loads, '[["xx","a",1],[],null,null]'),
+        (loads, '[["eq","a",{"dec":"x"}],[],null,null]'),
+        (loads, '[["eq","a",[[1]]],[],null,null]'),
+        (loadb, b""),
+        (loadb, b"\x02"),
+        (loadb, dumpb(build())[:-3]),
+        (loadb, dumpb(build()) + b"N"),
+    ],
+)
+def test_invalid(load, data):
+    with pytest.raises(SerializationError):
+        load(data)
+
+
+@pytest.mark.parametrize(
+    "load, data",
+    [
+        (loads, '[["eq","a",{"td":[1e10,0,0]}],[],null,null]'),
+        (loads, '[["eq","a",{"td":[null,0,0]}],[],null,null]'),
+        (loads, "[" * 100_000 + "]" * 100_000),
+        (loads, '[["not",' * 5000 + '["eq","a",1]' + "]" * 5000 + ",[],null,null]"),
+        (loadb, b"\x01\x06\x01ar" + b"N" * 3 + b"\x00NN"),
+        (loadb, b"\x01\x06\x01ar" + b"i\xff\xff\xff\xff\xff\xff\x7f" * 3 + b"\x00NN"),
+        (loadb, b"\x01" + b"\x02" * 100_000),
+        (loadb, dumpb(FilterQuery(Eq("a", 1)))[:-2] + b"s\x01xN"),
+    ],
+)
+def test_corrupt_input(load, data):
+    with pytest.raises(SerializationError):
+        load(data)
+
+
+@pytest.mark.parametrize("dump, load", [(dumps, loads), (dumpb, loadb)])
+def test_fuzzed_input(dump, load):
+    # every corruption is either read as some query or rejected with SerializationError
+    rng = random.Random(0)
+    data = dump(build())
+    for _ in range(3000):
+        corrupt = bytearray(data.encode() if isinstance(data, str) else data)
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(corrupt))
+            if rng.random() < 0.2:
+                del corrupt[position]
+            else:
+                corrupt[position] = rng.randrange(256)
+        corrupt = bytes(corrupt)
+        if isinstance(data, str):
+            corrupt = corrupt.decode(errors="replace")
+        try:
+            load(corrupt)
+        except SerializationError:
+            pass
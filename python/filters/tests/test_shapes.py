@@ -0,0 +1,66 @@
+from ..evaluator import compile_predicate, compile_shape
+from ..parsers.github import GithubSyntaxParser
+from ..shapes import Shape, bind, normalize
+from ..types import *
+
+
+def parse(query):
+    return GithubSyntaxParser(query).parse()
+
+
+def test_normalize():
+    shape, params = normalize(parse("age:<30 name:John"))
+    assert shape == Shape(("and", ("eq", "name"), ("lt", "age")), (), False, False)
+    assert params == ["John", "30"]
+
+
+def test_values_dont_change_the_shape():
+    assert normalize(parse("age:<30"))[0] == normalize(parse("age:<40"))[0]
+    assert normalize(parse("age:<30"))[0] != normalize(parse("age:>30"))[0]
+
+
+def test_shape_is_canonical():
+    a, a_params = normalize(parse("a:1 (b:2 c:3)"))
+    b, b_params = normalize(parse("c:3 b:2 a:1"))
+    assert a == b
+    assert a_params == b_params == ["1", "2", "3"]
+
+
+def test_sort_limit_offset():
+    filter_query = FilterQuery(
+        In("tag", ["x", "y"]), [Sort("-age")], limit=10, offset=5
+    )
+    shape, params = normalize(filter_query)
+
+    assert shape == Shape(("in", "tag"), (("age", True),), True, True)
+    assert params == [("x", "y"), 10, 5]
+
+
+def test_bind():
+    filter_query = FilterQuery(
+        Or(Not(Eq("b", 2)), And(Gt("a", 1), Co("c", "x"))),
+        [Sort("-age"), Sort("name")],
+        limit=10,
+    )
+    bound = bind(*normalize(filter_query))
+
+    assert bound.query == Or(And(Co("c", "x"), Gt("a", 1)), Not(Eq("b", 2)))
+    assert [str(s) for s in bound.sort] == ["-age", "name"]
+    assert (bound.limit, bound.offset) == (10, None)
+    assert normalize(bound) == normalize(filter_query)
+
+
+def test_predicates_share_code_per_shape():
+    compile_shape.cache_clear()
+    young = compile_predicate(parse("age:<30 city:Berlin").query)
+    old = compile_predicate(parse("age:>=30 city:Munich").query)
+    older = compile_predicate(parse("age:>=50 city:Hamburg").query)
+
+    assert compile_shape.cache_info().hits == 1
+    assert old.source == older.source
+    assert young({"age": 20, "city": "Berlin"}) and not young(
+        {"age": 20, "city": "Munich"}
+    )
+    assert older({"age": 60, "city": "Hamburg"}) and not older(
+        {"age": 40, "city": "Hamburg"}
+    )
@@ -0,0 +1,151 @@
+import sqlite3
+
+import pytest
+
+from ..evaluator import evaluate
+from ..integrations.sql import FilterError, SqlCompiler
+from ..parsers.github import GithubSyntaxParser
+from ..types import *
+
+PEOPLE = [
+    {"name": "John", "age": 30, "city": "Berlin"},
+    {"name": "Jack", "age": 25, "city": "Hamburg"},
+    {"name": "Jill", "age": 41, "city": "Berlin"},
+    {"name": "Jim", "age": 19, "city": "Munich"},
+    {"name": "J%m_", "age": 50, "city": "Munich"},
+]
+
+
+@pytest.fixture(scope="module")
+def connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE person (name TEXT, age INTEGER, city TEXT)")
+    connection.executemany("INSERT INTO person VALUES (:name, :age, :city)", PEOPLE)
+    yield connection
+    connection.close()
+
+
+def select(connection, compiler, filter_query):
+    statement = compiler.compile(filter_query)
+    cursor = connection.execute(
+        f"SELECT name FROM person {statement.sql}", statement.params
+    )
+    return [name for (name,) in cursor]
+
+
+def parse(query, sort=(), limit=None, offset=None):
+    filter_query = GithubSyntaxParser(query).parse()
+    filter_query.sort = [Sort(key) for key in sort]
+    filter_query.limit, filter_query.offset = limit, offset
+    return filter_query
+
+
+@pytest.mark.parametrize("paramstyle", ["qmark", "numeric", "named"])
+@pytest.mark.parametrize(
+    "query",
+    [
+        "name:John",
+        "city:Berlin age:>=30",
+        "city:Berlin OR NOT age:<20",
+        "name:John,Jim -city:Munich",
+        "name:~Ji",
+        'name:~"%"',
+        "(age:<30 OR age:>40) AND -name:Jim",
+    ],
+)
+def test_matches_evaluator(connection, paramstyle, query):
+    compiler = SqlCompiler(["name", "age", "city"], paramstyle=paramstyle)
+    filter_query = parse(query, sort=["name"])
+    # both compare the (string) values as numbers with the integer column
+    expected = [p["name"] for p in evaluate(filter_query, PEOPLE)]
+    assert select(connection, compiler, filter_query) == expected
+
+
+def test_sort_limit_offset(connection):
+    compiler = SqlCompiler({"age": "age", "town": "city"}, no_limit="-1")
+
+    query = "town:Berlin,Munich"
+    assert select(connection, compiler, parse(query, ["-age"], 2, 1)) == [
+        "Jill",
+        "John",
+    ]
+    assert select(connection, compiler, parse(query, ["town", "age"], None, 2)) == [
+        "Jim",
+        "J%m_",
+    ]
+
+
+def test_in_and_empty_operators(connection):
+    compiler = SqlCompiler(["name", "age"])
+    filter_query = FilterQuery(In("age", [19, 25]), [Sort("age")])
+    assert select(connection, compiler, filter_query) == ["Jim", "Jack"]
+    assert select(connection, compiler, FilterQuery(In("age", []))) == []
+    assert len(select(connection, compiler, FilterQuery(And()))) == 5
+    assert select(connection, compiler, FilterQuery(Or())) == []
+
+
+def test_statement():
+    compiler = SqlCompiler({"age": "age", "town": "p.city"})
+    statement = compiler.compile(parse("age:>30 -town:~x", ["-age"], 10, 20))
+
+    assert statement.sql == (
+        'WHERE ("age" > ?) AND (NOT ("p"."city" LIKE ? ESCAPE \'\\\')) '
+        'ORDER BY "age" DESC LIMIT ? OFFSET ?'
+    )
+    assert statement.params == ["30", "%x%", 10, 20]
+
+
+def test_pyformat():
+    statement = SqlCompiler(["a"], paramstyle="pyformat").compile(parse("a:1,2"))
+    # the Or of two Eq is optimized to one IN
+    assert statement.where == '"a" IN (%(p0)s, %(p1)s)'
+    assert statement.params == {"p0": "1", "p1": "2"}
+
+
+def test_ranges_are_merged(connection):
+    compiler = SqlCompiler(["name", "age"])
+    filter_query = parse("age:>20 age:>=25 age:<50 age:<45", sort=["name"])
+    statement = compiler.compile(filter_query)
+    assert statement.where == '("age" >= ?) AND ("age" < ?)'
+    assert statement.params == ["25", "45"]
+    assert select(connection, compiler, filter_query) == ["Jack", "Jill", "John"]
+
+
+def test_mysql_dialect(connection):
+    # SQLite accepts backticks too
+    compiler = SqlCompiler(["name"], dialect="mysql")
+    for query in ['name:~"%"', 'name:~"m_"', "name:~Ji"]:
+        filter_query = parse(query)
+        expected = [p["name"] for p in evaluate(filter_query, PEOPLE)]
+        assert select(connection, compiler, filter_query) == expected
+
+    compiler = SqlCompiler(
+        {"age": "age", "town": "p.ci`ty"}, paramstyle="format", dialect="mysql"
+    )
+    statement = compiler.compile(parse('age:>30 town:~"5%!"', ["-age"]))
+
+    assert statement.sql == (
+        "WHERE (`age` > %s) AND (`p`.`ci``ty` LIKE %s ESCAPE '!') ORDER BY `age` DESC"
+    )
+    assert statement.params == ["30", "%5!%!!%"]
+
+    with pytest.raises(ValueError):
+        SqlCompiler(["age"], dialect="oracle")
+
+
+def test_sql_is_cached_per_shape():
+    compiler = SqlCompiler(["age", "name"])
+    first = compiler.compile(parse("age:<30 name:John"))
+    second = compiler.compile(parse("age:<40 name:Jack"))
+
+    assert first.where is second.where
+    assert second.params == ["40", "Jack"]
+    assert compiler.build.cache_info().hits == 1
+
+
+def test_allowlist():
+    compiler = SqlCompiler(["age"])
+    with pytest.raises(FilterError):
+        compiler.compile(parse("name:John"))
+    with pytest.raises(FilterError):
+        compiler.compile(parse("age:1", sort=["name"]))
@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from ..evaluator import compile_predicate, evaluate
+from ..parsers.github import GithubSyntaxParser
+from ..query import InMemoryExecutor, Query
+from ..shapes import split
+from ..statistics import Statistics, reorder
+from ..types import *
+
+rng = random.Random(3)
+RECORDS = [
+    {
+        "id": i,
+        "active": i % 100 != 0,
+        "city": rng.choice(["Berlin", "Hamburg", "Munich"]),
+        "age": rng.randint(0, 99),
+        "name": f"user{i}",
+    }
+    for i in range(2000)
+]
+
+
+def test_field_statistics():
+    statistics = Statistics.collect(RECORDS)
+    age = statistics.fields["age"]
+    assert age.cardinality == 100
+    assert statistics.selectivity(Lt("age", "50")) == pytest.approx(0.5, abs=0.05)
+    assert statistics.selectivity(Ge("age", "90")) == pytest.approx(0.1, abs=0.05)
+    assert statistics.selectivity(Eq("age", "7")) == pytest.approx(0.01, abs=0.01)
+    assert statistics.selectivity(Eq("active", "true")) == pytest.approx(0.99)
+    assert statistics.selectivity(Eq("age", "abc")) == 0
+    assert statistics.selectivity(Co("name", "user1")) == pytest.approx(0.55, abs=0.1)
+
+
+def test_and_rejects_early_or_accepts_early():
+    statistics = Statistics.collect(RECORDS)
+    active, young, berlin = Eq("active", "true"), Lt("age", "10"), Eq("city", "Berlin")
+
+    assert reorder(And(active, berlin, young), statistics) == And(young, berlin, active)
+    assert reorder(Or(young, berlin, active), statistics) == Or(active, berlin, young)
+    assert reorder(Not(And(active, young)), statistics) == Not(And(young, active))
+
+
+def test_unchanged_trees_are_kept():
+    query = And(Lt("age", "10"), Eq("active", "true"))
+    assert reorder(query, Statistics.collect(RECORDS)) is query
+
+
+def test_observed_hit_rates_replace_estimates():
+    # without field statistics both use the default estimate and keep their order
+    statistics = Statistics()
+    query = And(Eq("active", "true"), Eq("id", "5"))
+    assert reorder(query, statistics) is query
+
+    evaluate(FilterQuery(query), RECORDS, statistics=statistics)
+    assert statistics.observed[Eq("active", "true")] == [990, 1000]
+    # id is only checked on active records
+    assert statistics.observed[Eq("id", "5")] == [1, 990]
+    assert reorder(query, statistics) == And(Eq("id", "5"), Eq("active", "true"))
+
+
+def test_observed_leaves_are_bounded():
+    statistics = Statistics(max_observed=3)
+    for i in range(5):
+        statistics.observe(Eq("id", str(i)), 1, 10)
+    statistics.observe(Eq("id", "2"), 1, 10)
+    statistics.observe(Eq("id", "5"), 1, 10)
+    # the least recently observed leaves are dropped
+    assert list(statistics.observed) == [Eq("id", "4"), Eq("id", "2"), Eq("id", "5")]
+    assert statistics.observed[Eq("id", "2")] == [2, 20]
+
+
+def test_keep_order_predicate():
+    query = And(Eq("b", 1), Eq("a", 2))
+    assert split(query, canonical=False)[0] == ("and", ("eq", "b"), ("eq", "a"))
+    assert (
+        "p0(record) and p1(record)" in compile_predicate(query, keep_order=True).source
+    )
+    assert split(query)[0] == ("and", ("eq", "a"), ("eq", "b"))
+
+
+QUERIES = [
+    "active:true age:<30 city:Berlin",
+    "city:Munich OR age:>90 OR name:~user19",
+    "NOT (active:false OR city:Hamburg) age:>=50",
+    "(city:Berlin OR city:Munich) (age:<5 OR age:>95) -id:7",
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_results_are_unchanged(query):
+    filter_query = GithubSyntaxParser(query).parse()
+    statistics = Statistics.collect(RECORDS)
+    expected = evaluate(filter_query, RECORDS)
+    for _ in range(2):
+        assert evaluate(filter_query, RECORDS, statistics=statistics) == expected
+
+
+def test_in_memory_executor():
+    query = Query(executor=InMemoryExecutor(RECORDS, Statistics.collect(RECORDS)))
+    query = query.eq("active", "true").lt("age", "3").eq("city", "Berlin")
+    assert query.count() == len(evaluate(query.filter_query, RECORDS))
+
+
+def test_columnar():
+    np = pytest.importorskip("numpy")
+    from ..integrations import numpy as columnar
+
+    columns = {key: np.array([record[key] for record in RECORDS]) for key in RECORDS[0]}
+    statistics = Statistics.from_columns(columns)
+    assert statistics.selectivity(Eq("active", "true")) == pytest.approx(0.99)
+
+    for query in QUERIES:
+        filter_query = GithubSyntaxParser(query).parse()
+        expected = columnar.evaluate_indices(filter_query, columns)
+        result = columnar.evaluate_indices(filter_query, columns, statistics)
+        assert list(result) == list(expected)
+
+    assert statistics.observed[Eq("active", "true")][1] > 0
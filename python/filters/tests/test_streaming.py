@@ -0,0 +1,136 @@
+import io
+import json
+import os
+import random
+import sys
+
+import pytest
+
+from ..evaluator import evaluate
+from ..parsers.github import GithubSyntaxParser
+from ..streaming import filter_records, main, read_json_lines
+from ..types import *
+
+
+def parse(query, **kwargs):
+    filter_query = GithubSyntaxParser(query).parse()
+    for name, value in kwargs.items():
+        setattr(filter_query, name, value)
+    return filter_query
+
+
+def test_stops_reading_once_limit_is_reached():
+    consumed = []
+
+    def records():
+        for i in range(1000):
+            consumed.append(i)
+            yield {"i": i, "even": i % 2 == 0}
+
+    result = list(filter_records(parse("even:true", limit=3, offset=1), records()))
+
+    assert [record["i"] for record in result] == [2, 4, 6]
+    assert len(consumed) == 7
+
+
+def test_sorted_top_k_matches_full_sort():
+    random.seed(0)
+    records = [
+        {"i": i, "group": random.choice("abc"), "score": random.choice([None, 1, 2, 3])}
+        for i in range(500)
+    ]
+    filter_query = parse(
+        "group:a,b", sort=[Sort("-score"), Sort("group")], limit=10, offset=5
+    )
+
+    assert list(filter_records(filter_query, iter(records))) == evaluate(
+        filter_query, records
+    )
+
+
+def test_sort_without_limit():
+    records = [{"n": n} for n in [3, 1, 2]]
+    filter_query = parse("n:>0", sort=[Sort("n")], offset=1)
+    assert list(filter_records(filter_query, records)) == [{"n": 2}, {"n": 3}]
+
+
+def test_sort_mixed_types_matches_evaluator():
+    records = [{"v": v} for v in [3, "b", None, 1.5, [2], "a", {"x": 1}, True, [1], 2]]
+    for sort in [Sort("v"), Sort("-v")]:
+        for limit in [None, 4]:
+            filter_query = FilterQuery(And(), sort=[sort], limit=limit)
+            assert list(filter_records(filter_query, records)) == evaluate(
+                filter_query, records
+            )
+
+
+def test_read_json_lines():
+    source = io.StringIO('{"a": 1}\n\nnot json\n{"a": 2}\n')
+    assert list(read_json_lines(source, skip_invalid=True)) == [{"a": 1}, {"a": 2}]
+
+
+def test_cli(tmp_path, capsys):
+    path = tmp_path / "log.ndjson"
+    path.write_text(
+        "\n".join(
+            json.dumps({"level": level, "n": n})
+            for n, level in enumerate(["info", "error", "error", "warn", "error"])
+        )
+    )
+
+    assert main(["level:error", str(path), "--sort=-n", "--limit", "2"]) == 0
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["n"] for line in lines] == [4, 2]
+
+
+def test_cli_invalid_query(capsys):
+    assert main(["level:(error", "-"]) == 2
+    error = capsys.readouterr().err
+    assert ": error: " in error and "(at char 6)" in error
+    assert len(error.splitlines()) == 1
+
+
+def test_cli_input_errors(tmp_path, capsys):
+    path = tmp_path / "log.ndjson"
+    path.write_text('{"level": "error"}\nnot json\n')
+
+    assert main(["level:error", str(path)]) == 1
+    error = capsys.readouterr().err
+    assert f"Invalid JSON in {path} on line 2" in error
+    assert len(error.splitlines()) == 1
+
+    assert main(["level:error", str(tmp_path / "missing.ndjson")]) == 1
+    error = capsys.readouterr().err
+    assert "missing.ndjson" in error
+    assert len(error.splitlines()) == 1
+
+
+@pytest.mark.parametrize("option", ["--limit=-1", "--offset=-2", "--limit=x"])
+def test_cli_rejects_invalid_limits(option, capsys):
+    with pytest.raises(SystemExit) as e:
+        main(["level:error", option])
+    assert e.value.code == 2
+    assert "Traceback" not in capsys.readouterr().err
+
+
+def test_cli_broken_pipe(tmp_path, monkeypatch):
+    path = tmp_path / "log.ndjson"
+    path.write_text(json.dumps({"level": "error"}))
+
+    class BrokenStdout:
+        def __init__(self, file):
+            self.file = file
+
+        def write(self, text):
+            raise BrokenPipeError
+
+        def fileno(self):
+            return self.file.fileno()
+
+    with open(tmp_path / "out", "wb") as out:
+        monkeypatch.setattr(sys, "stdout", BrokenStdout(out))
+        assert main(["level:error", str(path)]) == 1
+        # stdout now writes to devnull
+        os.write(out.fileno(), b"lost")
+    assert (tmp_path / "out").read_bytes() == b""
@@ -0,0 +1,114 @@
+import gc
+import pickle
+from decimal import Decimal
+
+import pytest
+
+from ..types import *
+
+
+def build():
+    return And(
+        Or(Eq("name", "John"), Eq("name", "Jack")),
+        Not(Lt("age", 30)),
+        In("tag", ["a", "b"]),
+    )
+
+
+def test_structural_hash():
+    assert hash(build()) == hash(build())
+    assert hash(Eq("a", 1)) != hash(Gt("a", 1))
+    assert {build(): "value"}[build()] == "value"
+    assert len({build(), build(), Eq("a", 1)}) == 2
+
+
+def test_values_of_different_types_are_different():
+    operators = [Eq("a", 1), Eq("a", True), Eq("a", 1.0), Eq("a", Decimal(1))]
+    assert len(set(operators)) == 4
+    assert Eq("a", 1) != Eq("a", True)
+    assert In("a", [1, 2]) != In("a", [True, 2])
+    assert In("a", {1, 2}) != In("a", {1.0, 2})
+    assert And(Eq("a", 1)) != And(Eq("a", 1.0))
+    assert Eq("a", float("nan")) == Eq("a", float("nan"))
+    assert In("a", [1, float("nan")]) == In("a", [1, float("nan")])
+    assert Eq("a", Decimal("sNaN")) == Eq("a", Decimal("sNaN"))
+    assert len({Eq("a", Decimal("sNaN")), Eq("a", Decimal("NaN"))}) == 2
+
+
+def test_hash_is_cached():
+    tree = build()
+    hash(tree)
+    assert tree._hash is not None
+    assert tree.args[0]._hash is not None
+
+
+def test_eq_uses_cached_hash():
+    a, b = build(), And(Eq("x", 1))
+    hash(a), hash(b)
+    assert a != b
+    assert a == build()
+
+
+def test_in_values_are_immutable():
+    assert In("tag", ["a", "b"]).value == ("a", "b")
+    assert In("tag", ["a", "b"]) == In("tag", ("a", "b"))
+    assert In("tag", {"a", "b"}) == In("tag", frozenset(["b", "a"]))
+
+
+def test_operators_are_immutable():
+    tree = build()
+    hash(tree)
+    for node, name in [(tree, "args"), (tree.args[2], "key"), (tree.args[2], "value")]:
+        with pytest.raises(AttributeError):
+            setattr(node, name, None)
+        with pytest.raises(AttributeError):
+            delattr(node, name)
+    assert tree == build()
+    assert hash(tree) == hash(build())
+
+
+def test_pickle_roundtrip():
+    tree = build()
+    hash(tree)
+    restored = pickle.loads(pickle.dumps(tree))
+    assert restored == tree
+    assert restored._hash is None
+
+
+def test_interner_shares_subtrees():
+    interner = Interner()
+    a = interner.intern(build())
+    b = interner.intern(build())
+
+    assert a is b
+    assert interner.intern(Eq("name", "John")) is a.args[0].args[0]
+
+
+def test_interner_keeps_value_types():
+    interner = Interner()
+    assert interner(Eq, "a", 1) is not interner(Eq, "a", True)
+    assert interner(Eq, "a", True).value is True
+
+
+def test_interner_factory():
+    interner = Interner()
+    leaf = interner(Eq, "a", 1)
+    assert interner(Not, leaf) is interner(Not, interner(Eq, "a", 1))
+
+
+def test_interner_holds_nodes_weakly():
+    interner = Interner()
+    interner.intern(build())
+    gc.collect()
+    assert len(interner) == 0
+
+
+def test_compact_layout():
+    leaf = Eq("name", "John")
+    node = And(leaf, Not(leaf))
+
+    assert not hasattr(leaf, "__dict__")
+    assert not hasattr(node, "__dict__")
+    assert leaf.args == ("name", "John")
+    assert (leaf.key, leaf.value) == ("name", "John")
+    assert node.args == (leaf, Not(leaf))
@@ -1,6 +1,6 @@
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
-
+from weakref import WeakValueDictionary
 
 # strings (using URL encoding), numbers, booleans, null, undefined, and dates (in ISO UTC format without colon encoding)
 ALLOWED_NUMERIC_TYPES = (int, float, Decimal)
@@ -13,11 +13,40 @@ class OperatorError(Exception):
     pass
 
 
+def value_key(value):
+    """
+    A value with its type, so `1`, `1.0` and `True` (which are equal in Python) are different
+    values of an operator, and NaN is equal to itself.
+    """
+    if isinstance(value, tuple):
+        return tuple, tuple(value_key(v) for v in value)
+    if isinstance(value, frozenset):
+        return frozenset, frozenset(value_key(v) for v in value)
+    if isinstance(value, Decimal):
+        # comparing or hashing a signaling NaN raises
+        if value.is_nan():
+            return Decimal, "snan" if value.is_snan() else "nan"
+    elif value != value:
+        return type(value), "nan"
+    return type(value), value
+
+
 class Operator:
+    # Subclasses declare their own fields as __slots__ and expose them as a tuple via `args`.
+    # Trees are immutable so they can be shared (e.g. by the parse cache), fields are only set
+    # in __init__ through object.__setattr__.
+    __slots__ = ("_hash", "__weakref__")
+
     operation = None
 
-    def __init__(self, *args):
-        self.args = list(args)
+    def __init__(self):
+        object.__setattr__(self, "_hash", None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
 
     def __str__(self):
         return f"{self.operation}({', '.join(map(str, self.args))})"
@@ -26,34 +55,59 @@ class Operator:
         return f"{self.operation}({', '.join(map(str, self.args))})"
 
     def __eq__(self, other):
+        if self is other:
+            return True
+
         if not isinstance(other, self.__class__):
             return False
 
-        if not len(self.args) == len(other.args):
+        # both hashes are cached after the first lookup, so unequal trees usually differ here
+        if (
+            self._hash is not None
+            and other._hash is not None
+            and self._hash != other._hash
+        ):
             return False
 
-        for i, j in zip(self.args, other.args):
-            if i != j:
-                return False
+        # tuple comparison checks identity first, so shared (interned) subtrees are not walked
+        return self.structure == other.structure
 
-        return True
+    def __hash__(self):
+        # structural hash, computed once; children cache their own hashes
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash((self.operation, self.structure)))
+        return self._hash
+
+    @property
+    def structure(self) -> tuple:
+        """The args as compared and hashed, see `value_key`."""
+        return self.args
+
+    def __reduce__(self):
+        # don't pickle the cached hash, string hashes differ between processes
+        return self.__class__, self.args
 
 
 class LogicalOperator(Operator):
+    __slots__ = ("args",)
+
     def __init__(self, *operations):
         for operation in operations:
             if not isinstance(operation, Operator):
                 raise OperatorError(
                     f"Logical operator arguments must be instances of Operator. Got {operation.__class__.__name__}"
                 )
-        super().__init__(*operations)
+        super().__init__()
+        object.__setattr__(self, "args", operations)
 
 
 class And(LogicalOperator):
+    __slots__ = ()
     operation = "and"
 
 
 class Or(LogicalOperator):
+    __slots__ = ()
     operation = "or"
 
     def __or__(self, other):
@@ -64,6 +118,7 @@ class Or(LogicalOperator):
 
 
 class Not(LogicalOperator):
+    __slots__ = ()
     operation = "not"
 
     def __init__(self, operation: Operator):
@@ -72,20 +127,24 @@ class Not(LogicalOperator):
 
 
 class KeyValueOperator(Operator):
+    __slots__ = ("key", "value")
+
     allowed_value_types = ALLOWED_TYPES
 
     def __init__(self, key, value):
         self.validate_key(key)
         self.validate_value(value)
-        super().__init__(key, value)
+        super().__init__()
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "value", value)
 
     @property
-    def key(self):
-        return self.args[0]
+    def args(self):
+        return (self.key, self.value)
 
     @property
-    def value(self):
-        return self.args[1]
+    def structure(self):
+        return (self.key, value_key(self.value))
 
     @classmethod
     def validate_key(cls, key):
@@ -102,39 +161,92 @@ class KeyValueOperator(Operator):
 
 
 class Eq(KeyValueOperator):
+    __slots__ = ()
     operation = "eq"
 
 
 class Gt(KeyValueOperator):
+    __slots__ = ()
     operation = "gt"
 
 
 class Ge(KeyValueOperator):
+    __slots__ = ()
     operation = "ge"
 
 
 class Lt(KeyValueOperator):
+    __slots__ = ()
     operation = "lt"
 
 
 class Le(KeyValueOperator):
+    __slots__ = ()
     operation = "le"
 
 
 class In(KeyValueOperator):
+    __slots__ = ()
     operation = "in"
-    allowed_value_types = (list, tuple, set)
+    allowed_value_types = (list, tuple, set, frozenset)
+    allowed_item_types = ALLOWED_TYPES
 
     def __init__(self, key, value):
+        # store an immutable (and hashable) copy of the values
+        if isinstance(value, list):
+            value = tuple(value)
+        elif isinstance(value, set):
+            value = frozenset(value)
+
         super().__init__(key, value)
         for v in value:
-            self.validate_value(v)
+            if not isinstance(v, self.allowed_item_types):
+                raise OperatorError(
+                    f"Values must be one of {self.allowed_item_types}. Got {v.__class__.__name__}"
+                )
 
 
 class Co(KeyValueOperator):
+    __slots__ = ()
     operation = "co"
 
 
+class Interner:
+    """
+    Hash-consing factory for Operator trees.
+
+    Structurally equal (sub)trees passed through the same Interner are represented by a single
+    shared instance, so comparing interned trees is a pointer comparison in the common case.
+    Nodes are held weakly and disappear from the table once they are no longer referenced.
+    """
+
+    def __init__(self):
+        self._nodes = WeakValueDictionary()
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __call__(self, operator_class, *args):
+        """Build an operator from already interned arguments, reusing an existing instance."""
+        return self.intern(operator_class(*args))
+
+    def intern(self, operator: Operator) -> Operator:
+        """Return the canonical instance for `operator`, interning its subtrees first."""
+        if isinstance(operator, LogicalOperator):
+            args = tuple(self.intern(arg) for arg in operator.args)
+            if any(new is not old for new, old in zip(args, operator.args)):
+                operator = operator.__class__(*args)
+
+        # children are interned, so the key compares (and hashes) cheaply
+        key = (operator.__class__, operator.structure)
+        existing = self._nodes.get(key)
+        if existing is not None:
+            return existing
+
+        self._nodes[key] = operator
+        return operator
+
+
 class Sort:
     def __init__(self, key):
         if not isinstance(key, str):
@@ -192,3 +304,12 @@ class FilterQuery:
         self.sort = sort
         self.limit = limit
         self.offset = offset
+
+    def copy(self):
+        """Return a shallow copy. The (immutable) operator tree is shared, the sort list is not."""
+        return FilterQuery(
+            query=self.query,
+            sort=list(self.sort),
+            limit=self.limit,
+            offset=self.offset,
+        )